@@ -1,55 +1,77 @@
 # -*- coding: utf-8 -*-
 #  Copyright (c) 2020 Kumagai group.
-from itertools import product
+from functools import lru_cache
 from typing import List
 
 import numpy as np
+from pydefect.cli.vasp.make_defect_charge_info import charge_center
+from pydefect.analyzer.grids import grid_points_in_sphere
 from pydefect.cli.vasp.make_efnv_correction import calc_max_sphere_radius
+from pymatgen.core import Lattice
 from pymatgen.electronic_structure.core import Spin
 from pymatgen.io.vasp import Chgcar
 
 
 class RadialDist:
-    def __init__(self, parchg: Chgcar, center_coords: List[float]):
+    def __init__(self, parchg: Chgcar, center_coords: List[float] = None):
+        """center_coords are Cartesian coordinates. When None, the sub-grid
+        charge center is used. The distances are measured from the grid
+        point nearest to the center. """
         self.data = parchg.spin_data
         self.dim = parchg.dim
         self.lattice = parchg.structure.lattice
-        self.center = center_coords
+        if center_coords is None:
+            frac_center = (charge_center(parchg.data["total"], sub_grid=True)
+                           / self.dim)
+            center_coords = self.lattice.get_cartesian_coords(frac_center)
+        self.center = list(center_coords)
         self.radius = calc_max_sphere_radius(self.lattice.matrix)
         self._distances_data = None  # lazy evaluation
+        self._histogram_cache = {}
+
+    @property
+    def grid_center(self) -> List[int]:
+        frac_center = self.lattice.get_fractional_coords(self.center)
+        return [int(i) for i in np.mod(np.rint(frac_center * self.dim),
+                                       self.dim)]
 
     @property
     def distances_data(self):
+        """Distances and flattened grid indices of the points in the sphere
+        centered at the origin. """
         if self._distances_data is None:
-            grid_points = [[x / self.dim[0], y / self.dim[1], z / self.dim[2]]
-                           for (x, y, z) in
-                           product(*[list(range(i)) for i in self.dim])]
-
-            # Use boolean indexing to find charges within the desired distance.
-            # data[:, 0]: shifted_coords
-            # data[:, 1]: distances
-            # data[:, 2]: sequential indices
-            # data[:, 3]: images
-            self._distances_data = np.array(self.lattice.get_points_in_sphere(
-                grid_points, self.center, self.radius))
-
+            self._distances_data = _origin_points_in_sphere(
+                tuple(map(tuple, self.lattice.matrix)), tuple(self.dim),
+                self.radius)
         return self._distances_data
 
-    def histogram(self, spin: Spin, nbins: int = 15):
-        inds = self.distances_data[:, 1] <= self.radius
-        dists = self.distances_data[inds, 1]
-        data_inds = np.rint(np.mod(list(self.distances_data[inds, 0]), 1) *
-                            np.tile(self.dim, (len(dists), 1))).astype(int)
-
-        vals = [self.data[spin][x, y, z] for x, y, z in data_inds]
+    def _histograms(self, nbins: int):
+        """Weighted histograms of both spins and the numbers of points."""
+        if nbins not in self._histogram_cache:
+            dists, indices = self.distances_data
+            edges = np.linspace(0, self.radius, nbins + 1)
+            bins = np.searchsorted(edges, dists, side="right") - 1
+            # As in np.histogram, the last bin includes its right edge.
+            bins[dists == edges[-1]] = nbins - 1
+            # Rolling the data by -center is equivalent to shifting the grid
+            # indices by center, so the points at the origin are reused.
+            shift = [-c for c in self.grid_center]
+            hists = {}
+            for spin, data in self.data.items():
+                shifted = np.roll(data, shift, axis=(0, 1, 2)).ravel()
+                hists[spin] = np.bincount(bins, weights=shifted[indices],
+                                          minlength=nbins)
+            hist_numbers = np.bincount(bins, minlength=nbins)
+            self._histogram_cache[nbins] = (hists, hist_numbers, edges)
+        return self._histogram_cache[nbins]
 
-        hist, edges = np.histogram(dists, nbins,
-                                   range=[0, self.radius], weights=vals)
-        hist_numbers, _ = np.histogram(dists, nbins, range=[0, self.radius])
+    def histogram(self, spin: Spin, nbins: int = 15):
+        hists, hist_numbers, edges = self._histograms(nbins)
+        hist = hists[spin]
         mesh_distance = edges[1] - edges[0]
 
         hist_data = np.zeros((nbins, 2))
-        hist_data[:, 0] = [sum(edges[i:i + 2]) / 2 for i in range(nbins)]
+        hist_data[:, 0] = (edges[:-1] + edges[1:]) / 2
 
         # 4pi * r^2 * rho
         integrated_volume = 4 * np.pi * hist_data[:, 0] ** 2
@@ -71,3 +93,9 @@ class RadialDist:
         return hist_data, half_point, summed
 
 
+@lru_cache(maxsize=2)
+def _origin_points_in_sphere(matrix, dim, radius):
+    # Shared by the RadialDist instances with the same lattice and grid,
+    # e.g., for all the bands of a defect regardless of their centers.
+    return grid_points_in_sphere(Lattice(matrix), dim, (0.0, 0.0, 0.0),
+                                 radius)
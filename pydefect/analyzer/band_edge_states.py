@@ -52,12 +52,118 @@ class OrbitalInfo(MSONable):
 
 @dataclass
 class BandEdgeOrbitalInfos(MSONable, ToJsonFileMixIn):
-    orbital_infos: List[List[List["OrbitalInfo"]]]  # [spin, k-idx, band-idx]
+    """Orbital information of the bands near the band edges.
+
+    The quantities are held in arrays of shape [spin, k-idx, band-idx], and
+    the orbitals in [spin, k-idx, band-idx, element-idx, l], where l stands
+    for s, p, d, (f). OrbitalInfo objects are generated only on demand.
+    """
+    energies: np.ndarray
+    occupations: np.ndarray
+    orbitals: np.ndarray
+    elements: List[str]
     kpt_coords: List[GenCoords]
     kpt_weights: List[float]
     lowest_band_index: int  # python convention starting from 0.
     fermi_level: float
     eigval_shift: float = 0.0
+    # nan when not calculated for a band, None when not calculated at all.
+    participation_ratios: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        self.energies = np.asarray(self.energies, dtype=float)
+        self.occupations = np.asarray(self.occupations, dtype=float)
+        self.orbitals = np.asarray(self.orbitals, dtype=float)
+        if self.participation_ratios is not None:
+            self.participation_ratios = np.asarray(self.participation_ratios,
+                                                   dtype=float)
+
+    @classmethod
+    def from_orbital_infos(cls,
+                           orbital_infos: List[List[List["OrbitalInfo"]]],
+                           kpt_coords: List[GenCoords],
+                           kpt_weights: List[float],
+                           lowest_band_index: int,
+                           fermi_level: float,
+                           eigval_shift: float = 0.0
+                           ) -> "BandEdgeOrbitalInfos":
+        """Construct from OrbitalInfo objects of [spin, k-idx, band-idx]. """
+        flat = [o for x in orbital_infos for y in x for o in y]
+        shape = np.shape(orbital_infos)
+        elements = list(flat[0].orbitals.keys())
+
+        p_ratios = [o.participation_ratio for o in flat]
+        if all(p is None for p in p_ratios):
+            p_ratios = None
+        else:
+            p_ratios = np.array([np.nan if p is None else p
+                                 for p in p_ratios]).reshape(shape)
+
+        num_l = len(flat[0].orbitals[elements[0]]) if elements else 0
+        orbitals = [[o.orbitals[e] for e in elements] for o in flat]
+        return cls(energies=np.reshape([o.energy for o in flat], shape),
+                   occupations=np.reshape([o.occupation for o in flat], shape),
+                   orbitals=np.reshape(orbitals, shape + (len(elements), num_l)),
+                   elements=elements,
+                   kpt_coords=kpt_coords,
+                   kpt_weights=kpt_weights,
+                   lowest_band_index=lowest_band_index,
+                   fermi_level=fermi_level,
+                   eigval_shift=eigval_shift,
+                   participation_ratios=p_ratios)
+
+    def as_dict(self) -> dict:
+        d = {"@module": self.__class__.__module__,
+             "@class": self.__class__.__name__,
+             "elements": list(self.elements),
+             "kpt_coords": [list(k) for k in self.kpt_coords],
+             "kpt_weights": list(self.kpt_weights),
+             "lowest_band_index": self.lowest_band_index,
+             "fermi_level": self.fermi_level,
+             "eigval_shift": self.eigval_shift}
+        for key in ["energies", "occupations", "orbitals",
+                    "participation_ratios"]:
+            value = getattr(self, key)
+            d[key] = None if value is None else value.tolist()
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "BandEdgeOrbitalInfos":
+        d = {k: v for k, v in d.items() if not k.startswith("@")}
+        # Old format holding the nested OrbitalInfo objects.
+        if "orbital_infos" in d:
+            orbital_infos = [[[o if isinstance(o, OrbitalInfo)
+                               else OrbitalInfo.from_dict(o) for o in y]
+                              for y in x] for x in d.pop("orbital_infos")]
+            return cls.from_orbital_infos(orbital_infos, **d)
+        return cls(**d)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """Numbers of spins, k-points, and bands. """
+        return self.energies.shape
+
+    def orbital_info(self, spin_idx: int, kpt_idx: int, band_idx: int
+                     ) -> "OrbitalInfo":
+        """OrbitalInfo view, where band_idx is counted from the lowest band.
+        """
+        idx = (spin_idx, kpt_idx, band_idx)
+        p_ratio = None
+        if self.participation_ratios is not None:
+            p_ratio = float(self.participation_ratios[idx])
+            p_ratio = None if np.isnan(p_ratio) else p_ratio
+        orbitals = dict(zip(self.elements, self.orbitals[idx].tolist()))
+        return OrbitalInfo(energy=float(self.energies[idx]),
+                           orbitals=orbitals,
+                           occupation=float(self.occupations[idx]),
+                           participation_ratio=p_ratio)
+
+    @property
+    def orbital_infos(self) -> List[List[List["OrbitalInfo"]]]:
+        """OrbitalInfo views of [spin, k-idx, band-idx]. """
+        num_spins, num_kpts, num_bands = self.shape
+        return [[[self.orbital_info(i, j, k) for k in range(num_bands)]
+                 for j in range(num_kpts)] for i in range(num_spins)]
 
     def kpt_idx(self, kpt_coord):
         for i, orig_kpt in enumerate(self.kpt_coords):
@@ -67,16 +173,11 @@ class BandEdgeOrbitalInfos(MSONable, ToJsonFileMixIn):
 
     @property
     def energies_and_occupations(self) -> List[List[List[List[float]]]]:
-        result = np.zeros(np.shape(self.orbital_infos) + (2,))
         if self.eigval_shift:
             logger.info(
                 f"The eigenvalues are shifted by {self.eigval_shift:4.2f}")
-        for i, x in enumerate(self.orbital_infos):
-            for j, y in enumerate(x):
-                for k, z in enumerate(y):
-                    result[i][j][k] = \
-                        [z.energy + self.eigval_shift, z.occupation]
-        return result.tolist()
+        return np.stack([self.energies + self.eigval_shift, self.occupations],
+                        axis=-1).tolist()
 
     def __str__(self):
         return "\n".join([" -- band-edge orbitals info",
@@ -93,12 +194,12 @@ class BandEdgeOrbitalInfos(MSONable, ToJsonFileMixIn):
         if self.eigval_shift:
             band_block[0].insert(3, "Shifted")
 
-        for orbital_info in self.orbital_infos:
-            max_idx, min_idx, t_orb_info = self._band_idx_range(orbital_info)
+        for spin_idx, occupations in enumerate(self.occupations):
+            max_idx, min_idx = self._band_idx_range(occupations)
             for band_idx in range(min_idx, max_idx):
                 actual_band_idx = band_idx + self.lowest_band_index + 1
-                for kpt_idx, orb_info in enumerate(t_orb_info[band_idx], 1):
-
+                for kpt_idx in range(self.shape[1]):
+                    orb_info = self.orbital_info(spin_idx, kpt_idx, band_idx)
                     energy = f"{orb_info.energy :5.2f}"
                     occupation = f"{orb_info.occupation:4.1f}"
                     if orb_info.participation_ratio:
@@ -106,7 +207,7 @@ class BandEdgeOrbitalInfos(MSONable, ToJsonFileMixIn):
                     else:
                         p_ratio = "N.A."
                     orbs = pretty_orbital(orb_info.orbitals)
-                    data = [actual_band_idx, kpt_idx, energy, occupation,
+                    data = [actual_band_idx, kpt_idx + 1, energy, occupation,
                             p_ratio, orbs]
                     if self.eigval_shift:
                         shifted = f"{orb_info.energy + self.eigval_shift :5.2f}"
@@ -127,20 +228,21 @@ class BandEdgeOrbitalInfos(MSONable, ToJsonFileMixIn):
         return tabulate(kpt_block, tablefmt="plain")
 
     @staticmethod
-    def _band_idx_range(orbital_info: List[List[OrbitalInfo]]
-                        ) -> Tuple[int, int, List[List[OrbitalInfo]]]:
-        # swap [kpt_idx][band_idx] -> [bane_idx][kpt_idx]
-        t_orbital_info = np.array(orbital_info).T.tolist()
-        middle_idx = int(len(t_orbital_info) / 2)
-        for band_idx, (upper, lower) in enumerate(zip(t_orbital_info[1:],
-                                                      t_orbital_info[:-1])):
-            # determine the band_idx where the occupation changes largely.
-            if lower[0].occupation - upper[0].occupation > 0.1:
-                middle_idx = band_idx + 1
-                break
-        max_idx = min(middle_idx + 3, len(t_orbital_info))
+    def _band_idx_range(occupations: np.ndarray) -> Tuple[int, int]:
+        """Band index range around the band where the occupation at the first
+        k-point changes largely.
+
+        Args:
+            occupations: Occupations of [k-idx, band-idx].
+        """
+        num_bands = occupations.shape[1]
+        middle_idx = int(num_bands / 2)
+        drops = np.where(-np.diff(occupations[0]) > 0.1)[0]
+        if len(drops):
+            middle_idx = int(drops[0]) + 1
+        max_idx = min(middle_idx + 3, num_bands)
         min_idx = max(middle_idx - 3, 0)
-        return max_idx, min_idx, t_orbital_info
+        return max_idx, min_idx
 
 
 @dataclass
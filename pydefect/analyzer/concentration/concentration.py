@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 #  Copyright (c) 2023 Kumagai group.
+from collections.abc import Sequence
 from dataclasses import dataclass
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
 
 import numpy as np
 from monty.json import MSONable
@@ -110,11 +111,111 @@ class Concentration(MSONable):
         return abs(self.net_charge) / self.abs_charge
 
 
+class ConcentrationColumns(Sequence, MSONable):
+    """Concentrations at Fermi levels stored as columns.
+
+    The Fermi levels, p and n are arrays, and the concentrations of all the
+    defect charge states are a (defect charge, Fermi level) matrix, whose
+    rows are given by names and charges only once. Indexing returns a
+    Concentration built from the columns on the fly. The Fermi levels are
+    sorted on initialization.
+    """
+    def __init__(self,
+                 Ef: List[float],
+                 p: List[float],
+                 n: List[float],
+                 names: List[str],
+                 charges: List[int],
+                 concentrations: List[List[float]]):
+        order = np.argsort(Ef, kind="stable")
+        self.Ef = np.asarray(Ef, dtype=float)[order]
+        self.p = np.asarray(p, dtype=float)[order]
+        self.n = np.asarray(n, dtype=float)[order]
+        self.names = list(names)
+        self.charges = [int(c) for c in charges]
+        self.concentrations = np.asarray(concentrations, dtype=float).reshape(
+            len(self.names), len(order))[:, order]
+
+    @classmethod
+    def from_concentrations(cls, concentrations: List[Concentration]
+                            ) -> "ConcentrationColumns":
+        """Raise ValueError if the defect charge states differ among the
+        concentrations. """
+        header = [(d.name, c) for d in concentrations[0].defects
+                  for c in d.charges] if concentrations else []
+        rows = []
+        for con in concentrations:
+            if [(d.name, c) for d in con.defects for c in d.charges] != header:
+                raise ValueError("Defect charge states are not common.")
+            rows.append([x for d in con.defects for x in d.concentrations])
+        return cls(Ef=[c.Ef for c in concentrations],
+                   p=[c.carrier.p for c in concentrations],
+                   n=[c.carrier.n for c in concentrations],
+                   names=[name for name, _ in header],
+                   charges=[charge for _, charge in header],
+                   concentrations=np.array(rows, dtype=float).reshape(
+                       len(concentrations), len(header)).T)
+
+    def __len__(self) -> int:
+        return len(self.Ef)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        defects = {}
+        for name, charge, con in zip(self.names, self.charges,
+                                     self.concentrations[:, index].tolist()):
+            d = defects.setdefault(name, DefectConcentration(name, [], []))
+            d.charges.append(charge)
+            d.concentrations.append(con)
+        return Concentration(float(self.Ef[index]),
+                             CarrierConcentration(float(self.p[index]),
+                                                  float(self.n[index])),
+                             list(defects.values()))
+
+    def __repr__(self):
+        Ef_range = (f"{self.Ef[0]:.3f} to {self.Ef[-1]:.3f}" if len(self)
+                    else "none")
+        return (f"ConcentrationColumns(Ef: {Ef_range} at {len(self)} points, "
+                f"{len(self.names)} defect charge states)")
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    @property
+    def total_concentrations(self) -> Dict[str, np.ndarray]:
+        names = np.array(self.names)
+        return {name: self.concentrations[names == name].sum(axis=0)
+                for name in dict.fromkeys(self.names)}
+
+    def as_dict(self) -> dict:
+        return {"@module": self.__class__.__module__,
+                "@class": self.__class__.__name__,
+                "Ef": self.Ef.tolist(),
+                "p": self.p.tolist(),
+                "n": self.n.tolist(),
+                "names": self.names,
+                "charges": self.charges,
+                "concentrations": self.concentrations.tolist()}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ConcentrationColumns":
+        return cls(**{k: v for k, v in d.items() if not k.startswith("@")})
+
+
 @dataclass
 class ConcentrationByFermiLevel(MSONable, ToJsonFileMixIn):
-    """Concentration per cell"""
+    """Concentration per cell
+
+    A list of concentrations, including that in the json file of old
+    versions, is converted to ConcentrationColumns when possible.
+    """
     T: float
-    concentrations: List[Concentration]
+    concentrations: Union[ConcentrationColumns, List[Concentration]]
     # Ex: pinning_levels[specie_name] = [float("-inf"), 1.0]
     # The VBM is set to zero.
     pinning_levels: Dict[str, List[Optional[float]]] = None
@@ -122,7 +223,27 @@ class ConcentrationByFermiLevel(MSONable, ToJsonFileMixIn):
     T_before_quench: float = None
 
     def __post_init__(self):
+        if isinstance(self.concentrations, ConcentrationColumns):
+            return
         self.concentrations.sort(key=lambda x: x.Ef)
+        try:
+            self.concentrations = \
+                ConcentrationColumns.from_concentrations(self.concentrations)
+        except ValueError:
+            pass
+
+    @property
+    def columns(self) -> ConcentrationColumns:
+        if isinstance(self.concentrations, ConcentrationColumns):
+            return self.concentrations
+        return ConcentrationColumns.from_concentrations(self.concentrations)
+
+    @property
+    def Efs(self) -> List[float]:
+        """Fermi levels, which can be non-uniform. """
+        if isinstance(self.concentrations, ConcentrationColumns):
+            return self.concentrations.Ef.tolist()
+        return [c.Ef for c in self.concentrations]
 
     @property
     def pinning_level(self):
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2023 Kumagai group.
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import List, Dict, Union
+
+import numpy as np
+from pydefect.analyzer.concentration.degeneracy import Degeneracies
+from pydefect.analyzer.concentration.make_concentration import \
+    MakeConcentrations, TotalDos, EquilibriumFermiLevelSolver
+from pydefect.analyzer.defect_energy import DefectEnergySummary
+from pydefect.chem_pot_diag.chem_pot_diag import ChemPotDiag, \
+    RelativeEnergies
+from scipy.spatial import Delaunay
+from vise.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+sampling_methods = ("grid", "random")
+# Singular values of the polygon vertices smaller than this (in eV) are
+# regarded as rounding errors of the chemical potentials.
+_flat_tol = 1e-3
+
+
+def _is_inside(points: np.ndarray, vertices: np.ndarray,
+               tol: float = 1e-8) -> np.ndarray:
+    """Whether points are inside the convex hull of vertices, both of which
+    are in the local coordinates of the polygon. """
+    if vertices.shape[1] == 0:
+        return np.ones(len(points), dtype=bool)
+    if vertices.shape[1] == 1:
+        return ((vertices.min() - tol <= points[:, 0])
+                & (points[:, 0] <= vertices.max() + tol))
+    return Delaunay(vertices).find_simplex(points, tol=tol) >= 0
+
+
+def sample_chem_pots(cpd: ChemPotDiag,
+                     num_points: int = 20,
+                     method: str = "grid",
+                     seed: int = None) -> np.ndarray:
+    """Relative chemical potentials inside the stability region of the target.
+
+    The vertices of the target polygon are projected onto their own affine
+    subspace, e.g., a plane for a ternary system, where the points are
+    sampled and projected back.
+
+    Args:
+        cpd: ChemPotDiag with the target.
+        num_points: Number of grid points along each axis for "grid", and
+            number of points for "random".
+        method: "grid" or "random".
+        seed: Seed of the random number generator.
+
+    Returns:
+        Array with the shape (point, element) in the order of
+        cpd.vertex_elements.
+    """
+    if method not in sampling_methods:
+        raise ValueError(f"method {method} is not in {sampling_methods}.")
+    vertices = np.array(cpd.polygons[cpd.target], dtype=float)
+    center = vertices.mean(axis=0)
+    _, s, vh = np.linalg.svd(vertices - center)
+    basis = vh[:np.sum(s > _flat_tol)]
+    local_vertices = (vertices - center) @ basis.T
+    lower, upper = local_vertices.min(axis=0), local_vertices.max(axis=0)
+
+    if method == "grid":
+        axes = [np.linspace(lo, up, num_points)
+                for lo, up in zip(lower, upper)]
+        points = np.array(np.meshgrid(*axes, indexing="ij")).reshape(
+            len(basis), -1).T
+        points = points[_is_inside(points, local_vertices)]
+    else:
+        rng = np.random.default_rng(seed)
+        points = np.zeros((0, len(basis)))
+        while len(points) < num_points:
+            candidates = rng.uniform(lower, upper, (num_points, len(basis)))
+            inside = candidates[_is_inside(candidates, local_vertices)]
+            points = np.concatenate([points, inside])
+        points = points[:num_points]
+
+    logger.info(f"Sample {len(points)} chemical potentials of {cpd.target}.")
+    return center + points @ basis
+
+
+@dataclass
+class ConcentrationMap:
+    """Equilibrium Fermi levels and concentrations in cm^-3 at the sampled
+    chemical potentials, stored as arrays in an npz file.
+
+    The columns of concentrations are the defect charge states given by
+    names and charges. Ef is NaN when the charge balance is not found.
+    """
+    T: float
+    elements: List[str]
+    chem_pots: np.ndarray  # (point, element)
+    Ef: np.ndarray  # (point,)
+    p: np.ndarray  # (point,)
+    n: np.ndarray  # (point,)
+    names: List[str]
+    charges: List[int]
+    concentrations: np.ndarray  # (point, defect charge)
+
+    @property
+    def total_concentrations(self) -> Dict[str, np.ndarray]:
+        return {name: self.concentrations[:, np.array(self.names) == name]
+                .sum(axis=1) for name in dict.fromkeys(self.names)}
+
+    @property
+    def dominant_defects(self) -> List[str]:
+        """Defect with the highest total concentration at each point. """
+        totals = self.total_concentrations
+        names = list(totals)
+        indices = np.argmax(np.array(list(totals.values())), axis=0)
+        return [names[i] for i in indices]
+
+    def dump(self, filename: Union[str, Path]) -> None:
+        np.savez_compressed(filename,
+                            T=self.T,
+                            elements=np.array(self.elements),
+                            chem_pots=self.chem_pots,
+                            Ef=self.Ef,
+                            p=self.p,
+                            n=self.n,
+                            names=np.array(self.names),
+                            charges=np.array(self.charges, dtype=int),
+                            concentrations=self.concentrations)
+
+    @classmethod
+    def from_file(cls, filename: Union[str, Path]) -> "ConcentrationMap":
+        with np.load(filename) as loaded:
+            return cls(T=float(loaded["T"]),
+                       elements=loaded["elements"].tolist(),
+                       chem_pots=loaded["chem_pots"],
+                       Ef=loaded["Ef"],
+                       p=loaded["p"],
+                       n=loaded["n"],
+                       names=loaded["names"].tolist(),
+                       charges=loaded["charges"].tolist(),
+                       concentrations=loaded["concentrations"])
+
+
+def impurity_chem_pots_at(host_chem_pots: np.ndarray,
+                          host_elements: List[str],
+                          impurity_elements: List[str],
+                          impurity_chem_pots: Dict[str, float] = None,
+                          relative_energies: RelativeEnergies = None
+                          ) -> np.ndarray:
+    """Relative chemical potentials of the impurity elements at each point.
+
+    Those in impurity_chem_pots are fixed over the points. The others are
+    the upper limits determined by the competing phases in
+    relative_energies at each host chemical potential, as those at the
+    vertices written by ChemPotDiagMaker.
+
+    Returns:
+        Array with the shape (point, impurity element).
+    """
+    impurity_chem_pots = impurity_chem_pots or {}
+    result = np.zeros((len(host_chem_pots), len(impurity_elements)))
+    for j, elem in enumerate(impurity_elements):
+        if elem in impurity_chem_pots:
+            result[:, j] = impurity_chem_pots[elem]
+        elif relative_energies is not None:
+            for i, point in enumerate(host_chem_pots):
+                host = dict(zip(host_elements, point.tolist()))
+                result[i, j] = relative_energies.impurity_chem_pot(elem,
+                                                                   host)[0]
+        else:
+            raise ValueError(f"Chemical potential of {elem} is not given. "
+                             f"Set impurity_chem_pots or relative_energies.")
+    return result
+
+
+def make_concentration_map(defect_energy_summary: DefectEnergySummary,
+                           cpd: ChemPotDiag,
+                           total_dos: TotalDos,
+                           degeneracies: Degeneracies,
+                           T: float,
+                           num_points: int = 20,
+                           method: str = "grid",
+                           allow_shallow: bool = False,
+                           with_corrections: bool = True,
+                           impurity_chem_pots: Dict[str, float] = None,
+                           relative_energies: RelativeEnergies = None,
+                           seed: int = None,
+                           net_abs_ratio: float = 1.0e-5,
+                           xtol: float = 1.0e-10) -> ConcentrationMap:
+    """Equilibrium concentrations over the stability region of the target.
+
+    The defect energies are calculated once at zero chemical potentials, and
+    the reservoir energies of all the sampled points are added as a matrix
+    product of the chemical potentials and the numbers of removed atoms.
+    Then, the charge neutrality of all the points is solved at once.
+
+    The chemical potentials of the impurity elements, which are not in the
+    chemical potential diagram, are approximations. When derived from
+    relative_energies, they are at the solubility limits at each point,
+    i.e., the impurity-rich condition, which is only an upper bound of the
+    actual impurity concentrations. When fixed by impurity_chem_pots, the
+    variation of the limits over the region is ignored, so the impurity
+    chemical potentials can exceed the limits at some points.
+
+    Args:
+        defect_energy_summary: DefectEnergySummary.
+        cpd: ChemPotDiag with the target.
+        total_dos: TotalDos.
+        degeneracies: Degeneracies.
+        T: Temperature in K.
+        num_points: See sample_chem_pots.
+        method: See sample_chem_pots.
+        allow_shallow: Whether the energies of shallow defects are used.
+        with_corrections: Whether the corrections are added to the energies.
+        impurity_chem_pots: Relative chemical potentials of the impurity
+            elements fixed over the points.
+        relative_energies: RelativeEnergies used to derive the chemical
+            potentials of the impurity elements not in impurity_chem_pots.
+        seed: See sample_chem_pots.
+        net_abs_ratio: See EquilibriumFermiLevelSolver.
+        xtol: See EquilibriumFermiLevelSolver.
+    """
+    impurity_elements = list(dict.fromkeys(
+        elem for des in defect_energy_summary.defect_energies.values()
+        for elem in des.atom_io if elem not in cpd.vertex_elements))
+    elements = cpd.vertex_elements + impurity_elements
+    chem_pots = sample_chem_pots(cpd, num_points, method, seed)
+    chem_pots = np.hstack([chem_pots, impurity_chem_pots_at(
+        chem_pots, cpd.vertex_elements, impurity_elements,
+        impurity_chem_pots, relative_energies)])
+
+    e_min, e_max = 0., defect_energy_summary.cbm
+    zero_chem_pot = dict.fromkeys(elements, 0.0)
+    charge_energies = defect_energy_summary.charge_energies_at_chem_pot(
+        zero_chem_pot, allow_shallow, with_corrections, [e_min, e_max],
+        name_style=False)
+    make_cc = MakeConcentrations(total_dos, charge_energies, degeneracies, T)
+
+    matrices = make_cc.matrices
+    atom_io = np.zeros((len(elements), len(matrices.names)))
+    for j, name in enumerate(matrices.names):
+        for elem, diff in defect_energy_summary.defect_energies[name]\
+                .atom_io.items():
+            atom_io[elements.index(elem), j] = diff
+    shifts = - chem_pots @ atom_io
+    make_cc.matrices = replace(matrices,
+                               energies=matrices.energies + shifts[..., None])
+
+    solver = EquilibriumFermiLevelSolver(make_cc.charges, net_abs_ratio, xtol)
+    Efs = solver.solve(e_min, e_max, (len(chem_pots),))
+    p, n = make_cc.make_carrier_concentrations.carrier_concentrations(Efs)
+    defects = make_cc.defect_concentrations(Efs)
+    return ConcentrationMap(
+        T=T,
+        elements=elements,
+        chem_pots=chem_pots,
+        Ef=Efs,
+        p=p,
+        n=n,
+        names=matrices.column_names,
+        charges=matrices.column_charges,
+        concentrations=defects[:, matrices.mask])
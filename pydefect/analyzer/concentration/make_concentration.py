@@ -2,17 +2,18 @@
 #  Copyright (c) 2023 Kumagai group.
 from abc import ABCMeta, abstractmethod
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Callable
 
 import numpy as np
 from monty.json import MSONable
 from pydefect.analyzer.concentration.concentration import DefectConcentration, \
     CarrierConcentration, Concentration, \
-    ConcentrationByFermiLevel
+    ConcentrationByFermiLevel, ConcentrationColumns
 from pydefect.analyzer.concentration.degeneracy import Degeneracies
 from pydefect.analyzer.concentration.distribution_function import \
-    boltzmann_dist, fermi_dirac
-from pydefect.analyzer.defect_energy import ChargeEnergies, SingleChargeEnergies
+    boltzmann_dist, k
+from pydefect.analyzer.defect_energy import ChargeEnergies
+from scipy.special import expit
 from tabulate import tabulate
 from vise.util.logger import get_logger
 from vise.util.mix_in import ToJsonFileMixIn
@@ -75,13 +76,120 @@ class MakeCarrierConcentrations:
         n = self.cb_dos.carrier_concentration(Ef, self.T) / self._V
         return CarrierConcentration(p, n)
 
-    def _concentration(self, Ef):
-        return Concentration(Ef, self.carrier_concentration(Ef), [])
+    def carrier_concentrations(self, Efs, T=None
+                               ) -> Tuple[np.ndarray, np.ndarray]:
+        """p and n in cm^-3 for arrays of Fermi levels and temperatures.
+
+        See Dos.carrier_concentrations for the broadcasting. T defaults to
+        the temperature of this object.
+        """
+        T = self.T if T is None else T
+        p = self.vb_dos.carrier_concentrations(Efs, T) / self._V
+        n = self.cb_dos.carrier_concentrations(Efs, T) / self._V
+        return p, n
 
     def make_concentrations_by_fermi_level(self, Efs: List[float],
                                            ) -> ConcentrationByFermiLevel:
-        concentrations = [self._concentration(Ef) for Ef in Efs]
-        return ConcentrationByFermiLevel(self.T, concentrations, None)
+        p, n = self.carrier_concentrations(Efs)
+        columns = ConcentrationColumns(Efs, p, n, [], [],
+                                       np.zeros((0, len(p))))
+        return ConcentrationByFermiLevel(self.T, columns, None)
+
+    def log_concentrations(self, Efs: np.ndarray) -> np.ndarray:
+        """log10 of p and n with the shape (Ef, 2). """
+        return _log10(np.stack(self.carrier_concentrations(Efs), axis=-1))
+
+    def adaptive_fermi_levels(self, e_min: float, e_max: float,
+                              **kwargs) -> List[float]:
+        """See adaptive_fermi_levels for kwargs. """
+        return adaptive_fermi_levels(self.log_concentrations, e_min, e_max,
+                                     **kwargs)
+
+
+@dataclass
+class DefectMatrices:
+    """Energies, charges and degeneracies of all the defects as matrices.
+
+    Rows are the defects and columns are their charge states, which are
+    padded for the defects with fewer charge states. The padded elements
+    have infinite energies and zero degeneracies, so that their
+    concentrations are always zero.
+    """
+    names: List[str]
+    charges: np.ndarray  # int (defect, charge)
+    energies: np.ndarray  # (defect, charge) at Ef=0
+    degeneracies: np.ndarray  # (defect, charge)
+    mask: np.ndarray  # bool (defect, charge), False for the padding.
+
+    @classmethod
+    def from_charge_energies(cls,
+                             charge_energies: ChargeEnergies,
+                             degeneracies: Degeneracies) -> "DefectMatrices":
+        singles = charge_energies.charge_energies_dict
+        shape = (len(singles),
+                 max([len(s.charge_energies) for s in singles.values()],
+                     default=0))
+        charges = np.zeros(shape, dtype=int)
+        energies = np.full(shape, np.inf)
+        degs = np.zeros(shape)
+        mask = np.zeros(shape, dtype=bool)
+        for i, (name, single) in enumerate(singles.items()):
+            for j, (charge, energy) in enumerate(single.charge_energies):
+                charges[i, j], energies[i, j] = charge, energy
+                degs[i, j] = degeneracies[name][charge].degeneracy
+                mask[i, j] = True
+        return cls(list(singles), charges, energies, degs, mask)
+
+    def concentrations(self, Efs, T, volume: float,
+                       totals: np.ndarray = None) -> np.ndarray:
+        """Defect concentrations broadcast over Fermi levels and temperatures.
+
+        Args:
+            Efs: Fermi levels broadcastable to T.
+            T: Temperatures.
+            volume: Volume in cm^3.
+            totals: Total concentrations of each defect in cm^-3 with the
+                shape (..., defect), over which the charge states are
+                redistributed if given.
+
+        Returns:
+            Array with the shape (*broadcast(Efs, T).shape, defect, charge).
+        """
+        Efs = np.asarray(Efs, dtype=float)[..., None, None]
+        T = np.asarray(T, dtype=float)[..., None, None]
+        with np.errstate(over="ignore"):
+            result = (boltzmann_dist(self.energies + self.charges * Efs, T)
+                      * self.degeneracies / volume)
+        if totals is not None:
+            result *= (np.asarray(totals)[..., None]
+                       / result.sum(axis=-1, keepdims=True))
+        return result
+
+    @property
+    def column_names(self) -> List[str]:
+        """Defect names of the charge states without the padding. """
+        return np.repeat(self.names, self.mask.sum(axis=1)).tolist()
+
+    @property
+    def column_charges(self) -> List[int]:
+        return self.charges[self.mask].tolist()
+
+    def totals(self, fixed_defect_concentrations: Dict[str, float]
+               ) -> np.ndarray:
+        return np.array([fixed_defect_concentrations[name]
+                         for name in self.names])
+
+    def to_defect_concentrations(self, concentrations: np.ndarray
+                                 ) -> List[DefectConcentration]:
+        """Concentrations of a single Fermi level with (defect, charge) shape.
+        """
+        result = []
+        for name, charges, cons, mask in zip(self.names, self.charges,
+                                             concentrations, self.mask):
+            result.append(DefectConcentration(name,
+                                              charges[mask].tolist(),
+                                              cons[mask].tolist()))
+        return result
 
 
 class MakeConcentrations:
@@ -102,19 +210,8 @@ class MakeConcentrations:
         self.T = T
         self.charge_energies = charge_energies
         self._degeneracies = degeneracies
-
-    def _make_defect_concentration(self,
-                                   name: str,
-                                   Ef: float,
-                                   single_energies: SingleChargeEnergies):
-        charges, concentrations = [], []
-        for (c, e) in single_energies.charge_energies_at_ef(Ef):
-            charges.append(c)
-            deg = self._degeneracies[name][c].degeneracy
-            concentrations.append(boltzmann_dist(e, self.T) * deg / self._V)
-
-        concentrations = self._redistribute(concentrations, name)
-        return DefectConcentration(name, charges, concentrations)
+        self.matrices = DefectMatrices.from_charge_energies(charge_energies,
+                                                            degeneracies)
 
     def _calc_pinning(self, single_energies):
         pin_level = single_energies.pinning_level(float("-inf"), float("inf"))
@@ -128,31 +225,81 @@ class MakeConcentrations:
             upper = float("inf")
         return [lower, upper]
 
-    def _redistribute(self, concentrations, name):
-        if self.fixed_con:
-            return redistribute_concentration(
-                concentrations, self.fixed_con[name])
-        return concentrations
-
-    def _make_all_concentration(self, Ef: float):
-        carrier = self.make_carrier_concentrations.carrier_concentration(Ef)
-
-        defects = []
-        for name, single in self.charge_energies.charge_energies_dict.items():
-            concentration = self._make_defect_concentration(name, Ef, single)
-            defects.append(concentration)
-
+    def defect_concentrations(self, Efs, T=None, totals=None) -> np.ndarray:
+        """Concentrations with the shape (*Efs.shape, defect, charge).
+
+        See DefectMatrices.concentrations for the broadcasting. T defaults
+        to the temperature of this object, and totals to the fixed defect
+        concentrations.
+        """
+        T = self.T if T is None else T
+        if totals is None and self.fixed_con:
+            totals = self.matrices.totals(self.fixed_con)
+        return self.matrices.concentrations(Efs, T, self._V, totals)
+
+    def charges(self, Efs, T=None, totals=None
+                ) -> Tuple[np.ndarray, np.ndarray]:
+        """Positive and negative charges in cm^-3 with the broadcast shape of
+        Efs and T. """
+        p, n = self.make_carrier_concentrations.carrier_concentrations(Efs, T)
+        defect_charges = (self.matrices.charges
+                          * self.defect_concentrations(Efs, T, totals))
+        positive = np.where(defect_charges > 0, defect_charges, 0.0)
+        negative = np.where(defect_charges < 0, -defect_charges, 0.0)
+        return (p + positive.sum(axis=(-2, -1)),
+                n + negative.sum(axis=(-2, -1)))
+
+    def net_charges(self, Efs, T=None, totals=None) -> np.ndarray:
+        """Net charges in cm^-3 with the broadcast shape of Efs and T. """
+        positive, negative = self.charges(Efs, T, totals)
+        return positive - negative
+
+    def _make_all_concentration(self, Ef: float,
+                                carrier: CarrierConcentration = None):
+        carrier = (carrier or
+                   self.make_carrier_concentrations.carrier_concentration(Ef))
+        defects = self.matrices.to_defect_concentrations(
+            self.defect_concentrations(Ef))
         return Concentration(Ef, carrier, defects)
 
     def make_concentrations_by_fermi_level(self, Efs: List[float],
                                            ) -> ConcentrationByFermiLevel:
-        concentrations = [self._make_all_concentration(Ef) for Ef in Efs]
+        p, n = self.make_carrier_concentrations.carrier_concentrations(Efs)
+        defects = self.defect_concentrations(Efs)
+        columns = ConcentrationColumns(
+            Efs, p, n,
+            names=self.matrices.column_names,
+            charges=self.matrices.column_charges,
+            concentrations=defects[:, self.matrices.mask].T)
         pinning_levels = self.charge_energies.pinning_levels
         return ConcentrationByFermiLevel(self.T,
-                                         concentrations,
+                                         columns,
                                          pinning_levels)
 
+    def log_concentrations(self, Efs: np.ndarray) -> np.ndarray:
+        """log10 of p, n and the total concentrations of the defects, which
+        are plotted, with the shape (Ef, 2 + defect). """
+        p, n = self.make_carrier_concentrations.carrier_concentrations(Efs)
+        totals = self.defect_concentrations(Efs).sum(axis=-1)
+        return _log10(np.column_stack([p, n, totals]))
 
+    @property
+    def characteristic_fermi_levels(self) -> List[float]:
+        """Transition levels and pinning levels of all the defects. """
+        result = []
+        for cross_points in self.charge_energies.cross_point_dicts.values():
+            result.extend(float(x) for x, _ in cross_points.inner_cross_points)
+        for levels in self.charge_energies.pinning_levels.values():
+            result.extend(level for level in levels if level is not None)
+        return result
+
+    def adaptive_fermi_levels(self, e_min: float, e_max: float,
+                              **kwargs) -> List[float]:
+        """Fermi levels refined from the transition and pinning levels.
+        See adaptive_fermi_levels for kwargs. """
+        return adaptive_fermi_levels(self.log_concentrations, e_min, e_max,
+                                     self.characteristic_fermi_levels,
+                                     **kwargs)
 
 
 def redistribute_concentration(
@@ -161,30 +308,188 @@ def redistribute_concentration(
     return (np.array(concentrations) * factor).tolist()
 
 
-def equilibrium_concentration(make_cc: MakeConcentrations,
-                              e_min: float,
-                              e_max: float,
-                              n: int = 10,
-                              n_iter: int = 10,
-                              net_abs_ratio: float = 1.0e-5
-                              ) -> Optional[Concentration]:
-    Efs = np.linspace(e_min, e_max, n + 1).tolist()
+class EquilibriumFermiLevelSolver:
+    """Root finder of the charge neutrality condition along the Fermi level
+    for many conditions, e.g., temperatures, at once.
+
+    The net charge decreases monotonically with the Fermi level, while the
+    concentrations span tens of orders of magnitude. Therefore, the root of
+    log(positive charge) - log(negative charge) is searched instead, which
+    has the same sign as the net charge and varies smoothly. The Illinois
+    variant of the false position method, or the bisection, is applied to
+    all the conditions in parallel, and each of them stops as soon as its
+    charges satisfy net_abs_ratio. The Fermi level is NaN when the charge
+    balance is out of the range, or when the bracket shrinks within xtol or
+    maxiter is reached without satisfying net_abs_ratio.
+
+    Args:
+        charges: Function returning the positive and negative charges for
+            an array of Fermi levels with the shape of the conditions.
+        net_abs_ratio: Tolerance of |net charge| / (sum of |charges|).
+        xtol: Tolerance of the Fermi level in eV.
+        maxiter: Maximum number of iterations of the root finding.
+        method: "illinois" or "bisect".
+    """
+    methods = ("illinois", "bisect")
 
-    for i in range(n_iter):
-        logger.info(f"Calc equilibrium concentration: iteration {i}")
-        cons_Ef = make_cc.make_concentrations_by_fermi_level(Efs)
+    def __init__(self,
+                 charges: Callable[[np.ndarray],
+                                   Tuple[np.ndarray, np.ndarray]],
+                 net_abs_ratio: float = 1.0e-5,
+                 xtol: float = 1.0e-10,
+                 maxiter: int = 100,
+                 method: str = "illinois"):
+        if method not in self.methods:
+            raise ValueError(f"method {method} is not in {self.methods}.")
+        self.charges = charges
+        self.net_abs_ratio = net_abs_ratio
+        self.xtol = xtol
+        self.maxiter = maxiter
+        self.method = method
+        self.num_evaluations = 0
+
+    def log_charge_ratio(self, Efs: np.ndarray
+                         ) -> Tuple[np.ndarray, np.ndarray]:
+        """log(positive charge) - log(negative charge) at Efs, and whether
+        the charges satisfy net_abs_ratio. """
+        self.num_evaluations += 1
+        positive, negative = self.charges(Efs)
+        tiny = np.finfo(float).tiny
+        with np.errstate(invalid="ignore"):
+            is_converged = (np.abs(positive - negative)
+                            < self.net_abs_ratio * (positive + negative))
+        return (np.log(positive + tiny) - np.log(negative + tiny),
+                is_converged)
+
+    def solve(self, e_min: float, e_max: float, shape: Tuple[int, ...] = ()
+              ) -> np.ndarray:
+        """Fermi levels with the shape of the conditions. """
+        a, b = np.full(shape, float(e_min)), np.full(shape, float(e_max))
+        fa, converged_a = self.log_charge_ratio(a)
+        fb, converged_b = self.log_charge_ratio(b)
+        result = np.where(converged_a, a, np.where(converged_b, b, np.nan))
+        out_of_range = ~(converged_a | converged_b) & (fa * fb > 0)
+        active = ~(converged_a | converged_b | out_of_range)
+
+        for _ in range(self.maxiter):
+            if not np.any(active):
+                break
+            middle = (a + b) / 2
+            if self.method == "illinois":
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    c = b - fb * (b - a) / (fb - fa)
+                # Fall back to the bisection when the secant leaves the
+                # bracket, e.g., for equal values.
+                is_inside = (np.minimum(a, b) < c) & (c < np.maximum(a, b))
+                c = np.where(is_inside, c, middle)
+            else:
+                c = middle
+            fc, converged_c = self.log_charge_ratio(c)
+
+            result = np.where(active & converged_c, c, result)
+            # The root is kept between a and b, where b is the latest point.
+            is_crossed = fc * fb < 0
+            a, fa = (np.where(is_crossed, b, a), np.where(is_crossed, fb, fa))
+            if self.method == "illinois":
+                fa = np.where(is_crossed, fa, fa / 2)
+            b, fb = c, fc
+            active &= ~converged_c & (np.abs(b - a) >= self.xtol)
+
+        num_conditions = int(np.prod(shape))
+        if np.any(out_of_range):
+            logger.warning(f"Charge balance is out of {e_min}--{e_max} for "
+                           f"{np.sum(out_of_range)} of {num_conditions} "
+                           f"conditions.")
+        not_converged = np.isnan(result) & ~out_of_range
+        if np.any(not_converged):
+            logger.warning(f"No convergence is obtained for "
+                           f"{np.sum(not_converged)} of {num_conditions} "
+                           f"conditions.")
+        logger.info(f"Equilibrium Fermi levels are searched with "
+                    f"{self.num_evaluations} evaluations.")
+        return result
 
-        if cons_Ef.most_neutral_concentration.net_abs_ratio < net_abs_ratio:
-            logger.info(f"Equilibrium concentration is found.")
-            return cons_Ef.most_neutral_concentration
 
-        Efs = cons_Ef.next_Ef_to_neutral_concentration(n)
+def _log10(concentrations: np.ndarray) -> np.ndarray:
+    return np.log10(np.maximum(concentrations, np.finfo(float).tiny))
+
+
+def adaptive_fermi_levels(log_concentrations: Callable[[np.ndarray],
+                                                       np.ndarray],
+                          e_min: float,
+                          e_max: float,
+                          initial_Efs: List[float] = None,
+                          tol: float = 0.1,
+                          num_initial: int = 11,
+                          min_interval: float = 1.0e-3,
+                          max_points: int = 1000) -> List[float]:
+    """Non-uniform Fermi levels on which the log concentrations are linearly
+    interpolated within tol.
+
+    Starting from a coarse uniform grid plus initial_Efs, every interval is
+    bisected, and the midpoint is kept when the log concentrations there
+    deviate from the linear interpolation of the end points by more than
+    tol, i.e., where their curvature is high. Then the two halves are
+    examined again. All the midpoints of an iteration are evaluated at once.
+
+    Args:
+        log_concentrations: Function returning the log10 of the concentrations
+            with the shape (Ef, quantity) for an array of Fermi levels.
+        e_min: Lower bound of the Fermi level.
+        e_max: Upper bound of the Fermi level.
+        initial_Efs: Fermi levels to be included, e.g., transition levels.
+            Those out of the range are ignored.
+        tol: Tolerance of the log10 concentrations.
+        num_initial: Number of the uniform grid points at the beginning.
+        min_interval: Intervals shorter than this in eV are not divided.
+        max_points: Refinement stops when the number of points exceeds this.
+
+    Returns:
+        Sorted Fermi levels.
+    """
+    Efs = np.linspace(e_min, e_max, num_initial).tolist()
+    Efs.extend(e for e in initial_Efs or [] if e_min < e < e_max)
+    Efs = np.unique(Efs)
+    values = dict(zip(Efs.tolist(), log_concentrations(Efs)))
+
+    intervals = list(zip(Efs[:-1], Efs[1:]))
+    while intervals and len(values) < max_points:
+        intervals = [(a, b) for a, b in intervals if b - a > min_interval]
+        if not intervals:
+            break
+        middles = np.array([(a + b) / 2 for a, b in intervals])
+        middle_values = log_concentrations(middles)
+        next_intervals = []
+        for (a, b), m, v in zip(intervals, middles.tolist(), middle_values):
+            error = np.abs(v - (values[a] + values[b]) / 2)
+            if np.nanmax(error, initial=0.0) > tol:
+                values[m] = v
+                next_intervals.extend([(a, m), (m, b)])
+        intervals = next_intervals
+
+    logger.info(f"{len(values)} Fermi levels are sampled.")
+    return sorted(values)
 
-        if Efs is None:
-            logger.warning(f"Charge balance is out of {e_min}--{e_max}.")
-            return
 
-    logger.warning("No convergence is obtained.")
+def equilibrium_concentration(make_cc: MakeConcentrations,
+                              e_min: float,
+                              e_max: float,
+                              net_abs_ratio: float = 1.0e-5,
+                              xtol: float = 1.0e-10,
+                              maxiter: int = 100,
+                              method: str = "illinois"
+                              ) -> Optional[Concentration]:
+    """Concentration at the charge neutrality between e_min and e_max.
+
+    None is returned when the charge neutrality is not found. See
+    EquilibriumFermiLevelSolver for the arguments.
+    """
+    solver = EquilibriumFermiLevelSolver(make_cc.charges, net_abs_ratio,
+                                         xtol, maxiter, method)
+    Ef = float(solver.solve(e_min, e_max))
+    if np.isnan(Ef):
+        return
+    return make_cc._make_all_concentration(Ef)
 
 
 @dataclass
@@ -193,14 +498,24 @@ class Dos(metaclass=ABCMeta):
     doses: List[float]
 
     def carrier_concentration(self, Ef, T) -> float:
-        result = 0.0
-        for E, dos in zip(self.energies, self.doses):
-            result += self.interval * dos * self._fermi_dirac(Ef, E, T)
-        return result
+        return float(self.carrier_concentrations(Ef, T))
+
+    def carrier_concentrations(self, Efs, T) -> np.ndarray:
+        """Carrier concentrations broadcast over Fermi levels and temperatures.
+
+        Efs and T can be scalars or arrays broadcastable to each other, e.g.,
+        Efs with shape (num_T, num_Ef) and T with shape (num_T, 1). The DOS
+        energies are added as the last axis and summed up.
+        """
+        Efs = np.asarray(Efs, dtype=float)[..., None]
+        T = np.asarray(T, dtype=float)[..., None]
+        occupations = self._occupation(Efs, np.array(self.energies), T)
+        return self.interval * occupations @ np.array(self.doses)
 
     @staticmethod
     @abstractmethod
-    def _fermi_dirac(Ef, E, T):
+    def _occupation(Ef, E, T):
+        """Carrier occupation calculated with expit not to overflow. """
         pass
 
     @property
@@ -212,13 +527,15 @@ class VBDos(Dos):
     carrier_type = "p"
 
     @staticmethod
-    def _fermi_dirac(Ef, E, T):
-        return fermi_dirac(Ef - E, T)
+    def _occupation(Ef, E, T):
+        # fermi_dirac(Ef - E, T)
+        return expit((E - Ef) / (k * T))
 
 
 class CBDos(Dos):
     carrier_type = "n"
 
     @staticmethod
-    def _fermi_dirac(Ef, E, T):
-        return fermi_dirac(E - Ef, T)
\ No newline at end of file
+    def _occupation(Ef, E, T):
+        # fermi_dirac(E - Ef, T)
+        return expit((Ef - E) / (k * T))
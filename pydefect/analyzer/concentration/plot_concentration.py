@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 #  Copyright (c) 2023 Kumagai group.
-from collections import defaultdict
 from typing import List
 
 from matplotlib import pyplot as plt
@@ -30,15 +29,10 @@ def plot_multiple_pns(ccs: List[ConcentrationByFermiLevel],
 
 
 def plot_pn(cc: ConcentrationByFermiLevel, ax: Axes, style: str = "-"):
-    Efs, ps, ns = [], [], []
-    for c in cc.concentrations:
-        Efs.append(c.Ef)
-        ps.append(c.carrier.p)
-        ns.append(c.carrier.n)
-
+    columns = cc.columns
     ax.set_yscale("log")
-    ax.plot(Efs, ps, color="red", linestyle=style, label=cc.T)
-    ax.plot(Efs, ns, color="blue", linestyle=style)
+    ax.plot(columns.Ef, columns.p, color="red", linestyle=style, label=cc.T)
+    ax.plot(columns.Ef, columns.n, color="blue", linestyle=style)
     ax.legend()
 
 
@@ -58,14 +52,9 @@ class DefectConcentrationMplPlotter:
         self._set_formatter()
 
     def _plot_defect_concentration(self):
-        Efs, ddd = [], defaultdict(list)
-        for cc in self.con_by_Ef.concentrations:
-            Efs.append(cc.Ef)
-            for defect in cc.defects:
-                ddd[defect.name].append(defect.total_concentration)
-
-        for name, dd in ddd.items():
-            self.ax.plot(Efs, dd, label=name)
+        columns = self.con_by_Ef.columns
+        for name, dd in columns.total_concentrations.items():
+            self.ax.plot(columns.Ef, dd, label=name)
 
     def _set_scale(self):
         self.ax.set_yscale("log")
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2023 Kumagai group.
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+from monty.json import MSONable
+from pydefect.analyzer.concentration.concentration import Concentration, \
+    CarrierConcentration, DefectConcentration
+from pydefect.analyzer.concentration.degeneracy import Degeneracies
+from pydefect.analyzer.concentration.make_concentration import \
+    MakeConcentrations, TotalDos, EquilibriumFermiLevelSolver
+from pydefect.analyzer.defect_energy import ChargeEnergies
+from tabulate import tabulate
+from vise.util.logger import get_logger
+from vise.util.mix_in import ToJsonFileMixIn
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ConcentrationsByTemperature(MSONable):
+    """Equilibrium concentrations in cm^-3 at each temperature.
+
+    The columns of concentrations are the defect charge states listed in
+    TemperatureSweep. Ef is NaN when the charge balance is not found.
+    """
+    T: List[float]
+    Ef: List[float]
+    p: List[float]
+    n: List[float]
+    concentrations: List[List[float]]  # (temperature, defect charge)
+
+
+@dataclass
+class TemperatureSweep(MSONable, ToJsonFileMixIn):
+    """Equilibrium concentrations at growth temperatures, and optionally those
+    quenched from each growth temperature to T_quench, where the total
+    concentrations of each defect are kept.
+    """
+    names: List[str]
+    charges: List[int]
+    growth: ConcentrationsByTemperature
+    quenched: Optional[ConcentrationsByTemperature] = None
+
+    @property
+    def T_quench(self) -> Optional[float]:
+        return self.quenched.T[0] if self.quenched else None
+
+    def concentration(self, index: int, quenched: bool = False
+                      ) -> Concentration:
+        """Concentration at the index-th growth temperature. """
+        by_T = self.quenched if quenched else self.growth
+        defects = {}
+        for name, charge, con in zip(self.names, self.charges,
+                                     by_T.concentrations[index]):
+            d = defects.setdefault(name, DefectConcentration(name, [], []))
+            d.charges.append(charge)
+            d.concentrations.append(con)
+        carrier = CarrierConcentration(by_T.p[index], by_T.n[index])
+        return Concentration(by_T.Ef[index], carrier, list(defects.values()))
+
+    def __str__(self):
+        headers = ["T", "Ef", "p", "n"]
+        table = [[T, Ef, p, n] for T, Ef, p, n in zip(
+            self.growth.T, self.growth.Ef, self.growth.p, self.growth.n)]
+        if self.quenched:
+            headers.extend(["quenched Ef", "quenched p", "quenched n"])
+            for row, Ef, p, n in zip(table, self.quenched.Ef, self.quenched.p,
+                                     self.quenched.n):
+                row.extend([Ef, p, n])
+        result = [f"T_quench: {self.T_quench}"] if self.quenched else []
+        floatfmt = [".1f", ".3f", ".1e", ".1e", ".3f", ".1e", ".1e"]
+        result.append(tabulate(table, headers=headers, floatfmt=floatfmt))
+        return "\n".join(result)
+
+
+def _by_temperature(make_cc: MakeConcentrations,
+                    Efs: np.ndarray,
+                    T: np.ndarray,
+                    totals: np.ndarray = None
+                    ) -> ConcentrationsByTemperature:
+    p, n = make_cc.make_carrier_concentrations.carrier_concentrations(Efs, T)
+    defects = make_cc.defect_concentrations(Efs, T, totals)
+    concentrations = defects[:, make_cc.matrices.mask]
+    return ConcentrationsByTemperature(T=T.tolist(),
+                                       Ef=Efs.tolist(),
+                                       p=p.tolist(),
+                                       n=n.tolist(),
+                                       concentrations=concentrations.tolist())
+
+
+def sweep_temperatures(total_dos: TotalDos,
+                       charge_energies: ChargeEnergies,
+                       degeneracies: Degeneracies,
+                       temperatures: List[float],
+                       T_quench: float = None,
+                       e_min: float = None,
+                       e_max: float = None,
+                       net_abs_ratio: float = 1.0e-5,
+                       xtol: float = 1.0e-10) -> TemperatureSweep:
+    """Equilibrium concentrations at all the temperatures at once.
+
+    The DOS and the defect matrices are prepared once, and the charge
+    neutrality of all the temperatures is solved at once with
+    EquilibriumFermiLevelSolver.
+
+    Args:
+        total_dos: TotalDos.
+        charge_energies: ChargeEnergies.
+        degeneracies: Degeneracies.
+        temperatures: Growth temperatures in K.
+        T_quench: Temperature in K to which the defects are quenched.
+        e_min: Lower bound of the Fermi level. Defaults to that of
+            charge_energies.
+        e_max: Upper bound of the Fermi level. Defaults to that of
+            charge_energies.
+        net_abs_ratio: See EquilibriumFermiLevelSolver.
+        xtol: See EquilibriumFermiLevelSolver.
+    """
+    e_min = charge_energies.e_min if e_min is None else e_min
+    e_max = charge_energies.e_max if e_max is None else e_max
+    make_cc = MakeConcentrations(total_dos, charge_energies, degeneracies,
+                                 T=temperatures[0])
+    T = np.array(temperatures, dtype=float)
+
+    def solve(T_, totals=None):
+        solver = EquilibriumFermiLevelSolver(
+            lambda x: make_cc.charges(x, T_, totals), net_abs_ratio, xtol)
+        Efs = solver.solve(e_min, e_max, T_.shape)
+        return _by_temperature(make_cc, Efs, T_, totals)
+
+    logger.info(f"Solve the charge neutrality at {len(T)} temperatures.")
+    growth = solve(T)
+    quenched = None
+    if T_quench is not None:
+        defects = make_cc.defect_concentrations(np.array(growth.Ef), T)
+        logger.info(f"Quench the defects to {T_quench} K.")
+        quenched = solve(np.full_like(T, T_quench), defects.sum(axis=-1))
+
+    return TemperatureSweep(make_cc.matrices.column_names,
+                            make_cc.matrices.column_charges, growth, quenched)
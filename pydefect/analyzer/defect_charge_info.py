@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 #  Copyright (c) 2020 Kumagai group.
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import List, Optional
 
 import numpy as np
 from matplotlib import pyplot as plt
@@ -27,6 +27,8 @@ class DefectChargeInfo(MSONable, ToJsonFileMixIn):
     band_idxs: List[int]
     charge_dists: List[List[AveChargeDensityDist]]  # [band-idx, spin]
     ave_charge_density: float
+    _cumulative_cache: Optional[np.ndarray] = \
+        field(default=None, init=False, repr=False, compare=False)
 
     def ave_chg_dens_distribution(self, band_idx: int, spin: Spin):
         spin_idx = 0 if spin == Spin.up else 1
@@ -35,9 +37,53 @@ class DefectChargeInfo(MSONable, ToJsonFileMixIn):
 
     def sum_chg_dens_distribution(self, band_idx: int, spin: Spin):
         ave = self.ave_chg_dens_distribution(band_idx, spin)
-        volumes = (np.array(self.distance_bins[1:]) ** 3
-                   - np.array(self.distance_bins[:-1]) ** 3) * 4 / 3 * np.pi
-        return list(ave * volumes)
+        return list(ave * self._shell_volumes)
+
+    @property
+    def _shell_volumes(self) -> np.ndarray:
+        bins = np.array(self.distance_bins)
+        return (bins[1:] ** 3 - bins[:-1] ** 3) * 4 / 3 * np.pi
+
+    @property
+    def cumulative_charges(self) -> np.ndarray:
+        """Charges inside the distance bins with shape (band, spin, bin).
+
+        Computed once from charge_dists, so modify charge_dists or
+        distance_bins only through a new instance.
+        """
+        if self._cumulative_cache is None:
+            radial_dists = np.array([[d.radial_dist for d in c_dist]
+                                     for c_dist in self.charge_dists],
+                                    dtype=float)
+            charges = radial_dists * self._shell_volumes
+            self._cumulative_cache = np.cumsum(charges, axis=-1)
+        return self._cumulative_cache
+
+    @property
+    def half_charge_radii(self) -> np.ndarray:
+        """Radii containing 0.5 e- with shape (band, spin).
+
+        The radius is linearly interpolated inside the first bin whose
+        cumulative charge exceeds 0.5, and is nan if no such bin exists.
+        """
+        cumulative = self.cumulative_charges
+        num_bins = cumulative.shape[-1]
+        # The cumulative charges are monotonic, so counting the bins <= 0.5
+        # is np.searchsorted(side="right") applied to every band and spin.
+        pos = np.count_nonzero(cumulative <= 0.5, axis=-1)
+        found = pos < num_bins
+        pos = np.minimum(pos, num_bins - 1)
+
+        bins = np.array(self.distance_bins)
+        c_sum = np.take_along_axis(cumulative, pos[..., None], -1)[..., 0]
+        prev = np.where(pos > 0,
+                        np.take_along_axis(cumulative, np.maximum(pos - 1, 0)
+                                           [..., None], -1)[..., 0], 0.0)
+        c = c_sum - prev
+        start, end = bins[pos], bins[pos + 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            radii = start + (end - start) * (c + 0.5 - c_sum) / c
+        return np.where(found, radii, np.nan)
 
     @property
     def uniform_half_charge_radius(self):
@@ -48,15 +94,12 @@ class DefectChargeInfo(MSONable, ToJsonFileMixIn):
         return len(self.charge_dists[0]) == 2
 
     def half_charge_radius(self, band_idx: int, spin: Spin):
-        charge_sum = 0.0
-        dist = self.sum_chg_dens_distribution(band_idx, spin)
-        for c, start, end in zip(
-                dist, self.distance_bins[:-1], self.distance_bins[1:]):
-            charge_sum += c
-            if charge_sum > 0.5:
-                return start + (end - start) * (c + 0.5 - charge_sum) / c
-
-        raise ValueError("Radius containing 0.5 e- could not be found.")
+        spin_idx = 0 if spin == Spin.up else 1
+        band_pos = np.argwhere(np.array(self.band_idxs) == band_idx)[0][0]
+        result = self.half_charge_radii[band_pos, spin_idx]
+        if np.isnan(result):
+            raise ValueError("Radius containing 0.5 e- could not be found.")
+        return float(result)
 
     def __str__(self):
         uniform_radius = f"{self.uniform_half_charge_radius:6.3f}"
@@ -102,16 +145,12 @@ class DefectChargeInfo(MSONable, ToJsonFileMixIn):
                            radius: float = defaults.localized_orbital_radius,
                            fraction_wrt_uniform: float
                            = defaults.localized_orbital_fraction_wrt_uniform):
-        result = [[] for i in range(len(self.charge_dists[0]))]
-        for charge_dist, band_idx in zip(self.charge_dists, self.band_idxs):
-            for spin_idx, (dist, spin) in enumerate(zip(charge_dist,
-                                                        [Spin.up, Spin.down])):
-                try:
-                    half_radius = self.half_charge_radius(band_idx, spin)
-                    half_f = half_radius / self.uniform_half_charge_radius
-                    if half_radius < radius and half_f < fraction_wrt_uniform:
-                        result[spin_idx].append(band_idx)
-                except ValueError:
-                    pass
-
-        return result
+        radii = self.half_charge_radii
+        # nan radii compare as False, so they are never localized.
+        with np.errstate(invalid="ignore"):
+            is_localized = ((radii < radius)
+                            & (radii / self.uniform_half_charge_radius
+                               < fraction_wrt_uniform))
+        band_idxs = np.array(self.band_idxs)
+        return [band_idxs[is_localized[:, spin_idx]].tolist()
+                for spin_idx in range(radii.shape[1])]
@@ -152,7 +152,19 @@ class DefectEnergySummary(MSONable, ToJsonFileMixIn):
                         name_style: Optional[str] = None
                         ) -> "ChargeEnergies":
 
-        rel_chem_pot = self.rel_chem_pots[chem_pot_label]
+        return self.charge_energies_at_chem_pot(
+            self.rel_chem_pots[chem_pot_label], allow_shallow,
+            with_corrections, e_range, name_style)
+
+    def charge_energies_at_chem_pot(self,
+                                    rel_chem_pot: Dict[str, float],
+                                    allow_shallow: bool,
+                                    with_corrections: bool,
+                                    e_range: Tuple[float, float],
+                                    name_style: Optional[str] = None
+                                    ) -> "ChargeEnergies":
+        """Same as charge_energies, but at the given relative chemical
+        potentials instead of a labelled one. """
         charge_energies_dict = {}
         for k, v in self.screened_defect_energies(allow_shallow).items():
             if not v:
@@ -1,61 +1,155 @@
 # -*- coding: utf-8 -*-
 #  Copyright (c) 2020 Kumagai group.
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from itertools import product
-from typing import Tuple, List
+from pathlib import Path
+from typing import Tuple, List, Dict
 
 import numpy as np
 from pydefect.cli.vasp.make_efnv_correction import calc_max_sphere_radius
+from pydefect.util.periodic_neighbors import image_shifts
 from pymatgen.core import Lattice
 from pymatgen.io.vasp import Chgcar
 
 
+def grid_distances(lattice: Lattice,
+                   dim: Tuple[int, int, int],
+                   origin: Tuple[float, float, float] = (0.0, 0.0, 0.0),
+                   dtype=np.float64,
+                   chunk_size: int = 2 ** 18) -> np.ndarray:
+    """Minimum-image distances from the origin to all the grid points.
+
+    The fractional coordinates are broadcast from the grid indices and
+    converted to the LLL-reduced basis, in which the shortest image is among
+    the 27 neighboring ones. The grid is processed in slabs along the first
+    axis holding at most chunk_size points to cap the memory.
+    """
+    lll_matrix, lll_inverse = lattice.lll_matrix, lattice.lll_inverse
+    images = np.array(list(product([-1, 0, 1], repeat=3)), dtype=float)
+    axes = [np.arange(n) / n - o for n, o in zip(dim, origin)]
+    slab_size = max(1, chunk_size // (dim[1] * dim[2]))
+
+    result = np.empty(dim, dtype=dtype)
+    for start in range(0, dim[0], slab_size):
+        a, b, c = np.meshgrid(axes[0][start:start + slab_size], axes[1],
+                              axes[2], indexing="ij")
+        frac = np.stack([a, b, c], axis=-1).reshape(-1, 3) @ lll_inverse
+        frac -= np.round(frac)
+        cart = frac @ lll_matrix
+        squared = np.einsum("ij,ij->i", cart, cart)
+        min_d2 = np.full(len(frac), np.inf)
+        # |c + t|^2 = |c|^2 + 2 c.t + |t|^2 for each image translation t.
+        for t in images @ lll_matrix:
+            np.minimum(min_d2, squared + 2 * (cart @ t) + t @ t, out=min_d2)
+        result[start:start + slab_size] = \
+            np.sqrt(np.maximum(min_d2, 0.0)).reshape(a.shape)
+    return result
+
+
+def grid_points_in_sphere(lattice: Lattice,
+                          dim: Tuple[int, int, int],
+                          center: Tuple[float, float, float],
+                          radius: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Distances and flattened grid indices of all the periodic images of the
+    grid points within radius from the center.
+
+    When radius exceeds half the cell width, a grid point can appear more
+    than once, as in Lattice.get_points_in_sphere.
+    """
+    axes = [np.arange(n) / n - c for n, c in zip(dim, center)]
+    frac = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+    frac -= np.floor(frac)
+    cart = frac @ lattice.matrix
+    squared = np.einsum("ij,ij->i", cart, cart)
+
+    distances, indices = [], []
+    for t in image_shifts(lattice, radius) @ lattice.matrix:
+        d2 = squared + 2 * (cart @ t) + t @ t
+        inside = np.where(d2 <= radius ** 2)[0]
+        distances.append(np.sqrt(np.maximum(d2[inside], 0.0)))
+        indices.append(inside)
+    return np.concatenate(distances), np.concatenate(indices)
+
+
+def _matrix_filename(filename) -> Path:
+    filename = Path(filename)
+    return filename.with_name(f"{filename.stem}_matrix.npy")
+
+
 @dataclass
 class Grids:
     lattice: Lattice
     dim: Tuple[int, int, int]
     distance_data: np.ndarray
+    # distance bins -> (bin index of each grid point, number of points in bins)
+    _bin_cache: Dict[tuple, Tuple[np.ndarray, np.ndarray]] = \
+        field(default_factory=dict, init=False, repr=False, compare=False)
 
-    def dump(self, filename="grids.npz"):
-        np.savez(filename, matrix=self.lattice.matrix,
-                 distance_data=self.distance_data)
+    def dump(self, filename="grids.npz", dtype=np.float32):
+        """Dump to a npz file, or to a npy file of dtype when the suffix is
+        .npy, which can be memory-mapped and shared by many processes. The
+        lattice matrix is then written to *_matrix.npy. """
+        if Path(filename).suffix == ".npy":
+            np.save(filename, self.distance_data.astype(dtype))
+            np.save(_matrix_filename(filename), self.lattice.matrix)
+        else:
+            np.savez(filename, matrix=self.lattice.matrix,
+                     distance_data=self.distance_data)
 
     @classmethod
-    def from_file(cls, filename="grids.npz"):
+    def from_file(cls, filename="grids.npz", mmap_mode="r"):
+        if Path(filename).suffix == ".npy":
+            distance_data = np.load(filename, mmap_mode=mmap_mode)
+            lattice = Lattice(np.load(_matrix_filename(filename)))
+            return cls(dim=distance_data.shape, lattice=lattice,
+                       distance_data=distance_data)
+
         loaded_dict = np.load(filename)
         lattice = Lattice(loaded_dict["matrix"])
         return cls(dim=loaded_dict["distance_data"].shape, lattice=lattice,
                    distance_data=loaded_dict["distance_data"])
 
     @classmethod
-    def from_chgcar(cls, chgcar: Chgcar):
+    def from_chgcar(cls, chgcar: Chgcar, dtype=np.float64):
+        """Only the structure and dim are used, so a VolumetricStore is
+        accepted without reading the data. """
         lattice, dim = chgcar.structure.lattice, chgcar.dim
-        grid_points = [[x / dim[0], y / dim[1], z / dim[2]]
-                       for (x, y, z) in product(*[list(range(i)) for i in dim])]
-        # Use boolean indexing to find charges within the desired distance.
-        # data[:, 0]: shifted_coords
-        # data[:, 1]: distances
-        # data[:, 2]: sequential indices
-        # data[:, 3]: images
-        distances_data = np.array(lattice.get_all_distances(
-            grid_points, (0.0, 0.0, 0.0)))
-        return cls(lattice, dim, distances_data[:, 0].reshape(dim))
+        return cls(lattice, dim, grid_distances(lattice, dim, dtype=dtype))
 
     def shifted_distance_data(self, center: List[int]):
         return np.roll(np.roll(np.roll(self.distance_data, center[0], axis=0),
                                center[1], axis=1), center[2], axis=2)
 
+    def bin_indices(self, distance_bins: np.ndarray
+                    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Bin index of each grid point from the origin and the number of
+        grid points in each bin, which are cached per distance bins.
+
+        As in np.histogram, the last bin includes its right edge. Points out
+        of the bins have the index len(distance_bins) - 1.
+        """
+        key = tuple(np.asarray(distance_bins, dtype=float).tolist())
+        if key not in self._bin_cache:
+            bins = np.array(key)
+            num_bins = len(bins) - 1
+            distances = np.asarray(self.distance_data).ravel()
+            indices = np.searchsorted(bins, distances, side="right") - 1
+            indices[distances == bins[-1]] = num_bins - 1
+            indices[(distances < bins[0]) | (distances > bins[-1])] = num_bins
+            counts = np.bincount(indices, minlength=num_bins + 1)[:num_bins]
+            self._bin_cache[key] = (indices.reshape(self.dim), counts)
+        return self._bin_cache[key]
+
     def spherical_dist(self,
                        data: np.ndarray,
                        center: List[int],
                        distance_bins: np.ndarray):
         assert distance_bins[-1] <= calc_max_sphere_radius(self.lattice.matrix)
-        shifted_dist = self.shifted_distance_data(center)
-        _sum, _ = np.histogram(shifted_dist, distance_bins, weights=data)
-        counts, _ = np.histogram(shifted_dist, distance_bins)
+        indices, counts = self.bin_indices(distance_bins)
+        # Rolling the data by -center is equivalent to rolling the distances
+        # by center, so the bin indices and counts are reused for all centers.
+        shifted_data = np.roll(data, [-c for c in center], axis=(0, 1, 2))
+        _sum = np.bincount(indices.ravel(), weights=shifted_data.ravel(),
+                           minlength=len(counts) + 1)[:len(counts)]
         histogram = _sum / counts / self.lattice.volume
         return histogram.tolist()
-
-#        num_bins = int(np.ceil(radius / bin_interval))
-#        distance_bins = [bin_interval * i for i in range(num_bins)] + [radius]
-    # distance_bins: List[float]
@@ -2,106 +2,143 @@
 #  Copyright (c) 2020. Distributed under the terms of the MIT License.
 from collections import defaultdict
 from itertools import zip_longest
-from typing import List, Tuple
+from typing import List, Tuple, Dict
 
 import numpy as np
 from pydefect.analyzer.band_edge_states import BandEdgeOrbitalInfos, \
-    PerfectBandEdgeState, BandEdgeStates, EdgeInfo, OrbitalInfo, \
-    LocalizedOrbital, BandEdgeState
+    PerfectBandEdgeState, BandEdgeStates, EdgeInfo, LocalizedOrbital, \
+    BandEdgeState
 from pydefect.analyzer.defect_charge_info import DefectChargeInfo
 from pydefect.defaults import defaults
 
 
-def get_similar_orb_idx(orbs: List[OrbitalInfo],
+def edge_orbital_array(orbitals: np.ndarray,
+                       elements: List[str],
+                       edge_orbitals: Dict[str, List[float]]
+                       ) -> Tuple[np.ndarray, np.ndarray]:
+    """Align orbitals [..., element, azimuthal] and the edge orbitals dict.
+
+    Elements and azimuthal quantum numbers absent in either of them are
+    padded with zeros, as zip_longest in orbital_diff.
+    """
+    all_elements = list(elements) + [e for e in edge_orbitals
+                                     if e not in elements]
+    num_l = max([orbitals.shape[-1]] + [len(v) for v in edge_orbitals.values()])
+    pad = [(0, 0)] * (orbitals.ndim - 2) + \
+          [(0, len(all_elements) - len(elements)),
+           (0, num_l - orbitals.shape[-1])]
+    edge = np.zeros((len(all_elements), num_l))
+    for i, e in enumerate(all_elements):
+        values = edge_orbitals.get(e, [])
+        edge[i, :len(values)] = values
+    return np.pad(orbitals, pad), edge
+
+
+def orbital_diffs(orbitals: np.ndarray,
+                  elements: List[str],
+                  edge_orbitals: Dict[str, List[float]]) -> np.ndarray:
+    """L1 differences of orbitals [band, element, azimuthal] from the edge.
+    """
+    orbitals, edge = edge_orbital_array(orbitals, elements, edge_orbitals)
+    return np.abs(orbitals - edge).sum(axis=(-2, -1))
+
+
+def get_similar_orb_idx(energies: np.ndarray,
+                        orbitals: np.ndarray,
+                        elements: List[str],
                         edge_info: EdgeInfo,
                         localized_orbs: List[int] = None,
                         _reversed: bool = False) -> Tuple[int, float]:
+    """Index of the band similar to the edge at a k-point.
+
+    Args:
+        energies: Band energies with shape (band,).
+        orbitals: Orbital characters with shape (band, element, azimuthal).
+        elements: Element names of the orbitals.
+        edge_info: Edge info of the perfect supercell.
+        localized_orbs: Band indices of the localized orbitals.
+        _reversed: Search from the highest band, which is for the VBM.
+    """
+    num_bands = len(energies)
+    diffs = orbital_diffs(orbitals, elements, edge_info.orbitals)
     if _reversed:
-        orbs = orbs[::-1]  # by band
+        energies, diffs = energies[::-1], diffs[::-1]  # by band
 
     de = defaults.similar_energy_criterion
+    idxs = np.arange(num_bands)
 
     if localized_orbs:
         if _reversed:
-            localized_orbs = [len(orbs) - i for i in localized_orbs]
+            localized_orbs = [num_bands - i for i in localized_orbs]
+        is_passed = idxs <= max(localized_orbs) - 1
+    else:
+        is_passed = np.zeros(num_bands, dtype=bool)
 
-        def is_passed(idx):
-            return idx <= max(localized_orbs) - 1
+    if _reversed:
+        is_near = energies - de < edge_info.energy
+    else:
+        is_near = energies > edge_info.energy - de
+
+    candidates = idxs[~is_passed & is_near
+                      & (diffs < defaults.similar_orb_criterion)]
+    if len(candidates) == 0:
+        raise ValueError(
+            f"Similar orbital to the edge are not found.\n"
+            f"Energy criterion: {defaults.similar_energy_criterion}\n"
+            f"Orbital criterion: {defaults.similar_orb_criterion}\n"
+            f"Try to lower the criterion.")
+    i = int(candidates[0])
+    orb_idx = num_bands - i - 1 if _reversed else i
+    return orb_idx, float(diffs[i])
+
+
+def get_localized_orbs(orbital_infos: BandEdgeOrbitalInfos,
+                       spin_idx: int,
+                       loc_band_index_range: List[int]
+                       ) -> List[LocalizedOrbital]:
+    """Localized orbitals with quantities averaged over k-points. """
+    start = loc_band_index_range[0] - orbital_infos.lowest_band_index
+    end = loc_band_index_range[1] + 1 - orbital_infos.lowest_band_index
+    weights = orbital_infos.kpt_weights
+
+    def k_average(values: np.ndarray) -> np.ndarray:
+        return np.tensordot(weights, values[spin_idx, :, start:end], axes=1)
+
+    energies = k_average(orbital_infos.energies)
+    occupations = k_average(orbital_infos.occupations)
+    orbitals = k_average(orbital_infos.orbitals)
+    if orbital_infos.participation_ratios is None:
+        ratios = np.full(len(energies), np.nan)
     else:
-        def is_passed(idx):
-            return False
-
-    for i, orb in enumerate(orbs):
-        if is_passed(i):
-            continue
-
-        if ((_reversed is False and orb.energy > edge_info.energy - de) or
-                (_reversed and orb.energy - de < edge_info.energy)):
-
-            orb_diff = orbital_diff(orb.orbitals, edge_info.orbitals)
-            if orb_diff < defaults.similar_orb_criterion:
-                orb_idx = len(orbs) - i - 1 if _reversed else i
-                return orb_idx, orb_diff
-    raise ValueError(f"Similar orbital to the edge are not found.\n"
-                     f"Energy criterion: {defaults.similar_energy_criterion}\n"
-                     f"Orbital criterion: {defaults.similar_orb_criterion}\n"
-                     f"Try to lower the criterion.")
-
-
-def get_localized_orbs(orb_info_by_spin: List[List[OrbitalInfo]],
-                       loc_band_index_range: List[int],
-                       lowest_band_idx: int,
-                       weights: List[float]):
-    start = loc_band_index_range[0] - lowest_band_idx
-    end = loc_band_index_range[1] + 1 - lowest_band_idx
-    orbs_by_band_by_kpt = np.array(orb_info_by_spin)[:, start: end].T
+        ratios = k_average(orbital_infos.participation_ratios)
 
     result = []
-    for i, orbs_by_kpt in enumerate(orbs_by_band_by_kpt, loc_band_index_range[0]):
-        def get_ave(key):
-            try:
-                return sum([getattr(orb, key) * w for orb, w in zip(orbs_by_kpt, weights)])
-            except TypeError:
-                return None
-
-        orbs = defaultdict(list)
-        for orb, w in zip(orbs_by_kpt, weights):
-            for elem, contrb in orb.orbitals.items():
-                for y, c in enumerate(contrb):
-                    try:
-                        orbs[elem][y] += c*w
-                    except IndexError:
-                        orbs[elem].append(0.0)
-                        orbs[elem][y] += c*w
-
+    for i, band_idx in enumerate(range(loc_band_index_range[0],
+                                       loc_band_index_range[1] + 1)):
+        ratio = None if np.isnan(ratios[i]) else float(ratios[i])
         result.append(LocalizedOrbital(
-            band_idx=i,
-            ave_energy=get_ave("energy"),
-            occupation=get_ave("occupation"),
-            orbitals=dict(orbs),
-            participation_ratio=get_ave("participation_ratio")))
+            band_idx=band_idx,
+            ave_energy=float(energies[i]),
+            occupation=float(occupations[i]),
+            orbitals=dict(zip(orbital_infos.elements, orbitals[i].tolist())),
+            participation_ratio=ratio))
     return result
 
 
-def num_electron_in_cbm(orb_info_by_spin: List[List[OrbitalInfo]],
+def num_electron_in_cbm(occupations: np.ndarray,
                         cbm_idx: int,
-                        weights: List[float]):
-    result = 0.0
-    orbs_by_band_by_kpt = np.array(orb_info_by_spin)[:, cbm_idx:].T
-    for orbs_by_kpt in orbs_by_band_by_kpt:
-        result += sum([o.occupation * w for o, w in zip(orbs_by_kpt, weights)])
-    return result
+                        weights: List[float]) -> float:
+    """Args: occupations with shape (k-point, band). """
+    occupations = np.asarray(occupations)[:, cbm_idx:]
+    return float(np.tensordot(weights, occupations.sum(axis=1), axes=1))
 
 
-def num_hole_in_vbm(orb_info_by_spin: List[List[OrbitalInfo]],
+def num_hole_in_vbm(occupations: np.ndarray,
                     vbm_idx: int,
-                    weights: List[float]):
-    result = 0.0
-    orbs_by_band_by_kpt = np.array(orb_info_by_spin)[:, :vbm_idx + 1].T
-    for orbs_by_kpt in orbs_by_band_by_kpt:
-        result += sum([(1 - o.occupation) * w
-                       for o, w in zip(orbs_by_kpt, weights)])
-    return result
+                    weights: List[float]) -> float:
+    """Args: occupations with shape (k-point, band). """
+    holes = 1 - np.asarray(occupations)[:, :vbm_idx + 1]
+    return float(np.tensordot(weights, holes.sum(axis=1), axes=1))
 
 
 def make_band_edge_states(orbital_infos: BandEdgeOrbitalInfos,
@@ -117,38 +154,46 @@ def make_band_edge_states(orbital_infos: BandEdgeOrbitalInfos,
 
     states = []
     lowest_idx = orbital_infos.lowest_band_index
-    for spin_idx, orb_info_by_spin in enumerate(orbital_infos.orbital_infos):
+    elements = orbital_infos.elements
+    weights = orbital_infos.kpt_weights
+    for spin_idx in range(orbital_infos.shape[0]):
         if defect_charge_info:
             localized_orbs = defect_charge_info.localized_orbitals()[spin_idx]
             localized_orbs = [i - lowest_idx for i in localized_orbs]
         else:
             localized_orbs = None
 
-        vbm_idx, vbm_diff = get_similar_orb_idx(orb_info_by_spin[vbm_k_idx],
-                                                p_vbm_info, localized_orbs,
+        energies = orbital_infos.energies[spin_idx]
+        orbitals = orbital_infos.orbitals[spin_idx]
+        occupations = orbital_infos.occupations[spin_idx]
+
+        vbm_idx, vbm_diff = get_similar_orb_idx(energies[vbm_k_idx],
+                                                orbitals[vbm_k_idx],
+                                                elements, p_vbm_info,
+                                                localized_orbs,
                                                 _reversed=True)
         vbm_info = EdgeInfo(band_idx=vbm_idx + lowest_idx,
                             kpt_coord=p_vbm_info.kpt_coord,
-                            orbital_info=orb_info_by_spin[vbm_k_idx][vbm_idx])
+                            orbital_info=orbital_infos.orbital_info(
+                                spin_idx, vbm_k_idx, vbm_idx))
 
-        cbm_idx, cbm_diff = get_similar_orb_idx(orb_info_by_spin[cbm_k_idx],
-                                                p_cbm_info, localized_orbs)
+        cbm_idx, cbm_diff = get_similar_orb_idx(energies[cbm_k_idx],
+                                                orbitals[cbm_k_idx],
+                                                elements, p_cbm_info,
+                                                localized_orbs)
         cbm_info = EdgeInfo(band_idx=cbm_idx + lowest_idx,
                             kpt_coord=p_cbm_info.kpt_coord,
-                            orbital_info=orb_info_by_spin[cbm_k_idx][cbm_idx])
+                            orbital_info=orbital_infos.orbital_info(
+                                spin_idx, cbm_k_idx, cbm_idx))
 
         loc_idx_range = [vbm_info.band_idx + 1, cbm_info.band_idx - 1]
-        localized_orbs = get_localized_orbs(orb_info_by_spin,
-                                            loc_idx_range,
-                                            orbital_infos.lowest_band_index,
-                                            orbital_infos.kpt_weights)
-
-        vbm_hole = num_hole_in_vbm(orb_info_by_spin,
-                                   vbm_idx=vbm_idx,
-                                   weights=orbital_infos.kpt_weights)
-        cbm_electron = num_electron_in_cbm(orb_info_by_spin,
-                                           cbm_idx=cbm_idx,
-                                           weights=orbital_infos.kpt_weights)
+        localized_orbs = get_localized_orbs(orbital_infos, spin_idx,
+                                            loc_idx_range)
+
+        vbm_hole = num_hole_in_vbm(occupations, vbm_idx=vbm_idx,
+                                   weights=weights)
+        cbm_electron = num_electron_in_cbm(occupations, cbm_idx=cbm_idx,
+                                           weights=weights)
 
         states.append(BandEdgeState(vbm_info=vbm_info,
                                     cbm_info=cbm_info,
@@ -7,13 +7,17 @@ import warnings
 
 from monty.serialization import loadfn
 from pydefect.analyzer.concentration.degeneracy import Degeneracies
+from pydefect.chem_pot_diag.chem_pot_diag import RelativeEnergies
 from pydefect.cli.main import description, epilog, add_sub_parser, dirs_parsers
 from pydefect.cli.main_util_functions import make_gkfo_correction_from_vasp, \
     composition_energies_from_mp, add_interstitials_from_local_extrema, \
     make_defect_vesta_file, show_u_values, show_pinning_levels, \
     make_degeneracies, calc_defect_concentrations, calc_carrier_concentrations, \
-    plot_carrier_concentrations, plot_defect_concentrations
+    plot_carrier_concentrations, plot_defect_concentrations, \
+    make_voronoi_interstitials, calc_defect_concentrations_by_temperature, \
+    calc_defect_concentration_map
 from pydefect.defaults import defaults
+from pymatgen.core import Structure
 from pymatgen.io.vasp.inputs import UnknownPotcarWarning
 
 warnings.simplefilter('ignore', UnknownPotcarWarning)
@@ -83,6 +87,29 @@ def parse_args_main_util(args):
         help="Indices starting from 1 to be added to SupercellInfo.")
     parser_ai.set_defaults(func=add_interstitials_from_local_extrema)
 
+    # -- voronoi interstitials -------------------------------------------------
+    parser_vi = subparsers.add_parser(
+        name="voronoi_interstitials",
+        description="Make volumetric_data_local_extrema.json file from the "
+                    "Voronoi vertices of the unit cell without CHGCAR.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        aliases=['vi'])
+    parser_vi.add_argument(
+        "-p", "--unitcell", type=Structure.from_file, required=True,
+        help="Unit cell structure file, which must be the standardized "
+             "primitive cell.")
+    parser_vi.add_argument(
+        "-i", "--info", type=str,
+        help="Information written in volumetric_data_local_extrema.json.")
+    parser_vi.add_argument(
+        "--min_dist", type=float, metavar="Angstrom", default=0.5,
+        help="Minimum distance between the vertices and host atoms.")
+    parser_vi.add_argument(
+        "--tol", type=float, metavar="Angstrom", default=0.5,
+        help="Group vertices that are too close together using a tol. "
+             "Set 0 when switch off this flag.")
+    parser_vi.set_defaults(func=make_voronoi_interstitials)
+
     # -- make defect vesta file ------------------------------------------------
     parser_dvf = subparsers.add_parser(
         name="defect_vesta_file",
@@ -154,6 +181,12 @@ def parse_args_main_util(args):
         "-T", "--T", type=float, default=300,
         help="Temperature in K.")
 
+    parser_calc_carrier_concentrations.add_argument(
+        "--adaptive_tol", type=float, default=None,
+        help="Tolerance of the log10 concentrations for the adaptive sampling "
+             "of the Fermi levels. When not set, 100 Fermi levels are "
+             "uniformly sampled.")
+
     parser_calc_carrier_concentrations.set_defaults(
         func=calc_carrier_concentrations)
 
@@ -180,9 +213,94 @@ def parse_args_main_util(args):
         "--net_abs_ratio", type=float, default=1e-5,
         help="Ratio to determine the convergence.")
 
+    parser_calc_defect_concentrations.add_argument(
+        "--adaptive_tol", type=float, default=None,
+        help="Tolerance of the log10 concentrations for the adaptive sampling "
+             "of the Fermi levels. When not set, 100 Fermi levels are "
+             "uniformly sampled.")
+
     parser_calc_defect_concentrations.set_defaults(
         func=calc_defect_concentrations)
 
+    # -- calc defect concentrations by temperature -----------------------------
+    parser_calc_defect_concentrations_by_temperature = subparsers.add_parser(
+        name="calc_defect_concentrations_by_temperature",
+        description="Calculate the equilibrium defect concentrations at "
+                    "multiple temperatures, and optionally those quenched "
+                    "from each of them.",
+        parents=[defect_e_sum_parser],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        aliases=['cdct'])
+    parser_calc_defect_concentrations_by_temperature.add_argument(
+        "--degeneracies", required=True, type=Degeneracies.from_yaml,
+        help="degeneracies.yaml")
+    parser_calc_defect_concentrations_by_temperature.add_argument(
+        "-t", "--total_dos", required=True, type=loadfn,
+        help="total_dos.json")
+    parser_calc_defect_concentrations_by_temperature.add_argument(
+        "-T", "--temperatures", required=True, type=float, nargs="+",
+        help="Growth temperatures in K.")
+    parser_calc_defect_concentrations_by_temperature.add_argument(
+        "--T_quench", type=float, default=None,
+        help="Temperature in K to which the defects are quenched.")
+
+    parser_calc_defect_concentrations_by_temperature.set_defaults(
+        func=calc_defect_concentrations_by_temperature)
+
+    # -- calc defect concentration map -----------------------------------------
+    parser_calc_defect_concentration_map = subparsers.add_parser(
+        name="calc_defect_concentration_map",
+        description="Calculate the equilibrium defect concentrations at the "
+                    "chemical potentials sampled in the stability region of "
+                    "the target, and write them to an npz file.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        aliases=['cdcm'])
+    parser_calc_defect_concentration_map.add_argument(
+        "-d", "--defect_energy_summary", required=True, type=loadfn,
+        help="defect_energy_summary.json file path.")
+    parser_calc_defect_concentration_map.add_argument(
+        "-cpd", "--chem_pot_diag", default="chem_pot_diag.json", type=loadfn,
+        help="Path to the chem_pot_diag.json file.")
+    parser_calc_defect_concentration_map.add_argument(
+        "--degeneracies", required=True, type=Degeneracies.from_yaml,
+        help="degeneracies.yaml")
+    parser_calc_defect_concentration_map.add_argument(
+        "-t", "--total_dos", required=True, type=loadfn,
+        help="total_dos.json")
+    parser_calc_defect_concentration_map.add_argument(
+        "-T", "--T", type=float, default=300,
+        help="Temperature in K.")
+    parser_calc_defect_concentration_map.add_argument(
+        "-n", "--num_points", type=int, default=20,
+        help="Number of grid points along each axis, or number of random "
+             "points.")
+    parser_calc_defect_concentration_map.add_argument(
+        "--method", type=str, default="grid", choices=["grid", "random"],
+        help="Sampling method of the chemical potentials.")
+    parser_calc_defect_concentration_map.add_argument(
+        "--seed", type=int, default=None,
+        help="Seed of the random sampling.")
+    parser_calc_defect_concentration_map.add_argument(
+        "--allow_shallow", action="store_true",
+        help="Set when the energies of shallow defects are allowed.")
+    parser_calc_defect_concentration_map.add_argument(
+        "--no_corrections", dest="with_corrections", action="store_false",
+        help="Set when corrections are switched off.")
+    parser_calc_defect_concentration_map.add_argument(
+        "-r", "--relative_energies", type=RelativeEnergies.from_yaml,
+        default=None,
+        help="relative_energies.yaml, from which the chemical potentials of "
+             "impurity elements are derived at each point as their upper "
+             "limits, which is an approximation.")
+    parser_calc_defect_concentration_map.add_argument(
+        "--impurity_chem_pots", type=str, nargs="+", default=None,
+        help="Relative chemical potentials of impurity elements fixed over "
+             "the region, e.g., Al -1.5 Ga -0.3, which override those from "
+             "relative_energies.yaml.")
+
+    parser_calc_defect_concentration_map.set_defaults(
+        func=calc_defect_concentration_map)
+
     # -- plot carrier concentrations  ------------------------------------------
     parser_plot_carrier_concentrations = subparsers.add_parser(
         name="plot_carrier_concentrations",
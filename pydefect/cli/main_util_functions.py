@@ -10,6 +10,10 @@ from pydefect.analyzer.concentration.concentration import \
 from pydefect.analyzer.concentration.degeneracy import MakeDegeneracy
 from pydefect.analyzer.concentration.make_concentration import \
     MakeConcentrations, equilibrium_concentration, MakeCarrierConcentrations
+from pydefect.analyzer.concentration.temperature_sweep import \
+    sweep_temperatures
+from pydefect.analyzer.concentration.concentration_map import \
+    make_concentration_map
 from pydefect.analyzer.concentration.plot_concentration import \
     plot_multiple_pns, DefectConcentrationMplPlotter
 from pydefect.analyzer.defect_energy import DefectEnergySummary, \
@@ -23,6 +27,8 @@ from pydefect.cli.vasp.make_composition_energies_from_mp import \
     make_composition_energies_from_mp
 from pydefect.cli.vasp.make_gkfo_correction import make_gkfo_correction
 from pydefect.corrections.site_potential_plotter import SitePotentialMplPlotter
+from pydefect.input_maker.voronoi_interstitials import \
+    make_local_extrema_from_voronoi
 from tabulate import tabulate
 from vise.util.logger import get_logger
 
@@ -66,6 +72,15 @@ def add_interstitials_from_local_extrema(args) -> None:
     supercell_info.to_json_file()
 
 
+def make_voronoi_interstitials(args) -> None:
+    local_extrema = make_local_extrema_from_voronoi(args.unitcell,
+                                                    min_dist=args.min_dist,
+                                                    tol=args.tol,
+                                                    info=args.info)
+    print(local_extrema)
+    local_extrema.to_json_file()
+
+
 def make_defect_vesta_file(args) -> None:
     def _inner(_dir: Path):
         defect_str_info = loadfn(_dir / "defect_structure_info.json")
@@ -114,7 +129,11 @@ def make_degeneracies(args):
 def calc_carrier_concentrations(args):
     make_concentrations = MakeCarrierConcentrations(args.total_dos, args.T)
     e_max = args.total_dos.cbm - args.total_dos.vbm
-    Efs: list = np.linspace(0, e_max, 100, True).tolist()
+    if args.adaptive_tol:
+        Efs = make_concentrations.adaptive_fermi_levels(0, e_max,
+                                                        tol=args.adaptive_tol)
+    else:
+        Efs: list = np.linspace(0, e_max, 100, True).tolist()
     con_by_Ef = make_concentrations.make_concentrations_by_fermi_level(Efs)
     filename = f"con_by_Ef_only_pn_{args.T}K.json"
     con_by_Ef.to_json_file(filename)
@@ -132,10 +151,14 @@ def calc_defect_concentrations(args):
                                              args.degeneracies,
                                              args.T,
                                              fixed_defect_con)
-    Efs: list = np.linspace(e_min, e_max, 100, True).tolist()
+    if args.adaptive_tol:
+        Efs = make_concentrations.adaptive_fermi_levels(e_min, e_max,
+                                                        tol=args.adaptive_tol)
+    else:
+        Efs: list = np.linspace(e_min, e_max, 100, True).tolist()
     con_by_Ef = make_concentrations.make_concentrations_by_fermi_level(Efs)
     con_by_Ef.equilibrium_concentration = \
-        equilibrium_concentration(make_concentrations, Efs[0], Efs[-1],
+        equilibrium_concentration(make_concentrations, e_min, e_max,
                                   net_abs_ratio=args.net_abs_ratio)
 
     filename = f"con_by_Ef_{args.label}_{args.T}K"
@@ -147,6 +170,43 @@ def calc_defect_concentrations(args):
     con_by_Ef.to_json_file(filename)
 
 
+def calc_defect_concentrations_by_temperature(args):
+    e_min, e_max = 0., args.defect_energy_summary.cbm
+    charge_energies = args.defect_energy_summary.charge_energies(
+        args.label, args.allow_shallow, args.with_corrections, [e_min, e_max],
+        name_style=False)
+    sweep = sweep_temperatures(args.total_dos, charge_energies,
+                               args.degeneracies, args.temperatures,
+                               args.T_quench)
+    filename = f"con_by_T_{args.label}"
+    if args.T_quench is not None:
+        filename += f"_to_{args.T_quench}K"
+    filename += ".json"
+
+    print(sweep)
+    sweep.to_json_file(filename)
+
+
+def calc_defect_concentration_map(args):
+    impurity_chem_pots = None
+    if args.impurity_chem_pots:
+        x = args.impurity_chem_pots
+        impurity_chem_pots = dict(zip(x[::2], map(float, x[1::2])))
+    con_map = make_concentration_map(args.defect_energy_summary,
+                                     args.chem_pot_diag,
+                                     args.total_dos,
+                                     args.degeneracies,
+                                     args.T,
+                                     num_points=args.num_points,
+                                     method=args.method,
+                                     allow_shallow=args.allow_shallow,
+                                     with_corrections=args.with_corrections,
+                                     impurity_chem_pots=impurity_chem_pots,
+                                     relative_energies=args.relative_energies,
+                                     seed=args.seed)
+    con_map.dump(f"con_map_{args.T}K.npz")
+
+
 def _make_fixed_defect_con(con_by_Ef: ConcentrationByFermiLevel = None):
     if con_by_Ef:
         return {d.name: d.total_concentration
@@ -13,8 +13,10 @@ from pydefect.cli.vasp.main_vasp_functions import make_defect_entries, \
     make_calc_results, \
     make_band_edge_orb_infos_and_eigval_plot, make_perfect_band_edge_state, \
     make_local_extrema, make_composition_energies
+from pydefect.cli.vasp.outcar_reader import read_outcar
 from pydefect.defaults import defaults
-from pymatgen.io.vasp import Vasprun, Outcar, Chgcar
+from pydefect.util.volumetric_store import load_total_volumetric_data
+from pymatgen.io.vasp import Vasprun
 from pymatgen.io.vasp.inputs import UnknownPotcarWarning
 
 warnings.simplefilter('ignore', UnknownPotcarWarning)
@@ -43,13 +45,13 @@ def parse_args_main_vasp(args):
         "-vb", "--vasprun_band", required=True, type=Vasprun,
         help="vasprun.xml file of band structure calculation.")
     parser_unitcell.add_argument(
-        "-ob", "--outcar_band", required=True, type=Outcar,
+        "-ob", "--outcar_band", required=True, type=read_outcar,
         help="OUTCAR file of band structure calculation.")
     parser_unitcell.add_argument(
-        "-odc", "--outcar_dielectric_clamped", required=True, type=Outcar,
+        "-odc", "--outcar_dielectric_clamped", required=True, type=read_outcar,
         help="OUTCAR file of ion-clamped dielectric constant calculation.")
     parser_unitcell.add_argument(
-        "-odi", "--outcar_dielectric_ionic", required=True, type=Outcar,
+        "-odi", "--outcar_dielectric_ionic", required=True, type=read_outcar,
         help="OUTCAR file for calculating dielectric constant of ionic "
              "contribution.")
     parser_unitcell.add_argument(
@@ -98,9 +100,10 @@ def parse_args_main_vasp(args):
         aliases=['le'])
 
     parser_make_local_extrema.add_argument(
-        "-v", "--volumetric_data", type=Chgcar.from_file, required=True,
-        nargs="+",
-        help="File names such as CHGCAR or LOCPOT. When multiple files are "
+        "-v", "--volumetric_data", type=load_total_volumetric_data,
+        required=True, nargs="+",
+        help="File names such as CHGCAR or LOCPOT, or their stores (*.h5) "
+             "made by pydefect_vasp_util cv. When multiple files are "
              "provided, the summed data (e.g., AECCAR0 + AECCAR2) will be "
              "parsed.")
     parser_make_local_extrema.add_argument(
@@ -139,6 +142,14 @@ def parse_args_main_vasp(args):
         "--radius", type=float, default=0.4,
         help="Radius of sphere around each site to evaluate the average "
              "quantity.")
+    parser_make_local_extrema.add_argument(
+        "--coarse_factor", type=int, default=None,
+        help="""Number of grid points block-averaged along each axis for the
+        coarse-to-fine search. The extrema found on the coarse grid are
+        refined on the full-resolution grid.""")
+    parser_make_local_extrema.add_argument(
+        "--cross_check", action="store_true",
+        help="Compare the coarse-to-fine search with the full search.")
 
     parser_make_local_extrema.set_defaults(func=make_local_extrema)
     # -- defect_entries ------------------------------------------------
@@ -10,19 +10,23 @@ from pydefect.cli.main_tools import parse_dirs
 from pydefect.cli.vasp.make_local_extrema import \
     make_local_extrema_from_volumetric_data
 from pydefect.cli.vasp.make_band_edge_orbital_infos import \
-    make_band_edge_orbital_infos
+    make_band_edge_orbital_infos, band_edge_window
 from pydefect.cli.vasp.make_calc_results import make_calc_results_from_vasp
 from pydefect.cli.vasp.make_perfect_band_edge_state import \
     make_perfect_band_edge_state_from_vasp
 from pydefect.cli.vasp.make_poscars_from_query import make_poscars_from_query
 from pydefect.cli.vasp.make_unitcell import make_unitcell_from_vasp
+from pydefect.cli.vasp.outcar_reader import read_outcar
+from pydefect.cli.vasp.procar_reader import read_procar
+from pydefect.cli.vasp.vasprun_reader import read_vasprun, \
+    calc_results_fields, band_edge_fields
 from pydefect.input_maker.defect_entries_maker import DefectEntriesMaker
 from pydefect.input_maker.defect_set import DefectSet
 from pydefect.input_maker.local_extrema import VolumetricDataAnalyzeParams
 from pydefect.input_maker.supercell_info import SupercellInfo
 from pydefect.util.mp_tools import MpQuery
 from pymatgen.core import Structure
-from pymatgen.io.vasp import Vasprun, Outcar, Procar
+from vise.analyzer.vasp.band_edge_properties import VaspBandEdgeProperties
 from vise.defaults import defaults
 from vise.util.logger import get_logger
 
@@ -51,7 +55,7 @@ def make_composition_energies(args):
         composition_energies = CompositionEnergies()
 
     def _inner(_dir: Path):
-        outcar = Outcar(_dir / defaults.outcar)
+        outcar = read_outcar(_dir / defaults.outcar)
         composition = Structure.from_file(_dir / defaults.contcar).composition
         energy = float(outcar.final_energy)  # original type is FloatWithUnit
         return composition, CompositionEnergy(energy, str(_dir))
@@ -81,12 +85,14 @@ def make_local_extrema(args):
                                          args.threshold_abs,
                                          args.min_dist,
                                          args.tol,
-                                         args.radius)
+                                         args.radius,
+                                         args.coarse_factor)
     local_extrema = make_local_extrema_from_volumetric_data(
         volumetric_data=volumetric_data,
         params=params,
         info=args.info,
-        find_min=not args.find_max)
+        find_min=not args.find_max,
+        cross_check=args.cross_check)
     local_extrema.to_json_file()
 
 
@@ -128,19 +134,24 @@ def make_calc_results(args):
 
     def _inner(_dir: Path):
         calc_results = make_calc_results_from_vasp(
-            vasprun=Vasprun(_dir / defaults.vasprun, parse_potcar_file=False),
-            outcar=Outcar(_dir / defaults.outcar))
+            vasprun=read_vasprun(_dir / defaults.vasprun, calc_results_fields),
+            outcar=read_outcar(_dir / defaults.outcar))
         calc_results.to_json_file(str(_dir / file_name))
 
     parse_dirs(args.dirs, _inner, args.verbose, file_name)
 
 
 def make_perfect_band_edge_state(args):
-    procar = Procar(args.dir / defaults.procar)
-    vasprun = Vasprun(args.dir / defaults.vasprun, parse_potcar_file=False)
-    outcar = Outcar(args.dir / defaults.outcar)
-    perfect_band_edge_state = \
-        make_perfect_band_edge_state_from_vasp(procar, vasprun, outcar)
+    vasprun = read_vasprun(args.dir / defaults.vasprun, band_edge_fields)
+    outcar = read_outcar(args.dir / defaults.outcar)
+    band_edge_prop = VaspBandEdgeProperties(vasprun, outcar,
+                                            defaults.integer_criterion)
+    window = band_edge_window(vasprun.eigenvalues,
+                              band_edge_prop.vbm_info.energy,
+                              band_edge_prop.cbm_info.energy)
+    procar = read_procar(args.dir / defaults.procar, window)
+    perfect_band_edge_state = make_perfect_band_edge_state_from_vasp(
+        procar, vasprun, outcar, band_edge_prop)
     perfect_band_edge_state.to_json_file(
         args.dir / "perfect_band_edge_state.json")
 
@@ -170,8 +181,10 @@ def make_band_edge_orb_infos_and_eigval_plot(args):
             title = defect_entry.name
         except FileNotFoundError:
             title = "No name"
-        procar = Procar(_dir / defaults.procar)
-        vasprun = Vasprun(_dir / defaults.vasprun, parse_potcar_file=False)
+        vasprun = read_vasprun(_dir / defaults.vasprun, band_edge_fields)
+        window = band_edge_window(vasprun.eigenvalues, supercell_vbm,
+                                  supercell_cbm)
+        procar = read_procar(_dir / defaults.procar, window)
 
         str_info = None
         if args.no_participation_ratio is False:
@@ -12,9 +12,13 @@ from pydefect.cli.main import epilog, description, add_sub_parser
 from pydefect.cli.vasp.main_vasp_util_functions import \
     make_parchg_dir, make_refine_defect_poscar, \
     calc_charge_state, make_defect_entry_main, calc_grids, \
-    make_defect_charge_info_main, make_total_dos
+    make_defect_charge_info_main, make_total_dos, convert_volumetric_data, \
+    calc_charge_states
+from pydefect.cli.vasp.outcar_reader import read_outcar
+from pydefect.cli.vasp.vasprun_reader import read_vasprun
+from pydefect.util.volumetric_store import open_volumetric_data, \
+    default_volumetric_filenames
 from pymatgen.core import Structure
-from pymatgen.io.vasp import Chgcar, Vasprun, Outcar
 from pymatgen.io.vasp.inputs import UnknownPotcarWarning
 from vise.defaults import defaults
 
@@ -28,6 +32,7 @@ def parse_args_main_vasp_util(args):
 
     subparsers = parser.add_subparsers()
     dir_parser = add_sub_parser(argparse, name="dir")
+    dirs_parser = add_sub_parser(argparse, name="dirs")
     vasprun_parser = add_sub_parser(argparse, name="dir")
 
     # -- calc charge state -----------------------------------------------------
@@ -41,6 +46,17 @@ def parse_args_main_vasp_util(args):
 
     parser_calc_charge_state.set_defaults(func=calc_charge_state)
 
+    # -- calc charge states ----------------------------------------------------
+    parser_calc_charge_states = subparsers.add_parser(
+        name="calc_charge_states",
+        description="Calc defect charge states of many directories in one run."
+                    " The POTCAR files with the same content are scanned once.",
+        parents=[dirs_parser],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        aliases=['ccss'])
+
+    parser_calc_charge_states.set_defaults(func=calc_charge_states)
+
     # -- make defect entry -----------------------------------------------------
     parser_make_defect_entry = subparsers.add_parser(
         name="make_defect_entry",
@@ -96,7 +112,13 @@ def parse_args_main_vasp_util(args):
         aliases=['cg'])
 
     parser_calc_grids.add_argument(
-        "-c", "--chgcar", type=Chgcar.from_file, required=True)
+        "-c", "--chgcar", type=open_volumetric_data, required=True,
+        help="CHGCAR-type file or its store (*.h5), from which only the "
+             "structure and the grid are read.")
+    parser_calc_grids.add_argument(
+        "-o", "--output", type=str, default="grids.npz",
+        help="Output file name. When the suffix is .npy, the distances are "
+             "stored in float32, which is memory-mapped when loaded.")
     parser_calc_grids.set_defaults(func=calc_grids)
 
     # -- calc defect charge info -----------------------------------------------
@@ -113,6 +135,9 @@ def parse_args_main_vasp_util(args):
         "-b", "--bin_interval", type=float, default=0.2)
     parser_calc_def_charge_info.add_argument(
         "-g", "--grids", type=Grids.from_file, required=True)
+    parser_calc_def_charge_info.add_argument(
+        "-n", "--num_processes", type=int, default=None,
+        help="Number of processes over which PARCHG files are distributed.")
 
     parser_calc_def_charge_info.set_defaults(func=make_defect_charge_info_main)
 
@@ -123,12 +148,33 @@ def parse_args_main_vasp_util(args):
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
         aliases=['mtd'])
     parser_make_total_dos.add_argument(
-        "-v", "--vasprun", type=Vasprun, default=defaults.vasprun,
+        "-v", "--vasprun", type=read_vasprun, default=defaults.vasprun,
         help="vasprun.xml file name.")
     parser_make_total_dos.add_argument(
-        "-o", "--outcar", type=Outcar, default=defaults.outcar,
+        "-o", "--outcar", type=read_outcar, default=defaults.outcar,
         help="OUTCAR file name.")
     parser_make_total_dos.set_defaults(func=make_total_dos)
+
+    # -- convert volumetric data -----------------------------------------------
+    parser_convert_volumetric_data = subparsers.add_parser(
+        name="convert_volumetric_data",
+        description="Convert CHGCAR, PARCHG, LOCPOT etc. into chunked and "
+                    "compressed HDF5 stores named *.h5, which can be used "
+                    "instead of the original files.",
+        parents=[dirs_parser],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        aliases=['cv'])
+    parser_convert_volumetric_data.add_argument(
+        "-f", "--filenames", type=str, nargs="+",
+        default=default_volumetric_filenames,
+        help="File names or shell-style patterns to be converted.")
+    parser_convert_volumetric_data.add_argument(
+        "--chunk_size", type=int, default=32,
+        help="Number of grid points along each axis of a chunk.")
+    parser_convert_volumetric_data.add_argument(
+        "--compression", type=str, default="gzip",
+        help="Compression filter such as gzip and lzf.")
+    parser_convert_volumetric_data.set_defaults(func=convert_volumetric_data)
     # ----------------------------------------------------------------
     return parser.parse_args(args)
 
@@ -8,17 +8,21 @@ from pydefect.analyzer.calc_results import CalcResults
 from pydefect.analyzer.concentration.make_concentration import TotalDos
 from pydefect.analyzer.grids import Grids
 from pydefect.analyzer.refine_defect_structure import refine_defect_structure
-from pydefect.cli.vasp.make_defect_charge_info import make_defect_charge_info
+from pydefect.cli.vasp.make_defect_charge_info import \
+    make_defect_charge_info_from_files
+from pydefect.cli.main_tools import parse_dirs
 from pydefect.cli.vasp.get_defect_charge_state import get_defect_charge_state
+from pydefect.cli.vasp.potcar_reader import potcar_valences
 from pydefect.input_maker.defect_entry import make_defect_entry
+from pydefect.util.volumetric_store import convert_volumetric_files, \
+    is_volumetric_store
 from pymatgen.core import Structure
 from pymatgen.electronic_structure.core import Spin
-from pymatgen.io.vasp import Chgcar
 from vise.analyzer.vasp.band_edge_properties import VaspBandEdgeProperties
 from vise.input_set.incar import ViseIncar
 from vise.util.file_transfer import FileLink
 from vise.util.logger import get_logger
-from pymatgen.io.vasp.inputs import Poscar, Incar, Potcar
+from pymatgen.io.vasp.inputs import Poscar, Incar
 
 logger = get_logger(__name__)
 
@@ -27,15 +31,29 @@ def is_file(filename):
     return Path(filename).is_file() and os.stat(filename).st_size != 0
 
 
+def _charge_state(_dir: Path) -> int:
+    poscar = Poscar.from_file(_dir / "POSCAR")
+    valences = potcar_valences(_dir / "POTCAR")
+    incar = Incar.from_file(_dir / "INCAR")
+    return get_defect_charge_state(poscar, valences, incar)
+
+
 def calc_charge_state(args):
-    poscar = Poscar.from_file(args.dir / "POSCAR")
-    potcar = Potcar.from_file(args.dir / "POTCAR")
-    incar = Incar.from_file(args.dir / "INCAR")
-    charge_state = get_defect_charge_state(poscar, potcar, incar)
+    charge_state = _charge_state(args.dir)
     logger.info(f"Charge state in {args.dir} is {charge_state}.")
     return charge_state
 
 
+def calc_charge_states(args):
+    def _inner(_dir: Path):
+        return str(_dir), _charge_state(_dir)
+
+    charge_states = dict(parse_dirs(args.dirs, _inner) or [])
+    for _dir, charge_state in charge_states.items():
+        logger.info(f"Charge state in {_dir} is {charge_state}.")
+    return charge_states
+
+
 def make_defect_entry_main(args):
     charge_state = calc_charge_state(args)
     structure = Structure.from_file(args.dir / "POSCAR")
@@ -88,27 +106,41 @@ def make_refine_defect_poscar(args):
 
 def calc_grids(args):
     grids = Grids.from_chgcar(args.chgcar)
-    grids.dump()
+    grids.dump(args.output)
+
+
+def _strip_store_suffix(filename: str) -> str:
+    if is_volumetric_store(filename):
+        return str(Path(filename).with_suffix(""))
+    return filename
 
 
 def make_defect_charge_info_main(args):
-    band_idxs = [int(parchg.split(".")[-2]) - 1 for parchg in args.parchgs]
-    parchgs = [Chgcar.from_file(parchg) for parchg in args.parchgs]
-    defect_charge_info = make_defect_charge_info(
-        parchgs, band_idxs, args.bin_interval, args.grids)
+    # PARCHG.0189.ALLK or its store PARCHG.0189.ALLK.h5
+    band_idxs = [int(_strip_store_suffix(parchg).split(".")[-2]) - 1
+                 for parchg in args.parchgs]
+    defect_charge_info = make_defect_charge_info_from_files(
+        args.parchgs, band_idxs, args.bin_interval, args.grids,
+        args.num_processes)
     defect_charge_info.to_json_file()
     plt = defect_charge_info.show_dist()
     plt.savefig("dist.pdf")
 
 
+def convert_volumetric_data(args):
+    for _dir in args.dirs:
+        convert_volumetric_files(_dir, args.filenames, args.chunk_size,
+                                 args.compression)
+
+
 def make_total_dos(args):
-    if Spin.down in args.vasprun.complete_dos.densities:
+    if Spin.down in args.vasprun.tdos.densities:
         raise ValueError("Spin polarization is not supported yet.")
     band_edge = VaspBandEdgeProperties(args.vasprun, args.outcar)
     vbm, cbm = band_edge.vbm_info.energy, band_edge.cbm_info.energy
 
-    total_dos = TotalDos(args.vasprun.complete_dos.energies.tolist(),
-                         args.vasprun.complete_dos.densities[Spin.up].tolist(),
-                         args.vasprun.structures[0].volume,
+    total_dos = TotalDos(args.vasprun.tdos.energies.tolist(),
+                         args.vasprun.tdos.densities[Spin.up].tolist(),
+                         args.vasprun.initial_structure.volume,
                          vbm, cbm)
     total_dos.to_json_file()
@@ -1,28 +1,64 @@
 # -*- coding: utf-8 -*-
 #  Copyright (c) 2020 Kumagai group.
-from typing import Dict
+from typing import Dict, List, Tuple, Union
 
 import numpy as np
-from pydefect.analyzer.band_edge_states import OrbitalInfo, \
-    BandEdgeOrbitalInfos
+from pydefect.analyzer.band_edge_states import BandEdgeOrbitalInfos
 from pydefect.analyzer.defect_structure_info import DefectStructureInfo
+from pydefect.cli.vasp.procar_reader import BandWindowProcar
 from pydefect.defaults import defaults
 from pymatgen.core import Structure
 from pymatgen.electronic_structure.core import Spin
 from pymatgen.io.vasp import Procar, Vasprun
 
 
-def make_band_edge_orbital_infos(procar: Procar,
+def make_band_edge_orbital_infos(procar: Union[Procar, BandWindowProcar],
                                  vasprun: Vasprun,
                                  vbm: float, cbm: float,
                                  str_info: DefectStructureInfo = None,
                                  eigval_shift: float = 0.0):
-    eigval_range = defaults.eigval_range
     kpt_coords = [tuple(coord) for coord in vasprun.actual_kpoints]
-    max_energy_by_spin, min_energy_by_spin = [], []
     neighbors = str_info.neighbor_atom_indices if str_info else None
+    lower_idx, upper_idx = band_edge_window(vasprun.eigenvalues, vbm, cbm)
+
+    s = vasprun.final_structure
+    window = slice(lower_idx, upper_idx + 1)
+    energies, occupations, orbitals, p_ratios = [], [], [], []
+    for spin, eigvals in vasprun.eigenvalues.items():
+        projections = band_projections(procar, spin, lower_idx, upper_idx)
+        elements, characters = orbital_characters(projections, s)
+        energies.append(eigvals[:, window, 0])
+        occupations.append(eigvals[:, window, 1])
+        orbitals.append(_rounded(characters))
+        if neighbors:
+            p_ratios.append(participation_ratios(projections, neighbors))
+
+    return BandEdgeOrbitalInfos(
+        energies=np.array(energies),
+        occupations=np.array(occupations),
+        orbitals=np.array(orbitals),
+        elements=elements,
+        kpt_coords=kpt_coords,
+        kpt_weights=vasprun.actual_kpoints_weights,
+        # need to convert numpy.int64 to int for mongoDB.
+        lowest_band_index=int(lower_idx),
+        fermi_level=vasprun.efermi,
+        eigval_shift=eigval_shift,
+        participation_ratios=np.array(p_ratios) if neighbors else None)
 
-    for e in vasprun.eigenvalues.values():
+
+def band_edge_window(eigenvalues: Dict[Spin, np.ndarray],
+                     vbm: float, cbm: float,
+                     eigval_range: float = defaults.eigval_range
+                     ) -> Tuple[int, int]:
+    """The lowest and highest band indices within eigval_range from the band
+    edges at any k-point and spin.
+
+    Args:
+        eigenvalues: Vasprun.eigenvalues, i.e., {spin: [k-point, band, 2]}.
+    """
+    max_energy_by_spin, min_energy_by_spin = [], []
+    for e in eigenvalues.values():
         max_energy_by_spin.append(np.amax(e[:, :, 0], axis=0))
         min_energy_by_spin.append(np.amin(e[:, :, 0], axis=0))
 
@@ -31,31 +67,77 @@ def make_band_edge_orbital_infos(procar: Procar,
 
     lower_idx = np.argwhere(max_energy_by_band > vbm - eigval_range)[0][0]
     upper_idx = np.argwhere(min_energy_by_band < cbm + eigval_range)[-1][-1]
+    return int(lower_idx), int(upper_idx)
 
-    orbs, s = procar.data, vasprun.final_structure
-    orb_infos = []
-    for spin, eigvals in vasprun.eigenvalues.items():
-        orb_infos.append([])
-        for k_idx in range(len(kpt_coords)):
-            orb_infos[-1].append([])
-            for b_idx in range(lower_idx, upper_idx + 1):
-                e, occ = eigvals[k_idx, b_idx, :]
-                orbitals = calc_orbital_character(orbs, s, spin, k_idx, b_idx)
-                if neighbors:
-                    p_ratio = calc_participation_ratio(
-                        orbs, spin, k_idx, b_idx, neighbors)
-                else:
-                    p_ratio = None
-                orb_infos[-1][-1].append(OrbitalInfo(e, orbitals, occ, p_ratio))
 
-    return BandEdgeOrbitalInfos(
-        orbital_infos=orb_infos,
-        kpt_coords=kpt_coords,
-        kpt_weights=vasprun.actual_kpoints_weights,
-        # need to convert numpy.int64 to int for mongoDB.
-        lowest_band_index=int(lower_idx),
-        fermi_level=vasprun.efermi,
-        eigval_shift=eigval_shift)
+def band_projections(procar: Union[Procar, BandWindowProcar],
+                     spin: Spin, lower_idx: int, upper_idx: int) -> np.ndarray:
+    """Projections of the bands from lower_idx to upper_idx with the shape
+    (k-point, band, ion, orbital). """
+    offset = getattr(procar, "lowest_band_index", 0)
+    if lower_idx < offset or upper_idx - offset >= procar.data[spin].shape[1]:
+        raise ValueError(f"Bands {lower_idx}-{upper_idx} are not parsed.")
+    return procar.data[spin][:, lower_idx - offset:upper_idx + 1 - offset]
+
+
+def element_groups(structure: Structure) -> Tuple[List[str], np.ndarray]:
+    """Elements in structure.symbol_set order and a matrix of shape
+    (element, ion) whose element is 1 when the ion is the element. """
+    elements = list(structure.symbol_set)
+    symbols = np.array([specie.symbol for specie in structure.species])
+    return elements, (symbols[None, :] == np.array(elements)[:, None]) * 1.0
+
+
+def orbital_groups(num_orbitals: int) -> np.ndarray:
+    """Matrix of shape (orbital, l) summing up orbitals into s, p, d (and f).
+
+    LORBIT 10 -> consider only "s", "p", "d" orbitals
+    LORBIT >=11 -> consider "s", "px", "py", "pz",.. orbitals, and "f" is
+                   always added, which is zero without f orbitals.
+    """
+    if num_orbitals > 5:
+        ranges = [(0, 1), (1, 4), (4, 9), (9, 16)]
+    else:
+        ranges = [(0, 1), (1, 2), (2, 3)]
+    result = np.zeros((num_orbitals, len(ranges)))
+    for ang_mom, (first, end) in enumerate(ranges):
+        result[first:end, ang_mom] = 1.0
+    return result
+
+
+def orbital_characters(projections: np.ndarray, structure: Structure
+                       ) -> Tuple[List[str], np.ndarray]:
+    """Element- and l-resolved sums of PROCAR projections.
+
+    Args:
+        projections: Array of shape (..., ion, orbital), e.g., the PROCAR data
+            of a spin with shape (k-point, band, ion, orbital).
+        structure: Structure whose sites correspond to the ions.
+
+    Returns:
+        Elements and the array of shape (..., element, l).
+    """
+    elements, element_matrix = element_groups(structure)
+    orbital_matrix = orbital_groups(projections.shape[-1])
+    characters = np.einsum("...io,ei,ol->...el", projections, element_matrix,
+                           orbital_matrix, optimize=True)
+    return elements, characters
+
+
+def participation_ratios(projections: np.ndarray, atom_indices: list
+                         ) -> np.ndarray:
+    """Participation ratios at atom_indices sites for projections of shape
+    (..., ion, orbital). """
+    sum_per_atom = np.sum(projections, axis=-1)
+    return (np.sum(sum_per_atom[..., atom_indices], axis=-1)
+            / np.sum(sum_per_atom, axis=-1))
+
+
+def _rounded(characters: np.ndarray) -> list:
+    # Python's round is used to keep the same values as written before.
+    if characters.ndim == 1:
+        return [round(c, 3) for c in characters.tolist()]
+    return [_rounded(c) for c in characters]
 
 
 def calc_participation_ratio(orbitals: Dict[Spin, np.ndarray],
@@ -76,8 +158,8 @@ def calc_participation_ratio(orbitals: Dict[Spin, np.ndarray],
     Return (float):
         float of the participation ratio.
     """
-    sum_per_atom = np.sum(orbitals[spin][kpt_index, band_index, :, :], axis=1)
-    return np.sum(sum_per_atom[atom_indices]) / np.sum(sum_per_atom)
+    return float(participation_ratios(
+        orbitals[spin][kpt_index, band_index], atom_indices))
 
 
 def calc_orbital_character(orbitals,
@@ -85,37 +167,7 @@ def calc_orbital_character(orbitals,
                            spin: Spin,
                            kpt_index: int,
                            band_index: int):
-    """ Consider the two pattern of orbitals.
-
-    LORBIT 10 -> consider only "s", "p", "d" orbitals
-    LORBIT >=11 -> consider "s", "px", "py", "pz",.. orbitals
-
-    """
-
-    def projection_sum(atom_indices: tuple, first: int, last: int):
-        end = last + 1
-        procar_sum = np.sum(orbitals[spin]
-                            [kpt_index, band_index, atom_indices, first:end])
-        return float(procar_sum)
-
-    orbital_components = {}
-    azimuthal = len(orbitals[Spin.up][0, 0, 0]) > 5
-
-    for element in structure.symbol_set:
-        # get list of index
-        indices = structure.indices_from_symbol(element)
-        if azimuthal:
-            orbital_components[element] = \
-                [round(projection_sum(indices, 0, 0), 3),
-                 round(projection_sum(indices, 1, 3), 3),
-                 round(projection_sum(indices, 4, 8), 3)]
-            try:
-                orbital_components[element].append(round(projection_sum(indices, 9, 16), 3))
-            except KeyError:
-                pass
-        else:
-            orbital_components[element] = \
-                [round(projection_sum(indices, 0, 0), 3),
-                 round(projection_sum(indices, 1, 1), 3),
-                 round(projection_sum(indices, 2, 2), 3)]
-    return orbital_components
\ No newline at end of file
+    """Orbital characters of a band at a k-point. See orbital_groups. """
+    elements, characters = orbital_characters(
+        orbitals[spin][kpt_index, band_index], structure)
+    return dict(zip(elements, _rounded(characters)))
@@ -1,62 +1,112 @@
 # -*- coding: utf-8 -*-
 #  Copyright (c) 2020 Kumagai group.
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Iterator
 
 import numpy as np
 from pydefect.analyzer.defect_charge_info import DefectChargeInfo, \
     AveChargeDensityDist
 from pydefect.analyzer.grids import Grids
 from pydefect.cli.vasp.make_efnv_correction import calc_max_sphere_radius
+from pydefect.util.volumetric_store import open_volumetric_data
+from pymatgen.core import Lattice
 from pymatgen.io.vasp import Chgcar
-from vise.analyzer.vasp.handle_volumetric_data import make_spin_charges
 
 
-def center_1d_periodic_quantity(grid_points: List[float]):
-    num_grid_pts = len(grid_points)
-    moments = []
-    for i in range(num_grid_pts):
-        moment = 0.0
-        if num_grid_pts % 2 == 0:
-            for j in range(1, int(num_grid_pts / 2 + 1)):
-                moment += grid_points[i - j] * j
-            for j in range(1, int(num_grid_pts / 2)):
-                k = (i + j - num_grid_pts) % num_grid_pts
-                moment += grid_points[k] * j
-        else:
-            a = int(np.floor(num_grid_pts / 2))
-            for j in range(1, a + 1):
-                moment += grid_points[i - j] * j
-            for j in range(1, a + 1):
-                k = (i + j - num_grid_pts) % num_grid_pts
-                moment += grid_points[k] * j
+def _direct_moment(quantity: np.ndarray, i: int) -> float:
+    n = len(quantity)
+    half = n // 2
+    moment = 0.0
+    for j in range(1, half + 1):
+        moment += quantity[i - j] * j
+    for j in range(1, half if n % 2 == 0 else half + 1):
+        moment += quantity[(i + j) % n] * j
+    return moment
 
-        moments.append(moment)
 
-    return np.nanargmin(moments)
+def center_1d_periodic_quantity(grid_points: List[float],
+                                sub_grid: bool = False):
+    """Grid index minimizing the periodic moment of the quantity.
+
+    The moment at index i is sum_k q[k] * min(d, N - d) with d = (k - i) % N,
+    i.e., a circular cross-correlation with a symmetric kernel, which is
+    evaluated for all the indices at once by FFT.
+
+    Args:
+        grid_points: Quantity along an axis.
+        sub_grid: If True, the center is refined to a fractional index by a
+            parabola through the moments at the minimum and its neighbors.
+    """
+    quantity = np.asarray(grid_points, dtype=float)
+    n = len(quantity)
+    d = np.arange(n)
+    kernel = np.minimum(d, n - d)
+    moments = np.fft.irfft(np.fft.rfft(quantity) * np.fft.rfft(kernel), n=n)
+
+    # Near-degenerate minima within the FFT round-off are resolved by the
+    # moments summed in the original order, so that the same index is chosen.
+    tol = 1e-10 * (np.sum(np.abs(quantity)) * n + 1.0)
+    candidates = np.where(moments <= np.min(moments) + tol)[0]
+    if len(candidates) == 1:
+        idx = int(candidates[0])
+    else:
+        direct = [_direct_moment(quantity, i) for i in candidates]
+        idx = int(candidates[np.nanargmin(direct)])
+    if sub_grid is False:
+        return idx
+
+    y0, y1, y2 = moments[(idx - 1) % n], moments[idx], moments[(idx + 1) % n]
+    denominator = y0 - 2 * y1 + y2
+    shift = 0.5 * (y0 - y2) / denominator if denominator > 0 else 0.0
+    return (idx + shift) % n
+
+
+def average_along_axis(data: np.ndarray, axis: int) -> np.ndarray:
+    """Same as VolumetricData.get_average_along_axis for a bare array. """
+    other_axes = [i for i in range(3) if i != axis]
+    total = np.sum(np.sum(data, axis=other_axes[0]), other_axes[1] - 1)
+    return total / data.shape[(axis + 1) % 3] / data.shape[(axis + 2) % 3]
+
+
+def charge_center(data: np.ndarray, sub_grid: bool = False) -> np.ndarray:
+    """Grid indices of the center of the quantity along each axis. """
+    return np.array([center_1d_periodic_quantity(average_along_axis(data, i),
+                                                 sub_grid) for i in [0, 1, 2]])
+
+
+def spin_densities(parchg: Chgcar) -> Iterator[np.ndarray]:
+    """Yield the spin-up and, if any, spin-down densities one by one, which
+    are the same as those of make_spin_charges without copying structures.
+    A VolumetricStore reads the diff component only when it exists.
+    """
+    total = parchg.data["total"]
+    diff = parchg.data.get("diff")
+    if diff is None:
+        yield 0.5 * total
+    else:
+        yield 0.5 * (total + diff)
+        yield 0.5 * (total - diff)
 
 
 def make_charge_dist(parchg: Chgcar, grids: Grids, distance_bins: np.ndarray):
     assert parchg.structure.lattice == grids.lattice
     assert parchg.dim == grids.dim
 
-    spin_charges = make_spin_charges(parchg)
-
-    dists = []
-    defect_center_idxs = []
-    for chg in spin_charges:
-        center = [center_1d_periodic_quantity(
-            chg.get_average_along_axis(i)) for i in [0, 1, 2]]
-        defect_center_idxs.append(np.array(center))
-        data = chg.data["total"]
-        dists.append(grids.spherical_dist(data, center, distance_bins))
-
     result = []
-    for c, d in zip(defect_center_idxs, dists):
-        result.append(AveChargeDensityDist(tuple(c / grids.dim), d))
+    for data in spin_densities(parchg):
+        center = charge_center(data)
+        dist = grids.spherical_dist(data, center, distance_bins)
+        result.append(AveChargeDensityDist(tuple(center / grids.dim), dist))
 
     return result
 
 
+def make_distance_bins(lattice: Lattice, bin_interval: float) -> np.ndarray:
+    radius = calc_max_sphere_radius(lattice.matrix)
+    num_bins = int(np.ceil(radius / bin_interval))
+    return np.array([bin_interval * i for i in range(num_bins)] + [radius])
+
+
 def make_defect_charge_info(parchgs: List[Chgcar],
                             band_idxs: List[int],
                             bin_interval: float,
@@ -64,9 +114,8 @@ def make_defect_charge_info(parchgs: List[Chgcar],
     if grids is None:
         grids = Grids.from_chgcar(parchgs[0])
 
-    radius = calc_max_sphere_radius(parchgs[0].structure.lattice.matrix)
-    num_bins = int(np.ceil(radius / bin_interval))
-    distance_bins = np.array([bin_interval * i for i in range(num_bins)] + [radius])
+    distance_bins = make_distance_bins(parchgs[0].structure.lattice,
+                                       bin_interval)
     ave_charge_density = 1.0 / parchgs[0].structure.volume
     charge_dists = []
     for parchg in parchgs:
@@ -74,3 +123,54 @@ def make_defect_charge_info(parchgs: List[Chgcar],
     return DefectChargeInfo(distance_bins.tolist(), band_idxs, charge_dists,
                             ave_charge_density)
 
+
+def charge_dist_from_file(filename: str,
+                          grids: Grids,
+                          distance_bins: np.ndarray
+                          ) -> List[AveChargeDensityDist]:
+    """Parse a PARCHG file or read its store, and analyze it. The volumetric
+    data are discarded when returning. """
+    return make_charge_dist(open_volumetric_data(filename), grids,
+                            distance_bins)
+
+
+_worker_kwargs = {}
+
+
+def _init_worker(grids: Grids, distance_bins: np.ndarray) -> None:
+    # Grids are sent to each worker process once, not for every band.
+    _worker_kwargs.update(grids=grids, distance_bins=distance_bins)
+
+
+def _charge_dist_in_worker(filename: str) -> List[AveChargeDensityDist]:
+    return charge_dist_from_file(filename, **_worker_kwargs)
+
+
+def make_defect_charge_info_from_files(filenames: List[str],
+                                       band_idxs: List[int],
+                                       bin_interval: float,
+                                       grids: Grids = None,
+                                       num_processes: int = None
+                                       ) -> DefectChargeInfo:
+    """Streaming version of make_defect_charge_info.
+
+    PARCHG files are parsed, analyzed and discarded one by one, so only a
+    single band is held in memory per process. When num_processes > 1, the
+    bands are distributed over a process pool.
+    """
+    if grids is None:
+        grids = Grids.from_chgcar(open_volumetric_data(filenames[0]))
+
+    distance_bins = make_distance_bins(grids.lattice, bin_interval)
+    if num_processes and num_processes > 1:
+        with ProcessPoolExecutor(max_workers=num_processes,
+                                 initializer=_init_worker,
+                                 initargs=(grids, distance_bins)) as executor:
+            charge_dists = list(executor.map(_charge_dist_in_worker,
+                                             filenames))
+    else:
+        charge_dists = [charge_dist_from_file(f, grids, distance_bins)
+                        for f in filenames]
+
+    return DefectChargeInfo(distance_bins.tolist(), band_idxs, charge_dists,
+                            1.0 / grids.lattice.volume)
@@ -1,22 +1,21 @@
 # -*- coding: utf-8 -*-
 #  Copyright (c) 2020 Kumagai group.
 import itertools
-from itertools import groupby
+from dataclasses import replace
+from time import time
 from typing import List
 
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
-from pydefect.analyzer.defect_structure_info import remove_dot
 from pydefect.input_maker.local_extrema import VolumetricDataLocalExtrema, \
-    CoordInfo, VolumetricDataAnalyzeParams
-from pydefect.util.structure_tools import Distances
-from pymatgen.core import Element, Structure
-from pymatgen.io.vasp import VolumetricData, Chgcar
-from scipy.cluster.hierarchy import linkage, fcluster
-from scipy.spatial.distance import squareform
+    CoordInfo, VolumetricDataAnalyzeParams, make_coord_infos
+from pydefect.util.periodic_neighbors import cluster_periodic_points, \
+    merge_clusters, nearest_distances
+from pydefect.util.volumetric_store import load_volumetric_data
+from pymatgen.core import Structure, Lattice
+from pymatgen.io.vasp import VolumetricData
 from vise.util.logger import get_logger
-from vise.util.structure_symmetrizer import StructureSymmetrizer
 
 logger = get_logger(__name__)
 
@@ -25,8 +24,35 @@ def make_local_extrema_from_volumetric_data(
         volumetric_data: VolumetricData,
         params: VolumetricDataAnalyzeParams,
         info: str = None,
-        find_min: bool = True) -> VolumetricDataLocalExtrema:
+        find_min: bool = True,
+        cross_check: bool = False) -> VolumetricDataLocalExtrema:
+    """
+    Args:
+        cross_check (bool): When params.coarse_factor is set, run the
+            full-resolution search as well, and report the speedup and the
+            extrema that are not reproduced by the multiresolution search.
+    """
+    start = time()
     extrema = extrema_coords(volumetric_data, find_min, params)
+    if params.coarse_factor and cross_check:
+        elapsed = time() - start
+        start = time()
+        full_params = replace(params, coarse_factor=None)
+        full = extrema_coords(volumetric_data, find_min, full_params)
+        full_elapsed = time() - start
+        logger.info(f"Multiresolution search: {elapsed:.3g} s, full search: "
+                    f"{full_elapsed:.3g} s, speedup: "
+                    f"{full_elapsed / elapsed:.3g}.")
+        missing = cross_check_extrema(volumetric_data.structure.lattice,
+                                      extrema, full, params.tol)
+        if len(missing):
+            logger.warning(f"{len(missing)} of {len(full)} extrema in the full "
+                           f"search are not found by the multiresolution "
+                           f"search.\n" + missing.__str__())
+        else:
+            logger.info("All the extrema in the full search are found by the "
+                        "multiresolution search.")
+
     coord_infos = find_inequivalent_coords(volumetric_data.structure,
                                            extrema)
     return VolumetricDataLocalExtrema(volumetric_data.structure,
@@ -36,47 +62,25 @@ def make_local_extrema_from_volumetric_data(
                                       params=params)
 
 
+def cross_check_extrema(lattice: Lattice,
+                        extrema: DataFrame,
+                        reference: DataFrame,
+                        tol: float) -> DataFrame:
+    """Rows of reference farther than tol from all the extrema. """
+    if len(reference) == 0 or len(extrema) == 0:
+        return reference
+    distances = nearest_distances(lattice,
+                                  reference[["a", "b", "c"]].to_numpy(float),
+                                  extrema[["a", "b", "c"]].to_numpy(float))
+    return reference[distances > (tol or 0.0) + 1e-5]
+
+
 def find_inequivalent_coords(structure: Structure,
                              df: DataFrame) -> List[CoordInfo]:
-    result = []
-    initial_sg = StructureSymmetrizer(structure).sg_number
-    added_structure = Structure.from_dict(structure.as_dict())
-    start_index = len(structure)
-    for _, column in df.iterrows():
-        coords = [column.a, column.b, column.c]
-        assert Element.Og not in structure.composition.elements
-        added_structure.append(Element.Og, coords)
-    end_index = len(added_structure)
-
-    symmetrizer = StructureSymmetrizer(added_structure)
-
-    if initial_sg != symmetrizer.sg_number:
-        logger.warning("The symmetry has changed, meaning all the symmetry "
-                       "equivalent sites do not exist.")
-
-    sym_data = symmetrizer.spglib_sym_data
-    _indices = [i for i in range(start_index, end_index)]
-    repr_atom_pairs = zip(sym_data["equivalent_atoms"][_indices], _indices)
-
-    key = lambda x: x[0]
-    for _, equiv_sites in groupby(sorted(repr_atom_pairs, key=key), key=key):
-        coords, quantity = [], []
-        for repr_idx, atom_idx in equiv_sites:
-            fcoord = added_structure[atom_idx].frac_coords
-            coords.append(tuple(fcoord))
-            key = "ave_value" if "ave_value" in df else "value"
-            quantity.append(df[key][atom_idx - start_index])
-            if repr_idx == atom_idx:
-                site_sym = sym_data["site_symmetry_symbols"][atom_idx]
-                distances = Distances(structure, fcoord)
-                coordination = distances.coordination()
-
-        coord_info = CoordInfo(site_symmetry=remove_dot(site_sym),
-                               coordination=coordination,
-                               frac_coords=coords,
-                               quantities=quantity)
-        result.append(coord_info)
-    return result
+    key = "ave_value" if "ave_value" in df else "value"
+    return make_coord_infos(structure,
+                            frac_coords=df[["a", "b", "c"]].to_numpy(float),
+                            quantities=df[key].tolist())
 
 
 class ChargeDensityAnalyzer:
@@ -102,12 +106,12 @@ class ChargeDensityAnalyzer:
     @classmethod
     def from_file(cls, chgcar_filename):
         """
-        Init from a CHGCAR.
+        Init from a CHGCAR or a volumetric data store.
 
         :param chgcar_filename:
         :return:
         """
-        chgcar = Chgcar.from_file(chgcar_filename)
+        chgcar = load_volumetric_data(chgcar_filename, keys=["total"])
         return cls(chgcar=chgcar)
 
     @property
@@ -229,27 +233,14 @@ class ChargeDensityAnalyzer:
             extrema_coords (list): list of fractional coordinates corresponding
                 to local extrema.
         """
-        try:
-            from skimage.feature import peak_local_max
-        except ImportError:
-            logger.warning("To find the extrema of the coordinates, "
-                           "install scikit-image.")
-            raise
-
         sign, extrema_type = 1, "local maxima"
 
         if find_min:
             sign, extrema_type = -1, "local minima"
 
-        # Make 3x3x3 supercell
-        # This is a trick to resolve the periodical boundary issue.
         total_chg = sign * self.chgcar.data["total"]
-        total_chg = np.tile(total_chg, reps=(3, 3, 3))
-        coordinates = peak_local_max(total_chg, min_distance=1)
-
-        # Remove duplicated sites introduced by supercell.
-        f_coords = [coord / total_chg.shape * 3 for coord in coordinates]
-        f_coords = [f - 1 for f in f_coords if all(np.array(f) < 2) and all(np.array(f) >= 1)]
+        indices = periodic_peak_indices(total_chg)
+        f_coords = [grid_index_to_frac(i, total_chg.shape) for i in indices]
 
         # Update information
         self._update_extrema(
@@ -261,6 +252,55 @@ class ChargeDensityAnalyzer:
 
         return self.extrema_coords
 
+    def get_local_extrema_multiresolution(self,
+                                          coarse_factor: int,
+                                          find_min=True,
+                                          threshold_frac=None,
+                                          threshold_abs=None):
+        """
+        Get local extrema with a coarse-to-fine search. The grid is block
+        averaged by coarse_factor along each axis, the extrema are searched
+        on the coarse grid, and each of them is refined to the extremum of the
+        full-resolution grid inside a window spanning its block and the
+        neighboring ones.
+
+        Args:
+            coarse_factor (int): Number of grid points averaged along each
+                axis.
+
+            See get_local_extrema for the other arguments.
+
+        Returns:
+            extrema_coords (list): list of fractional coordinates corresponding
+                to local extrema.
+        """
+        sign, extrema_type = 1, "local maxima"
+
+        if find_min:
+            sign, extrema_type = -1, "local minima"
+
+        total_chg = sign * self.chgcar.data["total"]
+        coarse_chg = block_average(total_chg, coarse_factor)
+        indices = set()
+        for coarse_idx in periodic_peak_indices(coarse_chg):
+            window = [np.arange((i - 1) * coarse_factor,
+                                (i + 2) * coarse_factor) % n
+                      for i, n in zip(coarse_idx, total_chg.shape)]
+            sub_data = total_chg[np.ix_(*window)]
+            local_idx = np.unravel_index(np.argmax(sub_data), sub_data.shape)
+            indices.add(tuple(w[j] for w, j in zip(window, local_idx)))
+
+        f_coords = [grid_index_to_frac(np.array(i), total_chg.shape)
+                    for i in sorted(indices)]
+        self._update_extrema(
+            f_coords,
+            extrema_type,
+            threshold_frac=threshold_frac,
+            threshold_abs=threshold_abs,
+        )
+
+        return self.extrema_coords
+
     def cluster_nodes(self, tol=0.2):
         """
         Cluster nodes that are too close together using a tol.
@@ -279,29 +319,10 @@ class ChargeDensityAnalyzer:
             self._update_extrema(new_f_coords, self.extrema_type)
             return new_f_coords
 
-        # Manually generate the distance matrix (which needs to take into
-        # account PBC.
-        dist_matrix = np.array(lattice.get_all_distances(vf_coords, vf_coords))
-        dist_matrix = (dist_matrix + dist_matrix.T) / 2
-
-        for i in range(len(dist_matrix)):
-            dist_matrix[i, i] = 0
-        condensed_m = squareform(dist_matrix)
-        z = linkage(condensed_m)
-        cn = fcluster(z, tol, criterion="distance")
-        merged_fcoords = []
-
-        for n in set(cn):
-            frac_coords = []
-            for i, j in enumerate(np.where(cn == n)[0]):
-                if i == 0:
-                    frac_coords.append(self.extrema_coords[j])
-                else:
-                    f_coords = self.extrema_coords[j]
-                    # We need the image to combine the frac_coords properly.
-                    d, image = lattice.get_distance_and_image(frac_coords[0], f_coords)
-                    frac_coords.append(f_coords + image)
-            merged_fcoords.append(np.average(frac_coords, axis=0))
+        # Single-linkage clustering via periodic neighbor pairs within tol,
+        # which scales with the number of neighbors instead of all pairs.
+        labels = cluster_periodic_points(lattice, vf_coords, tol)
+        merged_fcoords = merge_clusters(lattice, vf_coords, labels)
 
         merged_fcoords = [f - np.floor(f) for f in merged_fcoords]
         merged_fcoords = [f * (np.abs(f - 1) > 1e-15) for f in merged_fcoords]
@@ -332,8 +353,8 @@ class ChargeDensityAnalyzer:
             self._update_extrema(new_f_coords, self.extrema_type)
             return new_f_coords
 
-        dist_matrix = self.structure.lattice.get_all_distances(f_coords, s_f_coords)
-        all_dist = np.min(dist_matrix, axis=1)
+        all_dist = nearest_distances(self.structure.lattice, f_coords,
+                                     s_f_coords, upper_bound=min_dist)
         new_f_coords = []
 
         for i, f in enumerate(f_coords):
@@ -436,6 +457,44 @@ class ChargeDensityAnalyzer:
         return dist_from_pos.reshape(AA.shape)
 
 
+def block_average(data: np.ndarray, factor: int) -> np.ndarray:
+    """Average data over blocks of factor grid points along each axis.
+    The last block is smaller when the grid is not divisible by factor. """
+    for axis in range(data.ndim):
+        starts = np.arange(0, data.shape[axis], factor)
+        counts = np.diff(np.append(starts, data.shape[axis]))
+        shape = [1] * data.ndim
+        shape[axis] = -1
+        data = np.add.reduceat(data, starts, axis=axis) / counts.reshape(shape)
+    return data
+
+
+def periodic_peak_indices(data: np.ndarray) -> List[np.ndarray]:
+    """Grid indices of the local maxima in periodic data. """
+    try:
+        from skimage.feature import peak_local_max
+    except ImportError:
+        logger.warning("To find the extrema of the coordinates, "
+                       "install scikit-image.")
+        raise
+
+    # Make 3x3x3 supercell
+    # This is a trick to resolve the periodical boundary issue.
+    shape = np.array(data.shape)
+    coordinates = peak_local_max(np.tile(data, reps=(3, 3, 3)), min_distance=1)
+
+    # Remove duplicated sites introduced by supercell.
+    return [c - shape for c in coordinates
+            if all(c >= shape) and all(c < 2 * shape)]
+
+
+def grid_index_to_frac(index: np.ndarray, shape) -> np.ndarray:
+    # The same arithmetic as on the 3x3x3 tiled grid, so that the fractional
+    # coordinates are mapped back onto the same grid index.
+    shape = np.array(shape)
+    return (index + shape) / (3 * shape) * 3 - 1
+
+
 def extrema_coords(volumetric_data: VolumetricData,
                    find_min: bool,
                    params: VolumetricDataAnalyzeParams) -> DataFrame:
@@ -450,9 +509,16 @@ def extrema_coords(volumetric_data: VolumetricData,
                 "see https://peerj.com/articles/453")
 
     result = ChargeDensityAnalyzer(chgcar=volumetric_data)
-    result.get_local_extrema(threshold_frac=params.threshold_frac,
-                             threshold_abs=params.threshold_abs,
-                             find_min=find_min)
+    if params.coarse_factor:
+        result.get_local_extrema_multiresolution(
+            coarse_factor=params.coarse_factor,
+            threshold_frac=params.threshold_frac,
+            threshold_abs=params.threshold_abs,
+            find_min=find_min)
+    else:
+        result.get_local_extrema(threshold_frac=params.threshold_frac,
+                                 threshold_abs=params.threshold_abs,
+                                 find_min=find_min)
     if params.min_dist:
         # Remove sites near host atoms.
         result.remove_collisions(params.min_dist)
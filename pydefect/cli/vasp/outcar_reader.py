@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import mmap
+import re
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Union
+
+from monty.functools import lazy_property
+from pymatgen.io.vasp import Outcar
+from vise.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+_compressed_suffixes = (".gz", ".bz2", ".xz", ".lzma", ".z", ".Z")
+
+_e0_pattern = re.compile(r"energy\(sigma->0\)\s*=\s+([\d\-\.]+)")
+_nelect_pattern = re.compile(r"NELECT\s*=\s*([\d\.]+)")
+_mag_pattern = re.compile(
+    r"number of electron\s+\S+\s+magnetization\s+(\S+)")
+_pot_pattern = re.compile(r"\s+\d+\s*([\.\-\d]+)+")
+_tensor_row_pattern = re.compile(
+    r"^ *([-0-9.Ee+]+) +([-0-9.Ee+]+) +([-0-9.Ee+]+) *$")
+
+
+class OutcarReader:
+    """Outcar-like object that reads only the blocks being accessed.
+
+    The OUTCAR is memory-mapped, and the last occurrence of each block is
+    searched backwards from the end of the file, so that the cost does not
+    scale with the number of ionic steps. The attributes have the same
+    names and types as those of pymatgen's Outcar. When a block is not
+    found, the attribute is taken from pymatgen's Outcar instead.
+    """
+
+    def __init__(self, filename: Union[str, Path]):
+        self.filename = str(filename)
+
+    @contextmanager
+    def _mmap(self):
+        with open(self.filename, "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+    def _last_lines(self, keyword: str, num_lines: int = 1,
+                    stop_at_blank: bool = False,
+                    from_head: bool = False) -> Optional[List[str]]:
+        """Lines from the last one including keyword, or None if not found.
+
+        When from_head is True, the first one is searched from the head of
+        the file instead, which is for the parameters.
+        """
+        with self._mmap() as mm:
+            find = mm.find if from_head else mm.rfind
+            idx = find(keyword.encode())
+            if idx < 0:
+                return None
+            start = mm.rfind(b"\n", 0, idx) + 1
+            result = []
+            while start < len(mm) and (stop_at_blank or len(result) < num_lines):
+                end = mm.find(b"\n", start)
+                end = len(mm) if end < 0 else end
+                line = mm[start:end].decode()
+                if stop_at_blank and result and not line.strip():
+                    break
+                result.append(line)
+                start = end + 1
+        return result
+
+    @lazy_property
+    def _outcar(self) -> Outcar:
+        logger.info(f"Parse {self.filename} with pymatgen.")
+        return Outcar(self.filename)
+
+    def _fallback(self, name: str):
+        return getattr(self._outcar, name)
+
+    @lazy_property
+    def final_energy(self) -> float:
+        lines = self._last_lines("energy(sigma->0)")
+        match = lines and _e0_pattern.search(lines[0])
+        return float(match[1]) if match else self._fallback("final_energy")
+
+    @lazy_property
+    def _electron_line(self) -> Optional[str]:
+        lines = self._last_lines("number of electron")
+        return lines[0] if lines else None
+
+    @lazy_property
+    def nelect(self) -> float:
+        """NELECT parameter, which is equal to that at the first electronic
+        step used by pymatgen's Outcar for a spin-unpolarized calculation.
+        """
+        lines = self._last_lines("NELECT", from_head=True)
+        match = lines and _nelect_pattern.search(lines[0])
+        return float(match[1]) if match else self._fallback("nelect")
+
+    @lazy_property
+    def total_mag(self) -> Optional[float]:
+        """None for a spin-unpolarized calculation as pymatgen's Outcar. """
+        if self._electron_line is None:
+            return self._fallback("total_mag")
+        match = _mag_pattern.search(self._electron_line)
+        return float(match[1]) if match else None
+
+    @lazy_property
+    def electrostatic_potential(self) -> List[float]:
+        """Site potentials of the last ionic step. """
+        lines = self._last_lines("(the norm of the test charge is",
+                                 stop_at_blank=True)
+        if lines is None:
+            outcar = self._outcar
+            outcar.read_electrostatic_potential()
+            return outcar.electrostatic_potential
+        return [float(p) for p in _pot_pattern.findall("\n".join(lines[1:]))]
+
+    def _last_tensor(self, keyword: str) -> Optional[List[List[float]]]:
+        # A header, a dashed line and three rows.
+        lines = self._last_lines(keyword, num_lines=5)
+        if lines is None:
+            return None
+        rows = [_tensor_row_pattern.match(line) for line in lines[2:]]
+        if not all(rows):
+            return None
+        return [[float(r[i]) for i in range(1, 4)] for r in rows]
+
+    def read_lepsilon(self) -> None:
+        """Set dielectric_tensor, i.e., the electronic contribution. """
+        tensor = self._last_tensor("MACROSCOPIC STATIC DIELECTRIC TENSOR (")
+        if tensor is None:
+            self._outcar.read_lepsilon()
+            tensor = self._outcar.dielectric_tensor
+        self.dielectric_tensor = tensor
+
+    def read_lepsilon_ionic(self) -> None:
+        """Set dielectric_ionic_tensor. """
+        tensor = self._last_tensor("MACROSCOPIC STATIC DIELECTRIC TENSOR IONIC")
+        if tensor is None:
+            self._outcar.read_lepsilon_ionic()
+            tensor = self._outcar.dielectric_ionic_tensor
+        self.dielectric_ionic_tensor = tensor
+
+
+def read_outcar(filename: Union[str, Path]) -> Union[OutcarReader, Outcar]:
+    """OutcarReader for a plain OUTCAR, or pymatgen's Outcar for a
+    compressed or empty one, which cannot be memory-mapped. """
+    path = Path(filename)
+    if path.suffix in _compressed_suffixes or path.stat().st_size == 0:
+        return Outcar(filename)
+    return OutcarReader(filename)
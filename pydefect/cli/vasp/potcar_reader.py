@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+from vise.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Pairs of the POTCAR symbol, e.g., He_pv, and the number of valence
+# electrons, i.e., ZVAL, which correspond to Potcar.symbols and
+# PotcarSingle.nelectrons.
+Valences = List[Tuple[str, float]]
+
+_titel_pattern = re.compile(r"TITEL\s*=\s*\S+\s+(\S+)")
+_zval_pattern = re.compile(r"ZVAL\s*=\s*([-\d\.]+)")
+_header_end = "END of PSCTR"
+_dataset_end = "End of Dataset"
+
+# Content hash of POTCAR -> valences. The POTCAR files in the directories of
+# a project are usually identical, so each of them is scanned once per run.
+_valence_cache: Dict[str, Valences] = {}
+
+
+def scan_potcar_valences(text: str) -> Valences:
+    """Valences from the header of each dataset in the POTCAR text.
+
+    The projector and grid data following the headers are skipped with
+    str.find, so the numbers in them are never parsed.
+    """
+    result = []
+    start = text.find("TITEL")
+    while start >= 0:
+        end = text.find(_header_end, start)
+        end = len(text) if end < 0 else end
+        header = text[start:end]
+        titel, zval = _titel_pattern.search(header), _zval_pattern.search(header)
+        if titel is None or zval is None:
+            raise ValueError(f"TITEL or ZVAL is not found in {header[:80]}.")
+        result.append((titel[1], float(zval[1])))
+        pos = text.find(_dataset_end, end)
+        start = text.find("TITEL", pos) if pos >= 0 else -1
+    if not result:
+        raise ValueError("No POTCAR dataset is found.")
+    return result
+
+
+def potcar_valences(filename: Union[str, Path]) -> Valences:
+    """Valences of the POTCAR file, cached by the hash of its content. """
+    content = Path(filename).read_bytes()
+    key = hashlib.sha256(content).hexdigest()
+    if key not in _valence_cache:
+        _valence_cache[key] = scan_potcar_valences(
+            content.decode(errors="replace"))
+    else:
+        logger.debug(f"Valences of {filename} are taken from the cache.")
+    return _valence_cache[key]
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple, Optional, Union
+from zipfile import BadZipFile
+
+import numpy as np
+from monty.io import zopen
+from pymatgen.electronic_structure.core import Spin
+from vise.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+_preamble = re.compile(
+    r"# of k-points:\s*(\d+)\s+# of bands:\s*(\d+)\s+# of ions:\s*(\d+)")
+
+
+@dataclass
+class BandWindowProcar:
+    """PROCAR projections of the bands from lowest_band_index.
+
+    data[spin] has the shape (k-point, band - lowest_band_index, ion, orbital)
+    as Procar.data without the bands outside the window, while eigenvalues
+    and occupancies of all the bands have the shape (k-point, band).
+    """
+    data: Dict[Spin, np.ndarray]
+    lowest_band_index: int
+    orbitals: List[str]
+    eigenvalues: Dict[Spin, np.ndarray]
+    occupancies: Dict[Spin, np.ndarray]
+
+    @property
+    def highest_band_index(self) -> int:
+        return self.lowest_band_index + self.data[Spin.up].shape[1] - 1
+
+    def covers(self, band_window: Tuple[int, int]) -> bool:
+        return (self.lowest_band_index <= band_window[0]
+                and band_window[1] <= self.highest_band_index)
+
+    def sliced(self, band_window: Tuple[int, int]) -> "BandWindowProcar":
+        first = band_window[0] - self.lowest_band_index
+        end = band_window[1] - self.lowest_band_index + 1
+        data = {spin: d[:, first:end] for spin, d in self.data.items()}
+        return BandWindowProcar(data, band_window[0], self.orbitals,
+                                self.eigenvalues, self.occupancies)
+
+    def dump(self, filename: Union[str, Path], source_stat: tuple = None):
+        arrays = {"lowest_band_index": self.lowest_band_index,
+                  "orbitals": np.array(self.orbitals)}
+        for spin in self.data:
+            name = str(spin)
+            arrays[f"data_{name}"] = self.data[spin]
+            arrays[f"eigenvalues_{name}"] = self.eigenvalues[spin]
+            arrays[f"occupancies_{name}"] = self.occupancies[spin]
+        if source_stat:
+            arrays["source_stat"] = np.array(source_stat, dtype=float)
+        np.savez_compressed(filename, **arrays)
+
+    @classmethod
+    def from_file(cls, filename: Union[str, Path]) -> "BandWindowProcar":
+        with np.load(filename) as loaded:
+            return cls._from_npz(loaded)
+
+    @classmethod
+    def _from_npz(cls, loaded) -> "BandWindowProcar":
+        spins = [s for s in [Spin.up, Spin.down] if f"data_{s}" in loaded]
+        return cls(data={s: loaded[f"data_{s}"] for s in spins},
+                   lowest_band_index=int(loaded["lowest_band_index"]),
+                   orbitals=loaded["orbitals"].tolist(),
+                   eigenvalues={s: loaded[f"eigenvalues_{s}"] for s in spins},
+                   occupancies={s: loaded[f"occupancies_{s}"] for s in spins})
+
+
+def _source_stat(filename: Union[str, Path]) -> tuple:
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime
+
+
+def parse_procar(filename: Union[str, Path],
+                 band_window: Optional[Tuple[int, int]] = None
+                 ) -> BandWindowProcar:
+    """Parse only the projections of the bands in band_window.
+
+    The header gives the array shapes, so the projections are written into
+    preallocated arrays. For the bands outside the window, only the band
+    lines are parsed for the eigenvalues, and the ion and phase lines are
+    skipped without being converted to numbers.
+
+    Args:
+        filename: PROCAR file name, which can be compressed.
+        band_window: The lowest and highest band indices (0-based, inclusive).
+            When None, all the bands are parsed.
+    """
+    data, eigenvalues, occupancies = {}, {}, {}
+    orbitals = None
+    spin_idx, k_idx, band_idx = -1, -1, -1
+    lower = upper = None
+    in_window = False
+    ion_lines = []
+    with zopen(filename, mode="rt") as f:
+        for line in f:
+            stripped = line.lstrip()
+            if stripped.startswith("band"):
+                tokens = stripped.split()
+                band_idx = int(tokens[1]) - 1
+                eigenvalues[spin][k_idx, band_idx] = float(tokens[4])
+                occupancies[spin][k_idx, band_idx] = float(tokens[-1])
+                in_window = lower <= band_idx <= upper
+                ion_lines = None
+            elif not in_window:
+                if stripped.startswith("k-point"):
+                    k_idx = int(stripped.split()[1]) - 1
+                elif stripped.startswith("# of"):
+                    num_k, num_bands, num_ions = \
+                        map(int, _preamble.match(stripped).groups())
+                    spin_idx += 1
+                    spin = Spin.up if spin_idx == 0 else Spin.down
+                    lower, upper = band_window or (0, num_bands - 1)
+                    eigenvalues[spin] = np.zeros((num_k, num_bands))
+                    occupancies[spin] = np.zeros((num_k, num_bands))
+            # The first ion block of a band holds the projections, which
+            # may be followed by phase or spinor blocks.
+            elif ion_lines is None and stripped.startswith("ion"):
+                if orbitals is None:
+                    orbitals = stripped.split()[1:-1]
+                ion_lines = []
+            elif ion_lines is not None and len(ion_lines) < num_ions:
+                ion_lines.append(stripped)
+                if len(ion_lines) == num_ions:
+                    values = np.array(" ".join(ion_lines).split(), dtype=float)
+                    values = values.reshape(num_ions, -1)[:, 1:-1]
+                    if spin not in data:
+                        data[spin] = np.zeros((num_k, upper - lower + 1,
+                                               num_ions, len(orbitals)))
+                    data[spin][k_idx, band_idx - lower] = values
+                    in_window = False
+
+    if spin_idx < 0:
+        raise ValueError(f"{filename} is not a PROCAR file.")
+    return BandWindowProcar(data, lower, orbitals, eigenvalues, occupancies)
+
+
+def _load_cache(cache_filename: Path, stat: tuple
+                ) -> Optional[BandWindowProcar]:
+    """Cached projections, or None if the cache is absent, stale or
+    unreadable. """
+    if not cache_filename.exists():
+        return None
+    try:
+        with np.load(cache_filename) as loaded:
+            if ("source_stat" not in loaded or
+                    tuple(loaded["source_stat"]) != tuple(map(float, stat))):
+                return None
+            return BandWindowProcar._from_npz(loaded)
+    except (OSError, ValueError, KeyError, BadZipFile) as e:
+        logger.warning(f"{cache_filename} is ignored: {e}")
+        return None
+
+
+def read_procar(filename: Union[str, Path],
+                band_window: Optional[Tuple[int, int]] = None,
+                cache_filename: Union[str, Path, None] = None
+                ) -> BandWindowProcar:
+    """Parse the PROCAR or load the npz cache of a previous run.
+
+    The cache is used when its source file has the same size and
+    modification time and it covers the band window. Otherwise, the
+    PROCAR is parsed and the cache is overwritten.
+
+    Args:
+        filename: PROCAR file name.
+        band_window: See parse_procar.
+        cache_filename: Defaults to the PROCAR file name plus .npz.
+    """
+    cache_filename = Path(cache_filename or f"{filename}.npz")
+    stat = _source_stat(filename)
+    cached = _load_cache(cache_filename, stat)
+    if cached is not None:
+        num_bands = cached.eigenvalues[Spin.up].shape[1]
+        if cached.covers(band_window or (0, num_bands - 1)):
+            logger.info(f"Projections are loaded from {cache_filename}.")
+            return cached.sliced(band_window) if band_window else cached
+
+    result = parse_procar(filename, band_window)
+    try:
+        result.dump(cache_filename, source_stat=stat)
+    except OSError as e:
+        logger.warning(f"{cache_filename} is not written: {e}")
+    return result
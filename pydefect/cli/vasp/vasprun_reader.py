@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple, Optional, Union, Iterable
+from zipfile import BadZipFile
+
+import numpy as np
+from lxml import etree
+from monty.io import zopen
+from pymatgen.core import Structure
+from pymatgen.electronic_structure.core import Spin
+from pymatgen.electronic_structure.dos import Dos
+from vise.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+header_fields = ("structures", "kpoints", "parameters")
+all_fields = header_fields + ("convergence", "efermi", "eigenvalues", "tdos")
+# Fields used by make_calc_results and the band-edge commands.
+calc_results_fields = ("structures", "convergence")
+band_edge_fields = ("structures", "kpoints", "parameters", "efermi",
+                    "eigenvalues")
+# Fields read only after the last ionic step.
+_final_fields = {"structures", "convergence"}
+_hash_block_size = 2 ** 20
+# Elements handled in parse_vasprun, where only the end events of these tags
+# are emitted by iterparse.
+_tags = ["incar", "kpoints", "parameters", "atominfo", "structure",
+         "calculation", "scstep", "eigenvalues", "dos", "projected",
+         "eigenvalues_kpoints_opt", "projected_kpoints_opt"]
+
+
+@dataclass
+class VasprunData:
+    """Fields of vasprun.xml named as the attributes of pymatgen's Vasprun.
+
+    Only the fields listed in fields are extracted, and the others are None.
+    """
+    fields: List[str]
+    initial_structure: Optional[Structure] = None
+    final_structure: Optional[Structure] = None
+    actual_kpoints: Optional[List[Tuple[float, float, float]]] = None
+    actual_kpoints_weights: Optional[List[float]] = None
+    parameters: Optional[dict] = None
+    converged_electronic: Optional[bool] = None
+    converged_ionic: Optional[bool] = None
+    efermi: Optional[float] = None
+    eigenvalues: Optional[Dict[Spin, np.ndarray]] = None
+    tdos: Optional[Dos] = None
+    # Only used to judge the convergence.
+    _incar: dict = field(default_factory=dict, repr=False)
+    _num_ionic_steps: int = field(default=0, repr=False)
+    _final_electronic_steps: List[set] = field(default_factory=list,
+                                               repr=False)
+
+    @property
+    def converged(self) -> bool:
+        return self.converged_electronic and self.converged_ionic
+
+    def covers(self, fields: Iterable[str]) -> bool:
+        return set(fields) <= set(self.fields)
+
+    def dump(self, filename: Union[str, Path], source_key: tuple = None):
+        arrays = {"fields": np.array(self.fields)}
+        if "structures" in self.fields:
+            arrays["structures"] = json.dumps(
+                [self.initial_structure.as_dict(),
+                 self.final_structure.as_dict()])
+        if "kpoints" in self.fields:
+            arrays["actual_kpoints"] = np.array(self.actual_kpoints)
+            arrays["actual_kpoints_weights"] = \
+                np.array(self.actual_kpoints_weights)
+        if "parameters" in self.fields:
+            arrays["parameters"] = json.dumps(self.parameters)
+        if "convergence" in self.fields:
+            arrays["convergence"] = np.array([self.converged_electronic,
+                                              self.converged_ionic])
+        if "efermi" in self.fields and self.efermi is not None:
+            arrays["efermi"] = self.efermi
+        if "eigenvalues" in self.fields:
+            for spin, e in self.eigenvalues.items():
+                arrays[f"eigenvalues_{spin}"] = e
+        if "tdos" in self.fields:
+            arrays["tdos_efermi"] = self.tdos.efermi
+            arrays["tdos_energies"] = self.tdos.energies
+            for spin, d in self.tdos.densities.items():
+                arrays[f"tdos_{spin}"] = d
+        if source_key:
+            arrays["source_stat"] = np.array(source_key[:2], dtype=float)
+            arrays["source_hash"] = source_key[2]
+        np.savez_compressed(filename, **arrays)
+
+    @classmethod
+    def _from_npz(cls, loaded) -> "VasprunData":
+        fields = loaded["fields"].tolist()
+        result = cls(fields=fields)
+        if "structures" in fields:
+            initial, final = json.loads(str(loaded["structures"]))
+            result.initial_structure = Structure.from_dict(initial)
+            result.final_structure = Structure.from_dict(final)
+        if "kpoints" in fields:
+            result.actual_kpoints = \
+                [tuple(k) for k in loaded["actual_kpoints"].tolist()]
+            result.actual_kpoints_weights = \
+                loaded["actual_kpoints_weights"].tolist()
+        if "parameters" in fields:
+            result.parameters = json.loads(str(loaded["parameters"]))
+        if "convergence" in fields:
+            result.converged_electronic, result.converged_ionic = \
+                map(bool, loaded["convergence"])
+        if "efermi" in fields and "efermi" in loaded:
+            result.efermi = float(loaded["efermi"])
+        spins = [Spin.up, Spin.down]
+        if "eigenvalues" in fields:
+            result.eigenvalues = {s: loaded[f"eigenvalues_{s}"]
+                                  for s in spins
+                                  if f"eigenvalues_{s}" in loaded}
+        if "tdos" in fields:
+            result.tdos = Dos(float(loaded["tdos_efermi"]),
+                              loaded["tdos_energies"],
+                              {s: loaded[f"tdos_{s}"] for s in spins
+                               if f"tdos_{s}" in loaded})
+        return result
+
+
+def _free(elem: etree._Element) -> None:
+    """Clear the element and its preceding siblings already read. """
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+
+def _parse_value(val_type: str, text: str):
+    text = text.strip() if text else ""
+    if val_type == "logical":
+        return "T" in text
+    if val_type == "int":
+        return int(text)
+    if val_type == "string":
+        return text
+    try:
+        return float(text)
+    except ValueError:  # e.g., ****** for an overflowed value
+        return None
+
+
+def _parse_params(elem: etree._Element) -> dict:
+    """Parameters including the arrays in <v> as pymatgen parses them, where
+    the values in "response functions" do not override the preceding ones.
+    """
+    result = {}
+    for child in elem:
+        name = child.attrib.get("name", "").strip()
+        val_type = child.attrib.get("type", "")
+        if child.tag == "i":
+            result[name] = _parse_value(val_type, child.text)
+        elif child.tag == "v":
+            result[name] = [_parse_value(val_type, v)
+                            for v in (child.text or "").split()]
+        else:
+            params = _parse_params(child)
+            if name == "response functions":
+                params = {k: v for k, v in params.items() if k not in result}
+            result.update(params)
+    return result
+
+
+def _parse_array(elem: etree._Element, tag: str = "v") -> np.ndarray:
+    text = " ".join(v.text for v in elem.iter(tag))
+    return np.array(text.split(), dtype=float).reshape(
+        len(elem.findall(f".//{tag}")), -1)
+
+
+def _parse_varrays(elem: etree._Element) -> Dict[str, etree._Element]:
+    return {v.attrib.get("name"): v for v in elem.iter("varray")}
+
+
+def _parse_structure(elem: etree._Element, symbols: List[str]
+                     ) -> Structure:
+    lattice = _parse_array(_parse_varrays(elem.find("crystal"))["basis"])
+    varrays = _parse_varrays(elem)
+    positions = _parse_array(varrays["positions"])
+    structure = Structure(lattice, symbols, positions)
+    if "selective" in varrays:
+        selective = [[t == "T" for t in v.text.split()]
+                     for v in varrays["selective"].iter("v")]
+        structure.add_site_property("selective_dynamics", selective)
+    return structure
+
+
+def _parse_atomic_symbols(elem: etree._Element) -> List[str]:
+    # vasprun.xml uses "X" for Xe and "r" for Zr.
+    replace = {"X": "Xe", "r": "Zr"}
+    for array in elem.findall("array"):
+        if array.attrib.get("name") == "atoms":
+            symbols = [rc.find("c").text.strip()
+                       for rc in array.find("set").findall("rc")]
+            return [replace.get(s, s) for s in symbols]
+    return []
+
+
+def _spin_sets(elem: etree._Element) -> Dict[Spin, etree._Element]:
+    sets = elem.find("array").find("set").findall("set")
+    # The other sets of a non-collinear calculation are the x, y and z
+    # projections, which are not needed.
+    if len(sets) > 2:
+        sets = sets[:1]
+    return {Spin.up if s.attrib["comment"] == "spin 1" else Spin.down: s
+            for s in sets}
+
+
+def _parse_eigenvalues(elem: etree._Element) -> Dict[Spin, np.ndarray]:
+    result = {}
+    for spin, s in _spin_sets(elem).items():
+        kpt_sets = s.findall("set")
+        values = _parse_array(s, tag="r")
+        result[spin] = values.reshape(len(kpt_sets), -1, values.shape[-1])
+    return result
+
+
+def _parse_tdos(elem: etree._Element, efermi: float) -> Dos:
+    energies, densities = None, {}
+    for spin, s in _spin_sets(elem.find("total")).items():
+        values = _parse_array(s, tag="r")
+        energies, densities[spin] = values[:, 0], values[:, 1]
+    return Dos(efermi, energies, densities)
+
+
+def _converged_electronic(data: VasprunData) -> bool:
+    """Same criterion as pymatgen's Vasprun.converged_electronic. """
+    incar, nelm = data._incar, data.parameters["NELM"]
+    if incar.get("ML_LMLFF"):
+        return True
+    steps = data._final_electronic_steps
+    if str(incar.get("ALGO", "")).lower() == "chi":
+        steps = []
+    if incar.get("LEPSILON"):
+        idx = 1
+        while steps[idx] == {"e_wo_entrp", "e_fr_energy", "e_0_energy"}:
+            idx += 1
+        return idx + 1 != nelm
+    if incar.get("ALGO", "") == "Exact" and incar.get("NELM") == 1:
+        return True
+    return len(steps) < nelm
+
+
+def _converged_ionic(data: VasprunData) -> bool:
+    """Same criterion as pymatgen's Vasprun.converged_ionic. """
+    params, num_steps = data.parameters, data._num_ionic_steps
+    nsw = params.get("NSW", 0)
+    ibrion = params.get("IBRION", -1 if nsw in (-1, 0) else 0)
+    if ibrion == 0:
+        return nsw <= 1 or num_steps == nsw
+    if ibrion in {1, 2} and params.get("EDIFFG", 1) == 0:
+        return nsw <= 1 or nsw == num_steps
+    return nsw <= 1 or num_steps < nsw
+
+
+def parse_vasprun(filename: Union[str, Path],
+                  fields: Iterable[str] = all_fields) -> VasprunData:
+    """Extract only the fields from vasprun.xml.
+
+    The file is read with iterparse, and the elements are cleared as soon
+    as they are read. The numbers in the intermediate ionic steps, the
+    projections and the unrequested fields are never converted, and the
+    parse stops once all the requested fields are found. Since the final
+    structure and the convergence are determined at the end of the file,
+    the others can be extracted without reading the whole file.
+
+    Args:
+        filename: vasprun.xml file name, which can be compressed.
+        fields: Subset of all_fields.
+    """
+    fields = list(fields)
+    if set(fields) - set(all_fields):
+        raise ValueError(f"Fields must be in {all_fields}.")
+    result = VasprunData(fields=fields)
+    pending = set(fields)
+    parameters, symbols = {}, []
+    electronic_steps = []
+
+    with zopen(filename, mode="rb") as f:
+        for _, elem in etree.iterparse(f, tag=_tags):
+            tag, parent = elem.tag, elem.getparent().tag
+
+            if parent == "modeling":
+                if tag == "incar":
+                    result._incar = _parse_params(elem)
+                elif tag == "kpoints" and "kpoints" in fields:
+                    varrays = _parse_varrays(elem)
+                    result.actual_kpoints = [
+                        tuple(k) for k in
+                        _parse_array(varrays["kpointlist"]).tolist()]
+                    result.actual_kpoints_weights = \
+                        _parse_array(varrays["weights"]).flatten().tolist()
+                    pending.discard("kpoints")
+                elif tag == "parameters":
+                    parameters = _parse_params(elem)
+                    if "parameters" in fields:
+                        result.parameters = parameters
+                    pending.discard("parameters")
+                elif tag == "atominfo":
+                    symbols = _parse_atomic_symbols(elem)
+                elif tag == "structure":
+                    name = elem.attrib.get("name")
+                    if "structures" in fields and name == "initialpos":
+                        result.initial_structure = \
+                            _parse_structure(elem, symbols)
+                    elif "structures" in fields and name == "finalpos":
+                        result.final_structure = \
+                            _parse_structure(elem, symbols)
+                    if name == "finalpos":
+                        pending -= _final_fields
+                elif tag == "calculation":
+                    result._num_ionic_steps += 1
+                    result._final_electronic_steps = electronic_steps
+                    electronic_steps = []
+                _free(elem)
+
+            elif parent == "calculation":
+                if tag == "scstep":
+                    energy = elem.find("energy")
+                    if energy is not None:
+                        electronic_steps.append(
+                            {i.attrib["name"] for i in energy.findall("i")})
+                elif tag == "eigenvalues" and "eigenvalues" in fields:
+                    result.eigenvalues = _parse_eigenvalues(elem)
+                    pending.discard("eigenvalues")
+                elif tag == "dos" and elem.attrib.get("comment") is None:
+                    efermi = float(elem.find("i").text)
+                    result.efermi = efermi
+                    pending.discard("efermi")
+                    if "tdos" in fields:
+                        result.tdos = _parse_tdos(elem, efermi)
+                        pending.discard("tdos")
+                # The ionic steps are freed as soon as their blocks are read.
+                _free(elem)
+
+            if not pending and fields:
+                break
+
+    if "convergence" in fields:
+        result.parameters = result.parameters or parameters
+        result.converged_electronic = _converged_electronic(result)
+        result.converged_ionic = _converged_ionic(result)
+        if "parameters" not in fields:
+            result.parameters = None
+    if "structures" in fields and result.final_structure is None:
+        result.final_structure = result.initial_structure
+    return result
+
+
+def _source_key(filename: Union[str, Path]) -> tuple:
+    """Size, modification time and hash of the head and tail of the file.
+    """
+    stat = os.stat(filename)
+    sha = hashlib.sha1()
+    with open(filename, "rb") as f:
+        sha.update(f.read(_hash_block_size))
+        f.seek(max(stat.st_size - _hash_block_size, 0))
+        sha.update(f.read(_hash_block_size))
+    return stat.st_size, stat.st_mtime, sha.hexdigest()
+
+
+def _load_cache(cache_filename: Path, key: tuple) -> Optional[VasprunData]:
+    """Cached fields, or None if the cache is absent, stale or unreadable. """
+    if not cache_filename.exists():
+        return None
+    stat = tuple(map(float, key[:2]))
+    try:
+        with np.load(cache_filename) as loaded:
+            if ("source_stat" not in loaded
+                    or tuple(loaded["source_stat"]) != stat
+                    or str(loaded["source_hash"]) != key[2]):
+                return None
+            return VasprunData._from_npz(loaded)
+    except (OSError, ValueError, KeyError, BadZipFile) as e:
+        logger.warning(f"{cache_filename} is ignored: {e}")
+        return None
+
+
+def read_vasprun(filename: Union[str, Path],
+                 fields: Iterable[str] = all_fields,
+                 cache_filename: Union[str, Path, None] = None
+                 ) -> VasprunData:
+    """Extract the fields from vasprun.xml or load them from the sidecar
+    cache of a previous run.
+
+    The cache is used when its source file has the same size, modification
+    time and hash, and it holds all the fields. Otherwise, vasprun.xml is
+    parsed for the requested and cached fields, and the cache is
+    overwritten, so that the commands on the same directory parse
+    vasprun.xml once.
+
+    Args:
+        filename: vasprun.xml file name.
+        fields: See parse_vasprun.
+        cache_filename: Defaults to the vasprun.xml file name plus .npz.
+    """
+    fields = list(fields)
+    cache_filename = Path(cache_filename or f"{filename}.npz")
+    key = _source_key(filename)
+    cached = _load_cache(cache_filename, key)
+    if cached is not None and cached.covers(fields):
+        logger.info(f"Vasprun fields are loaded from {cache_filename}.")
+        return cached
+    cached_fields = cached.fields if cached is not None else []
+
+    fields_to_parse = [f for f in all_fields
+                       if f in fields or f in cached_fields]
+    result = parse_vasprun(filename, fields_to_parse)
+    try:
+        result.dump(cache_filename, source_key=key)
+    except OSError as e:
+        logger.warning(f"{cache_filename} is not written: {e}")
+    return result
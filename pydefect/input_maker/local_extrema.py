@@ -3,10 +3,13 @@
 from dataclasses import dataclass
 from typing import List, Optional
 
+import numpy as np
 from monty.json import MSONable
+from pydefect.analyzer.defect_structure_info import remove_dot
 from pydefect.input_maker.append_interstitial import append_interstitial
 from pydefect.util.coords import pretty_coords
-from pydefect.util.structure_tools import Coordination
+from pydefect.util.structure_tools import Coordination, Distances
+from pydefect.util.symmetry_orbits import SymmetryOrbits
 from pymatgen.core import Structure
 from tabulate import tabulate
 from vise.util.mix_in import ToJsonFileMixIn
@@ -28,6 +31,7 @@ class VolumetricDataAnalyzeParams(MSONable):
     min_dist: float
     tol: float
     radius: float
+    coarse_factor: Optional[int] = None
 
 
 @dataclass
@@ -66,3 +70,27 @@ class VolumetricDataLocalExtrema(MSONable, ToJsonFileMixIn):
                                      infos=infos)
         return result
 
+
+def make_coord_infos(structure: Structure,
+                     frac_coords: np.ndarray,
+                     quantities: List[float]) -> List[CoordInfo]:
+    """Group the points by the symmetry operations of the host structure.
+
+    The coordination is calculated only for the representative point of
+    each orbit, i.e., the first one in frac_coords.
+    """
+    result = []
+    orbits = SymmetryOrbits(structure)
+    frac_coords = np.array(frac_coords, dtype=float).reshape(-1, 3)
+
+    for indices in orbits.orbits(frac_coords):
+        repr_coord = frac_coords[indices[0]]
+        site_sym = orbits.site_symmetry(repr_coord)
+        coordination = Distances(structure, repr_coord).coordination()
+        coord_info = CoordInfo(site_symmetry=remove_dot(site_sym),
+                               coordination=coordination,
+                               frac_coords=[tuple(frac_coords[i])
+                                            for i in indices],
+                               quantities=[quantities[i] for i in indices])
+        result.append(coord_info)
+    return result
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import numpy as np
+from pydefect.input_maker.local_extrema import VolumetricDataLocalExtrema, \
+    VolumetricDataAnalyzeParams, make_coord_infos
+from pydefect.util.periodic_neighbors import image_shifts, \
+    cluster_periodic_points, merge_clusters, nearest_distances
+from pymatgen.core import Structure
+from scipy.spatial import Voronoi
+from vise.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Voronoi vertices closer than this (in Angstrom) are regarded as identical.
+_degenerate_tol = 1e-3
+
+
+def voronoi_vertices(structure: Structure) -> np.ndarray:
+    """Fractional coordinates of the periodic Voronoi vertices in [0, 1),
+    i.e., the circumcenters of the Delaunay tetrahedra of the host atoms. """
+    lattice = structure.lattice
+    # The circumsphere radius is at most the covering radius of the atoms,
+    # which is bounded by half the sum of the lattice lengths.
+    shifts = image_shifts(lattice, sum(lattice.abc) / 2)
+    images = structure.frac_coords[None, :, :] + shifts[:, None, :]
+    voronoi = Voronoi(lattice.get_cartesian_coords(images.reshape(-1, 3)))
+
+    frac_coords = lattice.get_fractional_coords(voronoi.vertices)
+    frac_coords = np.round(frac_coords, 8)
+    frac_coords = frac_coords[np.all((frac_coords >= 0) & (frac_coords < 1),
+                                     axis=1)]
+    if len(frac_coords) == 0:
+        return frac_coords
+    labels = cluster_periodic_points(lattice, frac_coords, _degenerate_tol)
+    return np.array(merge_clusters(lattice, frac_coords, labels))
+
+
+def make_local_extrema_from_voronoi(structure: Structure,
+                                    min_dist: float = 0.5,
+                                    tol: float = 0.5,
+                                    info: str = None
+                                    ) -> VolumetricDataLocalExtrema:
+    """Interstitial candidates from the geometry of the host structure only.
+
+    The Voronoi vertices are the local maxima of the distance to the nearest
+    host atom, which is stored as the quantity. Thus, the candidates are
+    sorted from the largest void, and is_min is False.
+
+    Args:
+        structure: Host unit cell.
+        min_dist: Vertices nearer than this to host atoms are removed.
+        tol: Vertices closer than this are merged. Set 0 to switch off.
+        info: Information written in VolumetricDataLocalExtrema.
+    """
+    lattice = structure.lattice
+    frac_coords = voronoi_vertices(structure)
+    distances = nearest_distances(lattice, frac_coords, structure.frac_coords)
+    frac_coords = frac_coords[distances > min_dist]
+
+    if tol and len(frac_coords):
+        labels = cluster_periodic_points(lattice, frac_coords, tol)
+        frac_coords = np.array(merge_clusters(lattice, frac_coords, labels))
+        frac_coords -= np.floor(frac_coords)
+
+    distances = nearest_distances(lattice, frac_coords, structure.frac_coords)
+    order = np.argsort(-distances, kind="stable")
+    logger.info(f"Find {len(order)} Voronoi vertices.")
+
+    coord_infos = make_coord_infos(structure,
+                                   frac_coords=frac_coords[order],
+                                   quantities=distances[order].tolist())
+    params = VolumetricDataAnalyzeParams(threshold_frac=None,
+                                         threshold_abs=None,
+                                         min_dist=min_dist,
+                                         tol=tol,
+                                         radius=None)
+    return VolumetricDataLocalExtrema(unit_cell=structure,
+                                      is_min=False,
+                                      extrema_points=coord_infos,
+                                      info=info,
+                                      params=params)
@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 #  Copyright (c) 2023 Kumagai group.
 
+import json
+
+import numpy as np
 import pytest
+from monty.serialization import loadfn
 from numpy.testing import assert_almost_equal
 from pydefect.analyzer.concentration.concentration import \
     CarrierConcentration, DefectConcentration, Concentration, \
-    ConcentrationByFermiLevel
+    ConcentrationByFermiLevel, ConcentrationColumns
+from vise.tests.helpers.assertion import assert_json_roundtrip
 
 
 @pytest.fixture
@@ -95,3 +100,50 @@ def test_pinning_level(concentration):
 
 def test_con_by_Ef_str(con_by_Ef):
     print(con_by_Ef)
+
+
+def test_concentration_columns():
+    c1 = Concentration(1.0, CarrierConcentration(0.1, 0.2),
+                       [DefectConcentration("Va_O1", [0, 2], [1.0, 2.0]),
+                        DefectConcentration("Va_Mg1", [-2], [3.0])])
+    c2 = Concentration(0.0, CarrierConcentration(0.3, 0.4),
+                       [DefectConcentration("Va_O1", [0, 2], [4.0, 5.0]),
+                        DefectConcentration("Va_Mg1", [-2], [6.0])])
+    actual = ConcentrationColumns.from_concentrations([c1, c2])
+    assert actual.Ef.tolist() == [0.0, 1.0]
+    assert actual.names == ["Va_O1", "Va_O1", "Va_Mg1"]
+    assert actual.charges == [0, 2, -2]
+    np.testing.assert_array_equal(actual.concentrations,
+                                  [[4.0, 1.0], [5.0, 2.0], [6.0, 3.0]])
+    assert actual[0] == c2
+    assert actual[-1] == c1
+    assert actual == [c2, c1]
+    np.testing.assert_array_equal(actual.total_concentrations["Va_O1"],
+                                  [9.0, 3.0])
+    assert repr(actual) == ("ConcentrationColumns(Ef: 0.000 to 1.000 at 2 "
+                            "points, 3 defect charge states)")
+
+    c3 = Concentration(2.0, CarrierConcentration(0.3, 0.4), [])
+    with pytest.raises(ValueError):
+        ConcentrationColumns.from_concentrations([c1, c3])
+
+
+def test_con_by_Ef_columns(con_by_Ef, tmpdir):
+    assert isinstance(con_by_Ef.concentrations, ConcentrationColumns)
+    assert con_by_Ef.Efs == [0.0, 1.0, 2.0, 3.0]
+    assert_json_roundtrip(con_by_Ef, tmpdir)
+
+
+def test_con_by_Ef_old_format(test_data_files, tmpdir):
+    filename = test_data_files / "Na3AgO2" / "con_by_Ef_A_300K.json"
+    actual = loadfn(filename)
+    with open(filename) as f:
+        d = json.load(f)["concentrations"]
+    assert actual.concentrations == [Concentration.from_dict(c) for c in d]
+
+    tmpdir.chdir()
+    actual.to_json_file("con_by_Ef.json")
+    with open("con_by_Ef.json") as f:
+        columns = json.load(f)["concentrations"]
+    assert columns["names"] == actual.concentrations.names
+    assert len(columns["concentrations"]) == len(columns["names"])
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2023 Kumagai group.
+import numpy as np
+import pytest
+from monty.serialization import loadfn
+from pydefect.analyzer.concentration.concentration_map import \
+    sample_chem_pots, ConcentrationMap, make_concentration_map, \
+    impurity_chem_pots_at
+from pydefect.analyzer.concentration.degeneracy import Degeneracies
+from pydefect.analyzer.concentration.make_concentration import \
+    MakeConcentrations, equilibrium_concentration
+from pydefect.analyzer.defect_energy import DefectEnergies
+from pydefect.chem_pot_diag.chem_pot_diag import ChemPotDiag, \
+    RelativeEnergies
+
+
+@pytest.fixture
+def mgo2_cpd():
+    return ChemPotDiag(vertex_elements=["Mg", "O"],
+                       polygons={"MgO2": [[0.0, -4.5], [-9.0, 0.0]]},
+                       target="MgO2")
+
+
+def test_sample_chem_pots_grid(mgo2_cpd):
+    actual = sample_chem_pots(mgo2_cpd, num_points=3)
+    expected = [[0.0, -4.5], [-4.5, -2.25], [-9.0, 0.0]]
+    np.testing.assert_allclose(sorted(actual.tolist(), reverse=True), expected,
+                               atol=1e-10)
+
+
+def test_sample_chem_pots_random_in_triangle():
+    cpd = ChemPotDiag(vertex_elements=["A", "B", "C"],
+                      polygons={"ABC": [[0.0, 0.0, -3.0],
+                                        [-3.0, 0.0, 0.0],
+                                        [0.0, -3.0, 0.0]]},
+                      target="ABC")
+    actual = sample_chem_pots(cpd, num_points=50, method="random", seed=0)
+    assert actual.shape == (50, 3)
+    np.testing.assert_allclose(actual.sum(axis=1), -3.0)
+    assert np.all(actual <= 1e-10)
+
+
+def test_concentration_map_dump_from_file(tmpdir):
+    con_map = ConcentrationMap(T=300.0,
+                               elements=["Mg", "O"],
+                               chem_pots=np.array([[0.0, -4.5],
+                                                   [-9.0, 0.0]]),
+                               Ef=np.array([0.5, np.nan]),
+                               p=np.array([1.0, 2.0]),
+                               n=np.array([3.0, 4.0]),
+                               names=["Va_O1", "Va_O1", "Va_Mg1"],
+                               charges=[2, 0, -2],
+                               concentrations=np.array([[1.0, 2.0, 4.0],
+                                                        [5.0, 6.0, 7.0]]))
+    filename = str(tmpdir / "con_map.npz")
+    con_map.dump(filename)
+    actual = ConcentrationMap.from_file(filename)
+    assert actual.names == con_map.names
+    assert actual.charges == con_map.charges
+    np.testing.assert_array_equal(actual.Ef, con_map.Ef)
+    np.testing.assert_array_equal(actual.concentrations,
+                                  con_map.concentrations)
+    assert actual.dominant_defects == ["Va_Mg1", "Va_O1"]
+
+
+def test_make_concentration_map(test_data_files):
+    test_dir = test_data_files / "Na3AgO2"
+    summary = loadfn(test_dir / "defect_energy_summary.json")
+    degeneracies = Degeneracies.from_yaml(test_dir / "degeneracies.yaml")
+    total_dos = loadfn(test_dir / "total_dos.json")
+    elements = ["Ag", "Na", "O"]
+    vertices = [[v[e] for e in elements]
+                for v in summary.rel_chem_pots.values()]
+    cpd = ChemPotDiag(elements, {"Na3AgO2": vertices}, target="Na3AgO2")
+
+    actual = make_concentration_map(summary, cpd, total_dos, degeneracies,
+                                    T=300.0, num_points=5, method="random",
+                                    seed=0)
+    assert actual.names == ["Va_Ag1"] * 3 + ["Va_O1"] * 3
+
+    for chem_pot, Ef in zip(actual.chem_pots, actual.Ef):
+        charge_energies = summary.charge_energies_at_chem_pot(
+            dict(zip(elements, chem_pot)), False, True, [0., summary.cbm],
+            name_style=False)
+        make_cc = MakeConcentrations(total_dos, charge_energies,
+                                     degeneracies, 300.0)
+        expected = equilibrium_concentration(make_cc, 0., summary.cbm,
+                                             net_abs_ratio=1e-10)
+        assert Ef == pytest.approx(expected.Ef, abs=1e-7)
+
+
+def test_impurity_chem_pots_at():
+    host_chem_pots = np.array([[-1.0, 0.0], [-0.5, -2.5], [0.0, -5.0]])
+    rel_energies = RelativeEnergies({"Al2O3": -3.0})
+    actual = impurity_chem_pots_at(host_chem_pots, ["Mg", "O"], ["Al", "Ga"],
+                                   impurity_chem_pots={"Ga": -1.0},
+                                   relative_energies=rel_energies)
+    # mu_Al = (-3.0 - 0.6 * mu_O) / 0.4, which is capped by Al metal at 0.
+    expected = [[-7.5, -1.0], [-3.75, -1.0], [0.0, -1.0]]
+    np.testing.assert_allclose(actual, expected)
+
+    with pytest.raises(ValueError):
+        impurity_chem_pots_at(host_chem_pots, ["Mg", "O"], ["Al"])
+
+
+def test_make_concentration_map_w_impurity(test_data_files):
+    test_dir = test_data_files / "Na3AgO2"
+    summary = loadfn(test_dir / "defect_energy_summary.json")
+    va_o = summary.defect_energies["Va_O1"]
+    summary.defect_energies["F_O1"] = DefectEnergies(
+        {"O": -1, "F": 1}, va_o.charges, va_o.defect_energies)
+    degeneracies = Degeneracies.from_yaml(test_dir / "degeneracies.yaml")
+    degeneracies["F_O1"] = degeneracies["Va_O1"]
+    total_dos = loadfn(test_dir / "total_dos.json")
+    elements = ["Ag", "Na", "O"]
+    vertices = [[v[e] for e in elements]
+                for v in summary.rel_chem_pots.values()]
+    cpd = ChemPotDiag(elements, {"Na3AgO2": vertices}, target="Na3AgO2")
+    rel_energies = RelativeEnergies({"NaF": -3.0})
+
+    with pytest.raises(ValueError):
+        make_concentration_map(summary, cpd, total_dos, degeneracies, T=300.0)
+
+    actual = make_concentration_map(summary, cpd, total_dos, degeneracies,
+                                    T=300.0, num_points=3, method="random",
+                                    relative_energies=rel_energies, seed=0)
+    assert actual.elements == ["Ag", "Na", "O", "F"]
+    for chem_pot, Ef in zip(actual.chem_pots, actual.Ef):
+        # mu_F = -6.0 - mu_Na at the NaF solubility limit.
+        assert chem_pot[3] == pytest.approx(min(-6.0 - chem_pot[1], 0.0))
+        charge_energies = summary.charge_energies_at_chem_pot(
+            dict(zip(actual.elements, chem_pot)), False, True,
+            [0., summary.cbm], name_style=False)
+        make_cc = MakeConcentrations(total_dos, charge_energies,
+                                     degeneracies, 300.0)
+        expected = equilibrium_concentration(make_cc, 0., summary.cbm,
+                                             net_abs_ratio=1e-10)
+        assert Ef == pytest.approx(expected.Ef, abs=1e-7)
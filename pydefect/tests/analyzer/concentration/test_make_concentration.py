@@ -1,14 +1,17 @@
 # -*- coding: utf-8 -*-
 #  Copyright (c) 2023 Kumagai group.
 import numpy as np
+import pytest
 from pydefect.analyzer.concentration.concentration import \
     ConcentrationByFermiLevel, Concentration, CarrierConcentration, \
     DefectConcentration
 from pydefect.analyzer.concentration.degeneracy import Degeneracies, Degeneracy
-from pydefect.analyzer.concentration.distribution_function import fermi_dirac
+from pydefect.analyzer.concentration.distribution_function import fermi_dirac, \
+    boltzmann_dist
 from pydefect.analyzer.concentration.make_concentration import \
     MakeConcentrations, VBDos, CBDos, TotalDos, \
-    redistribute_concentration
+    redistribute_concentration, EquilibriumFermiLevelSolver, DefectMatrices, \
+    equilibrium_concentration, adaptive_fermi_levels
 from pydefect.analyzer.defect_energy import ChargeEnergies, SingleChargeEnergies
 from vise.tests.helpers.assertion import assert_msonable
 
@@ -33,6 +36,19 @@ def test_cb_dos():
     assert actual == expected
 
 
+def test_dos_carrier_concentrations():
+    Efs = np.array([[0.0, 0.5, 1.0]])
+    T = np.array([[500.0], [1000.0]])
+    actual = vb_dos.carrier_concentrations(Efs, T)
+    # Sum of the holes at -1.0 and 0.0 eV with unit DOS and interval.
+    expected = [[fermi_dirac(Ef + 1.0, t) + fermi_dirac(Ef, t)
+                 for Ef in Efs[0]] for t in T[:, 0]]
+    np.testing.assert_allclose(actual, expected)
+    assert actual.shape == (2, 3)
+    # Not overflow far from the band.
+    assert cb_dos.carrier_concentrations(-100.0, 1.0) == 0.0
+
+
 single_energies = SingleChargeEnergies([(0, 0.0)])
 
 
@@ -81,8 +97,119 @@ def test_make_carrier_concentrations():
     assert actual == con_by_Ef
 
 
+def test_defect_matrices():
+    charge_energies = ChargeEnergies(
+        {"Va_O1": SingleChargeEnergies([(2, 1.0), (0, 2.0)]),
+         "Va_Mg1": SingleChargeEnergies([(-1, 0.5)])},
+        e_min=0.0, e_max=1.0)
+    degeneracies = Degeneracies({"Va_O1": {2: Degeneracy(1, 1),
+                                           0: Degeneracy(2, 2)},
+                                 "Va_Mg1": {-1: Degeneracy(3, 1)}})
+    matrices = DefectMatrices.from_charge_energies(charge_energies,
+                                                   degeneracies)
+    np.testing.assert_array_equal(matrices.charges, [[2, 0], [-1, 0]])
+    np.testing.assert_array_equal(matrices.degeneracies, [[1, 4], [3, 0]])
+    np.testing.assert_array_equal(matrices.mask, [[True, True], [True, False]])
+
+    actual = matrices.concentrations([0.0, 0.5], 1000.0, volume=2.0)
+    assert actual.shape == (2, 2, 2)
+    assert actual[1, 0, 0] == boltzmann_dist(2.0, 1000.0) / 2.0
+    assert actual[1, 1, 1] == 0.0
+
+    redistributed = matrices.concentrations(0.5, 1000.0, volume=2.0,
+                                            totals=np.array([1.0, 2.0]))
+    np.testing.assert_allclose(redistributed.sum(axis=-1), [1.0, 2.0])
+
+    defects = matrices.to_defect_concentrations(actual[0])
+    assert defects[1] == DefectConcentration(
+        "Va_Mg1", [-1], [boltzmann_dist(0.5, 1000.0) * 3 / 2.0])
+
+
 def test_redistribute_concentration():
     actual = redistribute_concentration([1.0, 3.0], total=20.0)
     expected = [5.0, 15.0]
     assert actual == expected
 
+
+def make_concentrations_w_donor(donor_energy: float) -> MakeConcentrations:
+    dos_data = TotalDos(energies=list(np.linspace(-3.0, 4.0, 71)),
+                        dos=[1.0] * 30 + [0.0] * 11 + [1.0] * 30,
+                        volume=100.0,
+                        vbm=0.0,
+                        cbm=1.0)
+    charge_energies = ChargeEnergies(
+        {"Va_O1": SingleChargeEnergies([(2, donor_energy), (0, 2.5)])},
+        e_min=0.0, e_max=1.0)
+    degeneracies = Degeneracies({"Va_O1": {2: Degeneracy(1, 1),
+                                           0: Degeneracy(1, 1)}})
+    return MakeConcentrations(total_dos=dos_data,
+                              charge_energies=charge_energies,
+                              degeneracies=degeneracies,
+                              T=1000.0)
+
+
+def test_equilibrium_fermi_level_solver():
+    make_concentration = make_concentrations_w_donor(donor_energy=1.0)
+    illinois = EquilibriumFermiLevelSolver(make_concentration.charges)
+    actual = illinois.solve(0.0, 1.0)
+    assert make_concentration._make_all_concentration(
+        float(actual)).net_abs_ratio < 1e-5
+    assert illinois.num_evaluations < 10
+
+    bisect = EquilibriumFermiLevelSolver(make_concentration.charges,
+                                         method="bisect")
+    assert bisect.solve(0.0, 1.0) == pytest.approx(actual, abs=1e-4)
+
+
+def test_equilibrium_fermi_level_solver_many_conditions():
+    make_concentration = make_concentrations_w_donor(donor_energy=1.0)
+    T = np.array([500.0, 1000.0, 1500.0])
+    solver = EquilibriumFermiLevelSolver(
+        lambda x: make_concentration.charges(x, T))
+    actual = solver.solve(0.0, 1.0, T.shape)
+    for Ef, t in zip(actual, T):
+        expected = EquilibriumFermiLevelSolver(
+            lambda x: make_concentration.charges(x, t)).solve(0.0, 1.0)
+        assert Ef == pytest.approx(expected, abs=1e-8)
+
+
+def test_equilibrium_fermi_level_solver_wo_net_abs_ratio():
+    make_concentration = make_concentrations_w_donor(donor_energy=1.0)
+    # The Fermi level converges within xtol before the strict net_abs_ratio.
+    solver = EquilibriumFermiLevelSolver(make_concentration.charges,
+                                         net_abs_ratio=0.0, xtol=1e-3)
+    assert np.isnan(solver.solve(0.0, 1.0))
+    assert equilibrium_concentration(make_concentration, 0.0, 1.0,
+                                     net_abs_ratio=0.0, xtol=1e-3) is None
+
+
+def test_equilibrium_concentration_out_of_range():
+    make_concentration = make_concentrations_w_donor(donor_energy=-5.0)
+    assert equilibrium_concentration(make_concentration, 0.0, 1.0) is None
+
+
+def test_adaptive_fermi_levels():
+    def log_concentrations(Efs):
+        # Linear in [0, 0.5] and quadratic in [0.5, 1].
+        return np.where(Efs < 0.5, Efs, Efs + 100 * (Efs - 0.5) ** 2)[:, None]
+
+    actual = adaptive_fermi_levels(log_concentrations, 0.0, 1.0,
+                                   initial_Efs=[0.25, 2.0], tol=0.01,
+                                   num_initial=3)
+    assert actual[0] == 0.0 and actual[-1] == 1.0
+    assert 0.25 in actual and 2.0 not in actual
+    assert len([e for e in actual if e < 0.5]) == 2
+    assert len([e for e in actual if e > 0.5]) > 5
+
+    values = log_concentrations(np.array(actual))[:, 0]
+    Efs = np.linspace(0.0, 1.0, 1001)
+    interpolated = np.interp(Efs, actual, values)
+    assert np.max(np.abs(interpolated - log_concentrations(Efs)[:, 0])) < 0.02
+
+
+def test_make_concentrations_adaptive_fermi_levels():
+    make_concentration = make_concentrations_w_donor(donor_energy=1.0)
+    # The transition level from 2+ to 0.
+    assert make_concentration.characteristic_fermi_levels == [0.75]
+    actual = make_concentration.adaptive_fermi_levels(0.0, 1.0, tol=0.1)
+    assert 0.75 in actual
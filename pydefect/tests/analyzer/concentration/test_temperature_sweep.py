@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2023 Kumagai group.
+import numpy as np
+import pytest
+from pydefect.analyzer.concentration.concentration import Concentration, \
+    CarrierConcentration, DefectConcentration
+from pydefect.analyzer.concentration.degeneracy import Degeneracies, Degeneracy
+from pydefect.analyzer.concentration.make_concentration import TotalDos, \
+    MakeConcentrations, equilibrium_concentration
+from pydefect.analyzer.concentration.temperature_sweep import \
+    TemperatureSweep, ConcentrationsByTemperature, sweep_temperatures
+from pydefect.analyzer.defect_energy import ChargeEnergies, SingleChargeEnergies
+from vise.tests.helpers.assertion import assert_json_roundtrip
+
+total_dos = TotalDos(energies=list(np.linspace(-3.0, 4.0, 71)),
+                     dos=[1.0] * 30 + [0.0] * 11 + [1.0] * 30,
+                     volume=100.0,
+                     vbm=0.0,
+                     cbm=1.0)
+charge_energies = ChargeEnergies(
+    {"Va_O1": SingleChargeEnergies([(2, 0.8), (0, 2.0)]),
+     "Va_Mg1": SingleChargeEnergies([(-2, 2.5), (0, 1.5)])},
+    e_min=0.0, e_max=1.0)
+degeneracies = Degeneracies({"Va_O1": {2: Degeneracy(1, 1),
+                                       0: Degeneracy(1, 1)},
+                             "Va_Mg1": {-2: Degeneracy(1, 1),
+                                        0: Degeneracy(1, 1)}})
+
+
+@pytest.fixture
+def temperature_sweep():
+    return TemperatureSweep(
+        names=["Va_O1", "Va_O1"],
+        charges=[2, 0],
+        growth=ConcentrationsByTemperature(T=[300.0, 1000.0],
+                                           Ef=[0.5, 0.4],
+                                           p=[1.0, 2.0],
+                                           n=[3.0, 4.0],
+                                           concentrations=[[5.0, 6.0],
+                                                           [7.0, 8.0]]),
+        quenched=ConcentrationsByTemperature(T=[300.0, 300.0],
+                                             Ef=[0.5, 0.6],
+                                             p=[1.0, 0.5],
+                                             n=[3.0, 3.5],
+                                             concentrations=[[5.0, 6.0],
+                                                             [6.0, 9.0]]))
+
+
+def test_temperature_sweep_json_roundtrip(temperature_sweep, tmpdir):
+    assert_json_roundtrip(temperature_sweep, tmpdir)
+
+
+def test_temperature_sweep_concentration(temperature_sweep):
+    actual = temperature_sweep.concentration(1, quenched=True)
+    expected = Concentration(
+        Ef=0.6,
+        carrier=CarrierConcentration(p=0.5, n=3.5),
+        defects=[DefectConcentration("Va_O1", [2, 0], [6.0, 9.0])])
+    assert actual == expected
+    assert temperature_sweep.T_quench == 300.0
+
+
+def test_sweep_temperatures():
+    temperatures = [500.0, 1000.0]
+    actual = sweep_temperatures(total_dos, charge_energies, degeneracies,
+                                temperatures, T_quench=300.0,
+                                net_abs_ratio=1e-10)
+    assert actual.names == ["Va_O1", "Va_O1", "Va_Mg1", "Va_Mg1"]
+    assert actual.charges == [2, 0, -2, 0]
+
+    for i, T in enumerate(temperatures):
+        make_cc = MakeConcentrations(total_dos, charge_energies,
+                                     degeneracies, T)
+        expected = equilibrium_concentration(make_cc, 0.0, 1.0,
+                                             net_abs_ratio=1e-10)
+        assert actual.growth.Ef[i] == pytest.approx(expected.Ef, abs=1e-8)
+
+        fixed = {d.name: d.total_concentration for d in expected.defects}
+        make_cc = MakeConcentrations(total_dos, charge_energies,
+                                     degeneracies, 300.0, fixed)
+        expected = equilibrium_concentration(make_cc, 0.0, 1.0,
+                                             net_abs_ratio=1e-10)
+        assert actual.quenched.Ef[i] == pytest.approx(expected.Ef, abs=1e-8)
+        assert actual.concentration(i, quenched=True).net_abs_ratio < 1e-5
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 #  Copyright (c) 2020. Distributed under the terms of the MIT License.
+import json
 from copy import deepcopy
 from pathlib import Path
 
 import pytest
+from monty.serialization import loadfn
 from pydefect.analyzer.band_edge_states import BandEdgeEigenvalues, \
     BandEdgeStates, OrbitalInfo, BandEdgeOrbitalInfos, PerfectBandEdgeState, \
     EdgeInfo, BandEdgeState, LocalizedOrbital, pretty_orbital
@@ -44,12 +46,13 @@ def test_pretty_orbital(orbital_info):
 
 @pytest.fixture
 def band_edge_orbital_infos(orbital_info):
-    return BandEdgeOrbitalInfos(orbital_infos=[[[orbital_info]]],
-                                kpt_coords=[(0.0, 0.0, 0.0)],
-                                kpt_weights=[1.0],
-                                lowest_band_index=10,
-                                fermi_level=0.5,
-                                eigval_shift=1.0)
+    return BandEdgeOrbitalInfos.from_orbital_infos(
+        orbital_infos=[[[orbital_info]]],
+        kpt_coords=[(0.0, 0.0, 0.0)],
+        kpt_weights=[1.0],
+        lowest_band_index=10,
+        fermi_level=0.5,
+        eigval_shift=1.0)
 
 
 def test_kpt_idx(band_edge_orbital_infos):
@@ -78,13 +81,13 @@ def test_band_edge_orbital_info_repr():
                                  occupation=0.0001,
                                  participation_ratio=0.2222222)
 
-    band_edge_orbital_infos =  \
-        BandEdgeOrbitalInfos(orbital_infos=[[[orbital_info_1, orbital_info_2]]],
-                             kpt_coords=[(0.0, 0.0, 0.0)],
-                             kpt_weights=[1.0],
-                             lowest_band_index=10,
-                             fermi_level=0.5,
-                             eigval_shift=1.0)
+    band_edge_orbital_infos = BandEdgeOrbitalInfos.from_orbital_infos(
+        orbital_infos=[[[orbital_info_1, orbital_info_2]]],
+        kpt_coords=[(0.0, 0.0, 0.0)],
+        kpt_weights=[1.0],
+        lowest_band_index=10,
+        fermi_level=0.5,
+        eigval_shift=1.0)
 
     actual = band_edge_orbital_infos.__str__()
     print(actual)
@@ -185,4 +188,27 @@ Localized Orbital(s)
 Index  Energy  P-ratio  Occupation  Orbitals   Radius  Center
 12     1.900   None     1.00        H-s: 1.00  1.00    ( 0.123,  0.000,  0.000)
 """
-    assert actual == expected
\ No newline at end of file
+    assert actual == expected
+
+
+
+def test_band_edge_orbital_infos_from_old_format(band_edge_orbital_infos,
+                                                 orbital_info, tmpdir):
+    tmpdir.chdir()
+    old = {"@module": BandEdgeOrbitalInfos.__module__,
+           "@class": "BandEdgeOrbitalInfos",
+           "orbital_infos": [[[orbital_info.as_dict()]]],
+           "kpt_coords": [[0.0, 0.0, 0.0]],
+           "kpt_weights": [1.0],
+           "lowest_band_index": 10,
+           "fermi_level": 0.5,
+           "eigval_shift": 1.0}
+    Path("old.json").write_text(json.dumps(old))
+    actual = loadfn("old.json")
+    assert actual.as_dict() == band_edge_orbital_infos.as_dict()
+
+
+def test_band_edge_orbital_infos_views(band_edge_orbital_infos, orbital_info):
+    assert band_edge_orbital_infos.shape == (1, 1, 1)
+    assert band_edge_orbital_infos.elements == ["Mn"]
+    assert band_edge_orbital_infos.orbital_infos == [[[orbital_info]]]
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import numpy as np
+import pytest
+from pydefect.analyzer._defect_charge_distribution import RadialDist, \
+    _origin_points_in_sphere
+from pymatgen.core import Structure, Lattice
+from pymatgen.electronic_structure.core import Spin
+from pymatgen.io.vasp import Chgcar
+
+
+@pytest.fixture
+def parchg():
+    structure = Structure(Lattice.cubic(10), species=["H"], coords=[[0] * 3])
+    total = np.zeros((4, 4, 4))
+    total[1, 1, 1] = 64.0
+    diff = np.zeros((4, 4, 4))
+    diff[1, 1, 1] = 32.0
+    return Chgcar(structure, data={"total": total, "diff": diff})
+
+
+def test_radial_dist_center(parchg):
+    radial_dist = RadialDist(parchg)
+    np.testing.assert_array_almost_equal(radial_dist.center, [2.5] * 3)
+
+
+def test_radial_dist_histogram(parchg):
+    radial_dist = RadialDist(parchg, center_coords=[2.5, 2.5, 2.5])
+    hist_data, _, _ = radial_dist.histogram(Spin.up, nbins=2)
+    # Only the center point lies in the first bin, with 48 e-.
+    density = 48.0 / 1 / 1000
+    np.testing.assert_array_almost_equal(hist_data[:, 0], [1.25, 3.75])
+    np.testing.assert_array_almost_equal(
+        hist_data[:, 1], [4 * np.pi * 1.25 ** 2 * density, 0.0])
+
+    hist_data, _, _ = radial_dist.histogram(Spin.down, nbins=2)
+    np.testing.assert_array_almost_equal(
+        hist_data[:, 1], [4 * np.pi * 1.25 ** 2 * 16.0 / 1000, 0.0])
+
+
+def test_radial_dist_shares_points_over_centers(parchg):
+    _origin_points_in_sphere.cache_clear()
+    on_grid = RadialDist(parchg, center_coords=[2.5, 2.5, 2.5])
+    # Rounded to the nearest grid point (1, 1, 1).
+    off_grid = RadialDist(parchg, center_coords=[2.9, 2.2, 3.7])
+    assert off_grid.grid_center == [1, 1, 1]
+    np.testing.assert_array_almost_equal(
+        off_grid.histogram(Spin.up, nbins=2)[0],
+        on_grid.histogram(Spin.up, nbins=2)[0])
+
+    other = RadialDist(parchg, center_coords=[7.5, 0.0, 10.0])
+    assert other.grid_center == [3, 0, 0]
+    hist_data, _, _ = other.histogram(Spin.up, nbins=2)
+    np.testing.assert_array_almost_equal(hist_data[:, 1], [0.0, 0.0])
+    assert _origin_points_in_sphere.cache_info().currsize == 1
+
+
+def test_radial_dist_default_center_is_cartesian():
+    lattice = Lattice.from_parameters(8, 9, 10, 80, 90, 100)
+    structure = Structure(lattice, species=["H"], coords=[[0] * 3])
+    total = np.zeros((4, 4, 4))
+    total[1, 2, 3] = 64.0
+    parchg = Chgcar(structure, data={"total": total})
+
+    expected_center = lattice.get_cartesian_coords([0.25, 0.5, 0.75])
+    default = RadialDist(parchg)
+    explicit = RadialDist(parchg, center_coords=expected_center)
+    np.testing.assert_array_almost_equal(default.center, expected_center)
+
+    actual, _, _ = default.histogram(Spin.up, nbins=3)
+    expected, _, _ = explicit.histogram(Spin.up, nbins=3)
+    np.testing.assert_array_almost_equal(actual, expected)
@@ -81,3 +81,38 @@ def test_defect_charge_info_are_localized(defect_charge_info):
     assert actual == expected
 
 
+def test_defect_charge_info_half_charge_radii(defect_charge_info):
+    # up: 0.5 e- is reached in the first bin holding 0.4 * 4 / 3 * pi e-.
+    # down: 0.3 * 4 / 3 * pi e- in the first bin, 0.5 * 28 / 3 * pi in the
+    # second.
+    np.testing.assert_array_almost_equal(defect_charge_info.half_charge_radii,
+                                         [[0.298416, 0.397887]])
+    assert defect_charge_info.cumulative_charges.shape == (1, 2, 3)
+
+
+def test_defect_charge_info_half_charge_radii_on_bin_edge():
+    bins = np.array([0.0, 1.0, 2.0, 3.0])
+    shell_volumes = (bins[1:] ** 3 - bins[:-1] ** 3) * 4 / 3 * np.pi
+    dist = AveChargeDensityDist(charge_center=(0.1, 0.1, 0.1),
+                                radial_dist=[0.5 / shell_volumes[0], 0.0,
+                                             0.5 / shell_volumes[2]])
+    info = DefectChargeInfo(distance_bins=bins.tolist(),
+                            band_idxs=[10],
+                            charge_dists=[[dist]],
+                            ave_charge_density=0.5)
+    assert info.cumulative_charges[0, 0].tolist() == [0.5, 0.5, 1.0]
+    # As before vectorization, the radius is searched in the first bin whose
+    # cumulative charge exceeds 0.5, so it is the lower edge of the third bin.
+    np.testing.assert_array_almost_equal(info.half_charge_radii, [[2.0]])
+
+
+def test_defect_charge_info_half_charge_radius_not_found():
+    dist = AveChargeDensityDist(charge_center=(0.1, 0.1, 0.1),
+                                radial_dist=[0.001, 0.001, 0.001])
+    info = DefectChargeInfo(distance_bins=[0.0, 1.0, 2.0, 2.5],
+                            band_idxs=[10],
+                            charge_dists=[[dist]],
+                            ave_charge_density=0.5)
+    with pytest.raises(ValueError):
+        info.half_charge_radius(10, Spin.up)
+    assert info.localized_orbitals(10.0, 10.0) == [[]]
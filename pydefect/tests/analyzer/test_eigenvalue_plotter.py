@@ -18,7 +18,7 @@ orb = [[OrbitalInfo(0.0, orbitals={}, occupation=1.0, participation_ratio=0.3),
         OrbitalInfo(0.5, orbitals={}, occupation=0.5, participation_ratio=0.3),
         OrbitalInfo(1.0, orbitals={}, occupation=0.0, participation_ratio=0.3)]]
 
-orbital_infos = BandEdgeOrbitalInfos(
+orbital_infos = BandEdgeOrbitalInfos.from_orbital_infos(
     orbital_infos=[orb, orb],
     kpt_coords=[(0.0, 0.0, 0.0), (0.25, 0.0, 0.0)],
     kpt_weights=[0.5, 0.5],
@@ -39,7 +39,7 @@ def test_plot(eigenvalue_mpl_plotter):
 
 
 def test_plot_wo_spin():
-    be_orbital_info = BandEdgeOrbitalInfos(
+    be_orbital_info = BandEdgeOrbitalInfos.from_orbital_infos(
         orbital_infos=[orb],
         kpt_coords=[(0.0, 0.0, 0.0), (0.25, 0.0, 0.0)],
         kpt_weights=[0.5, 0.5],
@@ -1,6 +1,9 @@
+from itertools import product
+
 import joblib
 import pytest
-from pydefect.analyzer.grids import Grids
+from pydefect.analyzer.grids import Grids, grid_distances, \
+    grid_points_in_sphere
 from pymatgen.core import Lattice, Structure
 import numpy as np
 from pymatgen.io.vasp import Chgcar
@@ -40,11 +43,35 @@ def test_grids_np_save_load_roundtrip(tmpdir, grids):
     assert_dataclass_almost_equal(actual, grids)
 
 
+def test_grids_npy_mmap_roundtrip(tmpdir, grids):
+    tmpdir.chdir()
+    grids.dump("grids.npy")
+    actual = Grids.from_file("grids.npy")
+    assert isinstance(actual.distance_data, np.memmap)
+    assert actual.distance_data.dtype == np.float32
+    assert actual.lattice == grids.lattice
+    assert actual.dim == grids.dim
+    np.testing.assert_array_almost_equal(actual.distance_data,
+                                         grids.distance_data)
+
+
 def test_grids_from_chgcar(grids, chgcar):
     actual = Grids.from_chgcar(chgcar)
     assert_dataclass_almost_equal(actual, grids)
 
 
+def test_grid_distances():
+    lattice = Lattice.monoclinic(3, 4, 5, 100)
+    dim = (4, 5, 6)
+    grid_points = [[x / dim[0], y / dim[1], z / dim[2]]
+                   for (x, y, z) in product(*[range(i) for i in dim])]
+    expected = np.array(lattice.get_all_distances(grid_points,
+                                                  (0.1, 0.2, 0.3)))
+    actual = grid_distances(lattice, dim, origin=(0.1, 0.2, 0.3),
+                            chunk_size=7)
+    np.testing.assert_array_almost_equal(actual, expected.reshape(dim))
+
+
 def test_shift_distance_data(grids):
     actual = grids.shifted_distance_data(center=[0, 0, 1])
     expected = np.array([[[2.0, 0.0, 2.0, 4.0, 4.0]]])
@@ -72,6 +99,43 @@ def test_spherical_dist(grids):
     assert actual == expected
 
 
+def test_grid_points_in_sphere():
+    lattice = Lattice.tetragonal(3, 8)
+    dim = (3, 4, 5)
+    grid_points = [[x / dim[0], y / dim[1], z / dim[2]]
+                   for (x, y, z) in product(*[range(i) for i in dim])]
+    center = (0.1, 0.2, 0.3)
+    expected = lattice.get_points_in_sphere(
+        grid_points, lattice.get_cartesian_coords(center), 4.0)
+    distances, indices = grid_points_in_sphere(lattice, dim, center, 4.0)
+    np.testing.assert_array_almost_equal(sorted(distances),
+                                         sorted(x[1] for x in expected))
+    np.testing.assert_array_equal(sorted(indices),
+                                  sorted(x[2] for x in expected))
+
+
+def test_bin_indices(grids):
+    indices, counts = grids.bin_indices(np.array([0.0, 2.5, 4.0]))
+    np.testing.assert_array_equal(indices, [[[0, 0, 1, 1, 0]]])
+    np.testing.assert_array_equal(counts, [3, 2])
+    assert len(grids._bin_cache) == 1
+
+
+def test_spherical_dist_equals_histogram():
+    lattice = Lattice.monoclinic(10, 11, 12, 100)
+    dim = (6, 7, 8)
+    grids = Grids(lattice, dim, grid_distances(lattice, dim))
+    data = np.random.default_rng(0).random(dim)
+    bins = np.linspace(0.0, 4.0, 9)
+    center = [2, 5, 1]
+    shifted_dist = grids.shifted_distance_data(center)
+    _sum, _ = np.histogram(shifted_dist, bins, weights=data)
+    counts, _ = np.histogram(shifted_dist, bins)
+    expected = _sum / counts / lattice.volume
+    actual = grids.spherical_dist(data, center, bins)
+    np.testing.assert_array_almost_equal(actual, expected)
+
+
 """
 TODO
 - Check how to revolve numpy array.
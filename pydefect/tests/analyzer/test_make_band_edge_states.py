@@ -2,13 +2,15 @@
 #  Copyright (c) 2020. Distributed under the terms of the MIT License.
 from pathlib import Path
 
+import numpy as np
 import pytest
 from pydefect.analyzer.band_edge_states import EdgeInfo, BandEdgeOrbitalInfos, \
     PerfectBandEdgeState, OrbitalInfo, BandEdgeStates, BandEdgeState, \
     LocalizedOrbital
 from pydefect.analyzer.defect_charge_info import DefectChargeInfo
 from pydefect.analyzer.make_band_edge_states import make_band_edge_states, \
-    orbital_diff, num_electron_in_cbm, num_hole_in_vbm
+    orbital_diff, num_electron_in_cbm, num_hole_in_vbm, orbital_diffs, \
+    get_similar_orb_idx
 
 
 @pytest.fixture
@@ -41,47 +43,32 @@ def orb_infos():
         OrbitalInfo(energy=1.2,  orbitals={"Mn": [0.0, 0.0, 0.0, 0.0],
                                            "O": [0.1, 0.3, 0.0, 0.0]},
                     occupation=0.01, participation_ratio=0.1)]]]  # cbm
-    return BandEdgeOrbitalInfos(kpt_coords=[(0.0, 0.0, 0.0)],
-                                kpt_weights=[1.0],
-                                orbital_infos=orbital_infos,
-                                lowest_band_index=8,
-                                fermi_level=0.5)
-
-
-def test_num_electron_in_cbm(mocker):
-    mock1 = mocker.Mock()
-    mock2 = mocker.Mock()
-    mock3 = mocker.Mock()
-    mock4 = mocker.Mock()
-    mock1.occupation = 0.1
-    mock2.occupation = 0.2
-    mock3.occupation = 0.3
-    mock4.occupation = 0.4
-    orb_info_by_spin = [[mock1, mock2], [mock3, mock4]]  # k-idx, band-idx
-    actual = num_electron_in_cbm(orb_info_by_spin, cbm_idx=1, weights=[0.1, 0.9])
+    return BandEdgeOrbitalInfos.from_orbital_infos(
+        kpt_coords=[(0.0, 0.0, 0.0)],
+        kpt_weights=[1.0],
+        orbital_infos=orbital_infos,
+        lowest_band_index=8,
+        fermi_level=0.5)
+
+
+def test_num_electron_in_cbm():
+    occupations = np.array([[0.1, 0.2], [0.3, 0.4]])  # k-idx, band-idx
+    actual = num_electron_in_cbm(occupations, cbm_idx=1, weights=[0.1, 0.9])
     expected = 0.1 * 0.2 + 0.9 * 0.4
     assert actual == pytest.approx(expected)
 
-    actual = num_electron_in_cbm(orb_info_by_spin, cbm_idx=0, weights=[0.1, 0.9])
+    actual = num_electron_in_cbm(occupations, cbm_idx=0, weights=[0.1, 0.9])
     expected = 0.1 * (0.1 + 0.2) + 0.9 * (0.3 + 0.4)
     assert actual == pytest.approx(expected)
 
 
-def test_num_hole_in_vbm(mocker):
-    mock1 = mocker.Mock()
-    mock2 = mocker.Mock()
-    mock3 = mocker.Mock()
-    mock4 = mocker.Mock()
-    mock1.occupation = 0.1
-    mock2.occupation = 0.2
-    mock3.occupation = 0.3
-    mock4.occupation = 0.4
-    orb_info_by_spin = [[mock1, mock2], [mock3, mock4]]  # k-idx, band-idx
-    actual = num_hole_in_vbm(orb_info_by_spin, vbm_idx=0, weights=[0.1, 0.9])
+def test_num_hole_in_vbm():
+    occupations = np.array([[0.1, 0.2], [0.3, 0.4]])  # k-idx, band-idx
+    actual = num_hole_in_vbm(occupations, vbm_idx=0, weights=[0.1, 0.9])
     expected = 0.1 * (1 - 0.1) + 0.9 * (1 - 0.3)
     assert actual == pytest.approx(expected)
 
-    actual = num_hole_in_vbm(orb_info_by_spin, vbm_idx=1, weights=[0.1, 0.9])
+    actual = num_hole_in_vbm(occupations, vbm_idx=1, weights=[0.1, 0.9])
     expected = 0.1 * (2 - 0.1 - 0.2) + 0.9 * (2 - 0.3 - 0.4)
     assert actual == pytest.approx(expected)
 
@@ -138,7 +125,7 @@ def test_make_band_edge_state_w_defect_charge_info(p_edge_state, orb_infos, mock
 def test_make_band_edge_state_wo_participation_ratio(
         p_edge_state, orb_infos, band_edge_states):
     # in-gap participation ratio is set to None
-    orb_infos.orbital_infos[0][0][2].participation_ratio = None
+    orb_infos.participation_ratios[0, 0, 2] = np.nan
     band_edge_states.states[0].localized_orbitals[0].participation_ratio = None
     actual = make_band_edge_states(orb_infos, p_edge_state)
     assert actual == band_edge_states
@@ -154,3 +141,18 @@ def test_orbital_diff():
     assert orbital_diff(orb_1, orb_2) == 0.2
 
 
+def test_orbital_diffs():
+    orbitals = np.array([[[0.1, 0.0, 0.0]], [[0.0, 0.1, 0.0]]])
+    actual = orbital_diffs(orbitals, ["Mn"], {"Mn": [0.1, 0.0, 0.0, 0.1]})
+    np.testing.assert_almost_equal(actual, [0.1, 0.3])
+
+    actual = orbital_diffs(orbitals, ["Mn"], {"O": [0.0, 0.1]})
+    np.testing.assert_almost_equal(actual, [0.2, 0.2])
+
+
+def test_get_similar_orb_idx_not_found(p_edge_state):
+    energies = np.array([-1.0, 1.0])
+    orbitals = np.array([[[0.0, 0.0]], [[0.0, 0.0]]])
+    with pytest.raises(ValueError):
+        get_similar_orb_idx(energies, orbitals, ["Mn"], p_edge_state.vbm_info,
+                            _reversed=True)
@@ -69,6 +69,23 @@ def test_add_interstitials_from_local_extrema(mocker):
     mock_loadfn_main_util.assert_called_once_with("local_extrema.json")
 
 
+def test_voronoi_interstitials(mocker):
+    mock_structure = mocker.patch("pydefect.cli.main_util.Structure")
+    parsed_args = parse_args_main_util(["vi",
+                                        "-p", "POSCAR",
+                                        "-i", "a",
+                                        "--min_dist", "0.1",
+                                        "--tol", "0.2"])
+    expected = Namespace(
+        unitcell=mock_structure.from_file.return_value,
+        info="a",
+        min_dist=0.1,
+        tol=0.2,
+        func=parsed_args.func)
+    assert parsed_args == expected
+    mock_structure.from_file.assert_called_once_with("POSCAR")
+
+
 def test_defect_vesta_file_wo_options():
     parsed_args = parse_args_main_util(["dvf", "-d", "Va_O1_0", "Va_O1_1"])
     expected = Namespace(
@@ -136,3 +153,56 @@ def test_gkfo_correction(mocker):
 
     assert parsed_args == expected
 
+
+def test_calc_defect_concentrations_by_temperature(mocker):
+    mock_main_loadfn = mocker.patch("pydefect.cli.main.loadfn")
+    mock_loadfn = mocker.patch("pydefect.cli.main_util.loadfn")
+    mock_degeneracies = mocker.patch("pydefect.cli.main_util.Degeneracies")
+    parsed_args = parse_args_main_util(["cdct",
+                                        "-d", "defect_energy_summary.json",
+                                        "-l", "A",
+                                        "--degeneracies", "degeneracies.yaml",
+                                        "-t", "total_dos.json",
+                                        "-T", "300", "1000",
+                                        "--T_quench", "300"])
+    expected = Namespace(
+        defect_energy_summary=mock_main_loadfn.return_value,
+        allow_shallow=False,
+        with_corrections=True,
+        label="A",
+        degeneracies=mock_degeneracies.from_yaml.return_value,
+        total_dos=mock_loadfn.return_value,
+        temperatures=[300.0, 1000.0],
+        T_quench=300.0,
+        func=parsed_args.func)
+    assert parsed_args == expected
+
+
+def test_calc_defect_concentration_map(mocker):
+    mock_loadfn = mocker.patch("pydefect.cli.main_util.loadfn")
+    mock_degeneracies = mocker.patch("pydefect.cli.main_util.Degeneracies")
+    mock_rel_energies = mocker.patch("pydefect.cli.main_util.RelativeEnergies")
+    parsed_args = parse_args_main_util(["cdcm",
+                                        "-d", "defect_energy_summary.json",
+                                        "--degeneracies", "degeneracies.yaml",
+                                        "-t", "total_dos.json",
+                                        "-n", "10",
+                                        "--method", "random",
+                                        "--seed", "1",
+                                        "-r", "relative_energies.yaml",
+                                        "--impurity_chem_pots", "Al", "-1.5"])
+    expected = Namespace(
+        defect_energy_summary=mock_loadfn.return_value,
+        chem_pot_diag=mock_loadfn.return_value,
+        degeneracies=mock_degeneracies.from_yaml.return_value,
+        total_dos=mock_loadfn.return_value,
+        T=300,
+        num_points=10,
+        method="random",
+        seed=1,
+        allow_shallow=False,
+        with_corrections=True,
+        relative_energies=mock_rel_energies.from_yaml.return_value,
+        impurity_chem_pots=["Al", "-1.5"],
+        func=parsed_args.func)
+    assert parsed_args == expected
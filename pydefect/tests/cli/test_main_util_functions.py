@@ -14,7 +14,8 @@ from pydefect.chem_pot_diag.chem_pot_diag import CompositionEnergies, \
 from pydefect.cli.main_util_functions import composition_energies_from_mp, \
     make_gkfo_correction_from_vasp, add_interstitials_from_local_extrema, \
     make_defect_vesta_file, show_u_values, show_pinning_levels, \
-    calc_defect_concentrations
+    calc_defect_concentrations, make_voronoi_interstitials, \
+    calc_defect_concentrations_by_temperature, calc_defect_concentration_map
 from pydefect.corrections.efnv_correction import ExtendedFnvCorrection
 from pymatgen.core import Composition
 
@@ -65,6 +66,17 @@ def test_add_interstitials_from_local_extrema(mocker):
         mock_supercell_info, [1, 2])
 
 
+def test_make_voronoi_interstitials(mocker):
+    mock_structure = mocker.Mock()
+    mock = mocker.patch("pydefect.cli.main_util_functions."
+                        "make_local_extrema_from_voronoi")
+    args = Namespace(unitcell=mock_structure, info="a", min_dist=0.1, tol=0.2)
+    make_voronoi_interstitials(args)
+    mock.assert_called_once_with(mock_structure, min_dist=0.1, tol=0.2,
+                                 info="a")
+    mock.return_value.to_json_file.assert_called_once_with()
+
+
 def test_make_defect_vesta_file(mocker):
     mock_defect_structure_info = mocker.Mock()
 
@@ -135,5 +147,64 @@ def test_calc_defect_concentrations(tmpdir, test_data_files):
                      degeneracies=degeneracies,
                      T=300,
                      con_by_Ef=None,
-                     net_abs_ratio=0.001)
+                     net_abs_ratio=0.001,
+                     adaptive_tol=None)
+    calc_defect_concentrations(args)
+
+
+def test_calc_defect_concentrations_adaptive(tmpdir, test_data_files):
+    tmpdir.chdir()
+    test_dir = test_data_files / "Na3AgO2"
+    summary = loadfn(test_dir / "defect_energy_summary.json")
+    degeneracies = Degeneracies.from_yaml(test_dir / "degeneracies.yaml")
+    args = Namespace(defect_energy_summary=summary,
+                     label="A",
+                     allow_shallow=False,
+                     with_corrections=True,
+                     total_dos=loadfn(test_dir / "total_dos.json"),
+                     degeneracies=degeneracies,
+                     T=300,
+                     con_by_Ef=None,
+                     net_abs_ratio=0.001,
+                     adaptive_tol=0.1)
     calc_defect_concentrations(args)
+    actual = loadfn("con_by_Ef_A_300K.json")
+    assert actual.Efs[0] == 0.0
+    assert actual.Efs[-1] == summary.cbm
+    assert actual.equilibrium_concentration is not None
+
+
+def test_calc_defect_concentrations_by_temperature(tmpdir, test_data_files):
+    tmpdir.chdir()
+    test_dir = test_data_files / "Na3AgO2"
+    summary = loadfn(test_dir / "defect_energy_summary.json")
+    degeneracies = Degeneracies.from_yaml(test_dir / "degeneracies.yaml")
+    args = Namespace(defect_energy_summary=summary,
+                     label="A",
+                     allow_shallow=False,
+                     with_corrections=True,
+                     total_dos=loadfn(test_dir / "total_dos.json"),
+                     degeneracies=degeneracies,
+                     temperatures=[300.0, 1000.0],
+                     T_quench=300.0)
+    calc_defect_concentrations_by_temperature(args)
+    actual = loadfn("con_by_T_A_to_300.0K.json")
+    assert actual.growth.T == [300.0, 1000.0]
+    assert actual.T_quench == 300.0
+
+
+def test_calc_defect_concentration_map(mocker):
+    mock = mocker.patch(
+        "pydefect.cli.main_util_functions.make_concentration_map")
+    args = Namespace(defect_energy_summary="a", chem_pot_diag="b",
+                     total_dos="c", degeneracies="d", T=300.0, num_points=10,
+                     method="grid", allow_shallow=False, with_corrections=True,
+                     seed=None, relative_energies="e",
+                     impurity_chem_pots=["Al", "-1.5"])
+    calc_defect_concentration_map(args)
+    mock.assert_called_once_with("a", "b", "c", "d", 300.0, num_points=10,
+                                 method="grid", allow_shallow=False,
+                                 with_corrections=True,
+                                 impurity_chem_pots={"Al": -1.5},
+                                 relative_energies="e", seed=None)
+    mock.return_value.dump.assert_called_once_with("con_map_300.0K.npz")
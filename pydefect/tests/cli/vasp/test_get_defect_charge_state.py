@@ -49,3 +49,12 @@ def test_get_defect_charge_state(tmpdir):
     assert get_defect_charge_state(Poscar(structure), potcar, incar) == 0
 
 
+def test_get_defect_charge_state_from_valences():
+    structure = Structure(Lattice.cubic(10), ["H", "He"], [[0.0]*3, [0.5]*3])
+    valences = [("H", 1.0), ("He_pv", 2.0)]
+    incar = Incar({"NELECT": 2})
+    assert get_defect_charge_state(Poscar(structure), valences, incar) == 1
+
+    structure = Structure(Lattice.cubic(10), ["He", "H"], [[0.0]*3, [0.5]*3])
+    with pytest.raises(ValueError):
+        get_defect_charge_state(Poscar(structure), valences, incar)
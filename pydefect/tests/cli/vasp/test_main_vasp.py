@@ -10,7 +10,7 @@ from pydefect.defaults import defaults
 
 def test_unitcell(mocker):
     mock = mocker.patch("pydefect.cli.vasp.main_vasp.Vasprun")
-    mock_outcar = mocker.patch("pydefect.cli.vasp.main_vasp.Outcar")
+    mock_outcar = mocker.patch("pydefect.cli.vasp.main_vasp.read_outcar")
 
     parsed_args = parse_args_main_vasp(["u",
                                         "-vb", "vasprun.xml",
@@ -54,10 +54,11 @@ def test_make_poscars_w_options():
 
 
 def test_make_local_extrema_wo_options(mocker):
-    mock_chgcar = mocker.patch("pydefect.cli.vasp.main_vasp.Chgcar")
+    mock_load = mocker.patch(
+        "pydefect.cli.vasp.main_vasp.load_total_volumetric_data")
     parsed_args = parse_args_main_vasp(["le", "-v", "CHGCAR"])
     expected = Namespace(
-        volumetric_data=[mock_chgcar.from_file.return_value],
+        volumetric_data=[mock_load.return_value],
         find_max=False,
         info=None,
         threshold_frac=None,
@@ -65,13 +66,16 @@ def test_make_local_extrema_wo_options(mocker):
         min_dist=0.5,
         tol=0.5,
         radius=0.4,
+        coarse_factor=None,
+        cross_check=False,
         func=parsed_args.func)
     assert parsed_args == expected
-    mock_chgcar.from_file.assert_called_once_with("CHGCAR")
+    mock_load.assert_called_once_with("CHGCAR")
 
 
 def test_make_local_extrema_w_options(mocker):
-    mock_chgcar = mocker.patch("pydefect.cli.vasp.main_vasp.Chgcar")
+    mock_load = mocker.patch(
+        "pydefect.cli.vasp.main_vasp.load_total_volumetric_data")
     parsed_args = parse_args_main_vasp(["le",
                                         "-v", "CHGCAR",
                                         "--find_max",
@@ -80,9 +84,11 @@ def test_make_local_extrema_w_options(mocker):
                                         "--threshold_abs", "0.2",
                                         "--min_dist", "0.3",
                                         "--tol", "0.4",
-                                        "--radius", "0.5"])
+                                        "--radius", "0.5",
+                                        "--coarse_factor", "2",
+                                        "--cross_check"])
     expected = Namespace(
-        volumetric_data=[mock_chgcar.from_file.return_value],
+        volumetric_data=[mock_load.return_value],
         find_max=True,
         info="a",
         threshold_frac=0.1,
@@ -90,6 +96,8 @@ def test_make_local_extrema_w_options(mocker):
         min_dist=0.3,
         tol=0.4,
         radius=0.5,
+        coarse_factor=2,
+        cross_check=True,
         func=parsed_args.func)
     assert parsed_args == expected
 
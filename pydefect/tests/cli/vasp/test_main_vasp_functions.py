@@ -11,6 +11,8 @@ from pydefect.cli.vasp.main_vasp_functions import make_unitcell, \
     make_competing_phase_dirs, make_composition_energies, make_defect_entries, \
     make_calc_results, make_band_edge_orb_infos_and_eigval_plot, \
     make_perfect_band_edge_state, make_local_extrema
+from pydefect.cli.vasp.vasprun_reader import calc_results_fields, \
+    band_edge_fields
 from pydefect.input_maker.defect import SimpleDefect
 from pydefect.input_maker.defect_entry import DefectEntry
 from pydefect.input_maker.defect_set import DefectSet
@@ -86,7 +88,7 @@ def test_make_composition_energies(mocker, tmpdir):
 
     tmpdir.chdir()
     print(tmpdir)
-    mock = mocker.patch("pydefect.cli.vasp.main_vasp_functions.Outcar",
+    mock = mocker.patch("pydefect.cli.vasp.main_vasp_functions.read_outcar",
                         side_effect=side_effect)
     mock_str = mocker.patch("pydefect.cli.vasp.main_vasp_functions.Structure.from_file",
                             side_effect=side_effect_structure)
@@ -118,13 +120,16 @@ def test_make_local_extrema(tmpdir, mocker, simple_cubic):
                      threshold_abs=None,
                      min_dist=0.1,
                      tol=0.2,
-                     radius=0.3)
+                     radius=0.3,
+                     coarse_factor=2,
+                     cross_check=True)
     make_local_extrema(args)
-    mock_params.assert_called_once_with(None, None, 0.1, 0.2, 0.3)
+    mock_params.assert_called_once_with(None, None, 0.1, 0.2, 0.3, 2)
     mock_make_extrema.assert_called_once_with(volumetric_data=volumetric_data,
                                               params=mock_params.return_value,
                                               info="a",
-                                              find_min=False)
+                                              find_min=False,
+                                              cross_check=True)
     mock_make_extrema.return_value.to_json_file.assert_called_once_with()
 
 
@@ -155,15 +160,17 @@ def test_make_calc_results(tmpdir, mocker):
     tmpdir.chdir()
     mock = mocker.patch(
         "pydefect.cli.vasp.main_vasp_functions.make_calc_results_from_vasp")
-    mock_vasprun = mocker.patch("pydefect.cli.vasp.main_vasp_functions.Vasprun")
-    mock_outcar = mocker.patch("pydefect.cli.vasp.main_vasp_functions.Outcar")
+    mock_vasprun = mocker.patch(
+        "pydefect.cli.vasp.main_vasp_functions.read_vasprun")
+    mock_outcar = mocker.patch(
+        "pydefect.cli.vasp.main_vasp_functions.read_outcar")
     mock_calc_results = mocker.Mock(spec=CalcResults)
     mock.return_value = mock_calc_results
     args = Namespace(dirs=[Path("a")], verbose=False)
     make_calc_results(args)
 
     mock_vasprun.assert_called_with(Path("a") / defaults.vasprun,
-                                    parse_potcar_file=False)
+                                    calc_results_fields)
     mock_outcar.assert_called_with(Path("a") / defaults.outcar)
     mock.assert_called_with(vasprun=mock_vasprun.return_value,
                             outcar=mock_outcar.return_value)
@@ -190,8 +197,12 @@ def test_make_calc_results(tmpdir, mocker):
 
 
 def test_make_band_edge_orb_infos_and_eigval_plot(mocker):
-    mock_procar = mocker.patch("pydefect.cli.vasp.main_vasp_functions.Procar")
-    mock_vasprun = mocker.patch("pydefect.cli.vasp.main_vasp_functions.Vasprun")
+    mock_read_procar = mocker.patch(
+        "pydefect.cli.vasp.main_vasp_functions.read_procar")
+    mock_vasprun = mocker.patch(
+        "pydefect.cli.vasp.main_vasp_functions.read_vasprun")
+    mock_window = mocker.patch(
+        "pydefect.cli.vasp.main_vasp_functions.band_edge_window")
 
     mock_p_state = mocker.Mock()
     mock_p_state.vbm_info.energy = 10
@@ -228,12 +239,15 @@ def test_make_band_edge_orb_infos_and_eigval_plot(mocker):
                      verbose=False)
     make_band_edge_orb_infos_and_eigval_plot(args)
 
-    mock_procar.assert_called_with(Path("Va_O1_2") / defaults.procar)
     mock_vasprun.assert_called_with(Path("Va_O1_2") / defaults.vasprun,
-                                    parse_potcar_file=False)
+                                    band_edge_fields)
+    mock_window.assert_called_with(mock_vasprun.return_value.eigenvalues,
+                                   10, 20)
+    mock_read_procar.assert_called_with(Path("Va_O1_2") / defaults.procar,
+                                        mock_window.return_value)
 
     mock_make_orbital_infos.assert_called_with(
-        mock_procar.return_value, mock_vasprun.return_value, 10, 20,
+        mock_read_procar.return_value, mock_vasprun.return_value, 10, 20,
         mock_structure_info,
         eigval_shift=1.0)
 
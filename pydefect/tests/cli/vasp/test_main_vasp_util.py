@@ -15,6 +15,15 @@ def test_calc_charge_state():
     assert parsed_args == expected
 
 
+def test_calc_charge_states():
+    parsed_args = parse_args_main_vasp_util(
+        ["ccss", "-d", "Va_O1_0", "Va_O1_1"])
+    expected = Namespace(
+        dirs=[Path("Va_O1_0"), Path("Va_O1_1")],
+        func=parsed_args.func)
+    assert parsed_args == expected
+
+
 def test_make_defect_entry(mocker):
     mock_structure = mocker.patch("pydefect.cli.vasp.main_vasp_util.Structure")
     parsed_args = parse_args_main_vasp_util(
@@ -56,14 +65,16 @@ def test_refine_defect_poscar(mocker, simple_cubic):
 
 
 def test_calc_grids(mocker):
-    mock_chgcar = mocker.patch("pydefect.cli.vasp.main_vasp_util.Chgcar")
+    mock_open = mocker.patch(
+        "pydefect.cli.vasp.main_vasp_util.open_volumetric_data")
     parsed_args = parse_args_main_vasp_util(
         ["cg", "-c", "CHG"])
     expected = Namespace(
-        chgcar=mock_chgcar.from_file.return_value,
+        chgcar=mock_open.return_value,
+        output="grids.npz",
         func=parsed_args.func)
     assert parsed_args == expected
-    mock_chgcar.from_file.assert_called_once_with("CHG")
+    mock_open.assert_called_once_with("CHG")
 
 
 def test_calc_defect_charge_info(mocker):
@@ -74,8 +85,20 @@ def test_calc_defect_charge_info(mocker):
         parchgs=["PARCHG.0001.ALLK"],
         bin_interval=0.3,
         grids=mock_grids.from_file.return_value,
+        num_processes=None,
         func=parsed_args.func)
     assert parsed_args == expected
     mock_grids.from_file.assert_called_once_with("Grids.npz")
 
 
+def test_convert_volumetric_data():
+    parsed_args = parse_args_main_vasp_util(
+        ["cv", "-d", "Va_O1_0", "Va_O1_1", "-f", "PARCHG*",
+         "--chunk_size", "16", "--compression", "lzf"])
+    expected = Namespace(
+        dirs=[Path("Va_O1_0"), Path("Va_O1_1")],
+        filenames=["PARCHG*"],
+        chunk_size=16,
+        compression="lzf",
+        func=parsed_args.func)
+    assert parsed_args == expected
@@ -7,8 +7,9 @@ import pytest
 from pydefect.analyzer.band_edge_states import BandEdgeStates
 from pydefect.analyzer.calc_results import CalcResults
 from pydefect.cli.vasp.main_vasp_util_functions import make_parchg_dir, \
-    make_refine_defect_poscar, calc_charge_state, \
-    calc_grids, make_defect_charge_info_main, make_defect_entry_main
+    make_refine_defect_poscar, calc_charge_state, calc_charge_states, \
+    calc_grids, make_defect_charge_info_main, make_defect_entry_main, \
+    convert_volumetric_data
 from pymatgen.core import Structure
 from vise.input_set.incar import ViseIncar
 import numpy as np
@@ -18,7 +19,7 @@ _filepath = "pydefect.cli.vasp.main_vasp_util_functions"
 
 def test_calc_charge_state(mocker):
     mock_poscar = mocker.patch(f"{_filepath}.Poscar")
-    mock_potcar = mocker.patch(f"{_filepath}.Potcar")
+    mock_potcar = mocker.patch(f"{_filepath}.potcar_valences")
     mock_incar = mocker.patch(f"{_filepath}.Incar")
     mock_get_charge_state = mocker.patch(f"{_filepath}.get_defect_charge_state")
     mock_get_charge_state.return_value = 0
@@ -27,14 +28,31 @@ def test_calc_charge_state(mocker):
     calc_charge_state(args)
 
     mock_poscar.from_file.assert_called_once_with(Path("Va_O1_0/POSCAR"))
-    mock_potcar.from_file.assert_called_once_with(Path("Va_O1_0/POTCAR"))
+    mock_potcar.assert_called_once_with(Path("Va_O1_0/POTCAR"))
     mock_incar.from_file.assert_called_once_with(Path("Va_O1_0/INCAR"))
     mock_get_charge_state.assert_called_once_with(
         mock_poscar.from_file.return_value,
-        mock_potcar.from_file.return_value,
+        mock_potcar.return_value,
         mock_incar.from_file.return_value)
 
 
+def test_calc_charge_states(tmpdir, mocker):
+    tmpdir.chdir()
+    Path("Va_O1_0").mkdir()
+    Path("Va_O1_1").mkdir()
+    mocker.patch(f"{_filepath}.Poscar")
+    mocker.patch(f"{_filepath}.Incar")
+    mock_potcar = mocker.patch(f"{_filepath}.potcar_valences")
+    mock_get_charge_state = mocker.patch(f"{_filepath}.get_defect_charge_state",
+                                         side_effect=[0, 1])
+
+    args = Namespace(dirs=[Path("Va_O1_0"), Path("Va_O1_1")])
+    actual = calc_charge_states(args)
+    assert actual == {"Va_O1_0": 0, "Va_O1_1": 1}
+    mock_potcar.assert_called_with(Path("Va_O1_1/POTCAR"))
+    assert mock_get_charge_state.call_count == 2
+
+
 def test_make_defect_entry_main(mocker):
     mock_charge_state = mocker.patch(f"{_filepath}.calc_charge_state")
     mock_charge_state.return_value = 0
@@ -112,23 +130,46 @@ def test_refine_poscar(tmpdir, mocker, before_refine, after_refine):
 
 def test_calc_grids(mocker):
     mock_grids = mocker.patch(f"{_filepath}.Grids")
-    args = Namespace(chgcar="CHGCAR")
+    args = Namespace(chgcar="CHGCAR", output="grids.npy")
     calc_grids(args)
     mock_grids.from_chgcar.assert_called_once_with("CHGCAR")
-    mock_grids.from_chgcar.return_value.dump.assert_called_once_with()
+    mock_grids.from_chgcar.return_value.dump.assert_called_once_with(
+        "grids.npy")
 
 
 def test_make_defect_charge_info_main(mocker):
-    mock_chgcar = mocker.patch(f"{_filepath}.Chgcar")
-    m_chgcar = mock_chgcar.from_file.return_value
-    mock_make_charge_info = mocker.patch(f"{_filepath}.make_defect_charge_info")
+    mock_make_charge_info = mocker.patch(
+        f"{_filepath}.make_defect_charge_info_from_files")
     mock_charge_info = mock_make_charge_info.return_value
     mock_grids = mocker.Mock()
     args = Namespace(parchgs=["PARCHG.0189.ALLK"],
                      grids=mock_grids,
-                     bin_interval=0.1)
+                     bin_interval=0.1,
+                     num_processes=2)
     make_defect_charge_info_main(args)
 
-    mock_make_charge_info.assert_called_once_with([m_chgcar], [188], 0.1, mock_grids)
-    mock_chgcar.from_file.assert_called_once_with("PARCHG.0189.ALLK")
+    mock_make_charge_info.assert_called_once_with(
+        ["PARCHG.0189.ALLK"], [188], 0.1, mock_grids, 2)
     mock_charge_info.to_json_file.assert_called_once_with()
+
+
+def test_make_defect_charge_info_main_from_stores(mocker):
+    mock_make_charge_info = mocker.patch(
+        f"{_filepath}.make_defect_charge_info_from_files")
+    args = Namespace(parchgs=["PARCHG.0189.ALLK.h5"],
+                     grids=None,
+                     bin_interval=0.1,
+                     num_processes=None)
+    make_defect_charge_info_main(args)
+    mock_make_charge_info.assert_called_once_with(
+        ["PARCHG.0189.ALLK.h5"], [188], 0.1, None, None)
+
+
+def test_convert_volumetric_data(mocker):
+    mock_convert = mocker.patch(f"{_filepath}.convert_volumetric_files")
+    args = Namespace(dirs=[Path("a"), Path("b")], filenames=["CHGCAR"],
+                     chunk_size=16, compression="gzip")
+    convert_volumetric_data(args)
+    mock_convert.assert_has_calls(
+        [mocker.call(Path("a"), ["CHGCAR"], 16, "gzip"),
+         mocker.call(Path("b"), ["CHGCAR"], 16, "gzip")])
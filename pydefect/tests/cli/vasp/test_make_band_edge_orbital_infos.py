@@ -5,7 +5,7 @@ from pydefect.analyzer.band_edge_states import OrbitalInfo, \
     BandEdgeOrbitalInfos
 from pydefect.analyzer.defect_structure_info import DefectStructureInfo
 from pydefect.cli.vasp.make_band_edge_orbital_infos import \
-    make_band_edge_orbital_infos
+    make_band_edge_orbital_infos, orbital_characters, participation_ratios
 from pymatgen.core import Structure, Lattice
 from pymatgen.electronic_structure.core import Spin
 from pymatgen.io.vasp import Procar, Vasprun
@@ -17,8 +17,8 @@ def test_make_band_edge_orbital_infos(mocker):
     mock_vasprun = mocker.Mock(spec=Vasprun, autospec=True)
     mock_str_info = mocker.Mock(spec=DefectStructureInfo, autospec=True)
 
-    mock_vasprun.actual_kpoints = [[0.0, 0.0, 0.0]]
-    mock_vasprun.actual_kpoints_weights = [1.0]
+    mock_vasprun.actual_kpoints = [[0.0, 0.0, 0.0], [0.5, 0.0, 0.0]]
+    mock_vasprun.actual_kpoints_weights = [0.5, 0.5]
     mock_vasprun.final_structure = Structure(
         Lattice.cubic(1), species=["H", "H", "He"], coords=[[0] * 3] * 3)
     mock_vasprun.eigenvalues = {Spin.up: np.array([[[-3.01, 1.],
@@ -77,11 +77,15 @@ def test_make_band_edge_orbital_infos(mocker):
     }
 
     mock_str_info.neighbor_atom_indices = [0]
+    # The window covers the bands with energies in [vbm - 1, cbm + 1], where
+    # 1 eV is defaults.eigval_range, so cbm=7.0 includes the cbm band at
+    # 7.90 eV in the expected orbital infos. With cbm=5.0, only band 1 was
+    # returned, which passed only because lists were compared with zip.
     actual = make_band_edge_orbital_infos(
-        mock_procar, mock_vasprun, vbm=0.0, cbm=5.0, str_info=mock_str_info,
+        mock_procar, mock_vasprun, vbm=0.0, cbm=7.0, str_info=mock_str_info,
         eigval_shift=1.0)
 
-    expected = BandEdgeOrbitalInfos(
+    expected = BandEdgeOrbitalInfos.from_orbital_infos(
         orbital_infos=[[
             [OrbitalInfo(energy=-2.9, orbitals={"H": [1.0, 0.0, 0.0, 0.0], "He": [0.0, 0.0, 0.0, 0.0]}, occupation=1.0, participation_ratio=1.0),
              OrbitalInfo(energy=8.01, orbitals={"H": [1.0, 0.0, 0.0, 0.0], "He": [0.0, 0.0, 0.0, 0.0]}, occupation=0.0, participation_ratio=1.0)],
@@ -91,15 +95,16 @@ def test_make_band_edge_orbital_infos(mocker):
              OrbitalInfo(energy=10.00, orbitals={"H": [1.0, 0.0, 0.0, 0.0], "He": [0.0, 0.0, 0.0, 0.0]}, occupation=0.0, participation_ratio=1.0)],
             [OrbitalInfo(energy=8.00, orbitals={"H": [1.0, 0.0, 0.0, 0.0], "He": [0.0, 0.0, 0.0, 0.0]}, occupation=0.0, participation_ratio=1.0),
              OrbitalInfo(energy=10.00, orbitals={"H": [1.0, 0.0, 0.0, 0.0], "He": [0.0, 0.0, 0.0, 0.0]}, occupation=0.0, participation_ratio=1.0)]]],
-        kpt_coords=[(0.0, 0.0, 0.0)], kpt_weights=[1.0], lowest_band_index=1,
+        kpt_coords=[(0.0, 0.0, 0.0), (0.5, 0.0, 0.0)],
+        kpt_weights=[0.5, 0.5], lowest_band_index=1,
         fermi_level=20.0,
         eigval_shift=1.0)
     assert_dataclass_almost_equal(actual, expected, check_is_subclass=True)
 
     actual = make_band_edge_orbital_infos(
-        mock_procar, mock_vasprun, vbm=0.0, cbm=5.0, eigval_shift=2.0)
+        mock_procar, mock_vasprun, vbm=0.0, cbm=7.0, eigval_shift=2.0)
 
-    expected = BandEdgeOrbitalInfos(
+    expected = BandEdgeOrbitalInfos.from_orbital_infos(
         orbital_infos=[[
             [OrbitalInfo(energy=-2.9, orbitals={"H": [1.0, 0.0, 0.0, 0.0], "He": [0.0, 0.0, 0.0, 0.0]}, occupation=1.0),
              OrbitalInfo(energy=8.01, orbitals={"H": [1.0, 0.0, 0.0, 0.0], "He": [0.0, 0.0, 0.0, 0.0]}, occupation=0.0)],
@@ -109,9 +114,26 @@ def test_make_band_edge_orbital_infos(mocker):
               OrbitalInfo(energy=10.00, orbitals={"H": [1.0, 0.0, 0.0, 0.0], "He": [0.0, 0.0, 0.0, 0.0]}, occupation=0.0)],
              [OrbitalInfo(energy=8.00, orbitals={"H": [1.0, 0.0, 0.0, 0.0], "He": [0.0, 0.0, 0.0, 0.0]}, occupation=0.0),
               OrbitalInfo(energy=10.00, orbitals={"H": [1.0, 0.0, 0.0, 0.0], "He": [0.0, 0.0, 0.0, 0.0]}, occupation=0.0)]]],
-        kpt_coords=[(0.0, 0.0, 0.0)], kpt_weights=[1.0], lowest_band_index=1,
+        kpt_coords=[(0.0, 0.0, 0.0), (0.5, 0.0, 0.0)],
+        kpt_weights=[0.5, 0.5], lowest_band_index=1,
         fermi_level=20.0,
         eigval_shift=2.0)
     assert_dataclass_almost_equal(actual, expected, check_is_subclass=True)
 
 
+def test_orbital_characters_and_participation_ratios():
+    structure = Structure(Lattice.cubic(1), species=["H", "He", "H"],
+                          coords=[[0] * 3] * 3)
+    projections = np.zeros((2, 1, 3, 9))  # (k-point, band, ion, orbital)
+    projections[0, 0, 0, 0] = 0.1  # H s
+    projections[0, 0, 2, 1:4] = 0.1  # H p
+    projections[1, 0, 1, 4:9] = 0.2  # He d
+    elements, actual = orbital_characters(projections, structure)
+    assert elements == ["H", "He"]
+    expected = np.zeros((2, 1, 2, 4))
+    expected[0, 0, 0, :2] = [0.1, 0.3]
+    expected[1, 0, 1, 2] = 1.0
+    np.testing.assert_array_almost_equal(actual, expected)
+
+    actual = participation_ratios(projections, [0])
+    np.testing.assert_array_almost_equal(actual, [[0.25], [0.0]])
@@ -7,7 +7,9 @@ from pydefect.analyzer.defect_charge_info import AveChargeDensityDist, \
     DefectChargeInfo
 from pydefect.analyzer.grids import Grids
 from pydefect.cli.vasp.make_defect_charge_info import \
-    center_1d_periodic_quantity, make_charge_dist, make_defect_charge_info
+    center_1d_periodic_quantity, make_charge_dist, make_defect_charge_info, \
+    charge_center, spin_densities, make_defect_charge_info_from_files
+from pydefect.util.volumetric_store import dump_volumetric_data
 from pymatgen.core import Structure, Lattice
 from pymatgen.io.vasp import Chgcar
 
@@ -19,6 +21,25 @@ def test_center_1d_periodic_quantity():
     assert center_1d_periodic_quantity(grid_points) == 6
 
 
+def test_center_1d_periodic_quantity_sub_grid():
+    grid_points = [0.0, 1.0, 1.0, 0.0, 0.0, 0.0]
+    assert center_1d_periodic_quantity(grid_points) == 1
+    actual = center_1d_periodic_quantity(grid_points, sub_grid=True)
+    assert actual == pytest.approx(1.5)
+
+
+def test_charge_center(parchg):
+    np.testing.assert_array_equal(charge_center(parchg.data["total"]),
+                                  [0, 1, 1])
+
+
+def test_spin_densities(parchg):
+    actual = list(spin_densities(parchg))
+    assert len(actual) == 2
+    assert actual[0][0, 1, 1] == 1500.0
+    assert actual[1][0, 1, 1] == 500.0
+
+
 @pytest.fixture
 def parchg():
     struc = Structure(lattice=Lattice.cubic(10), species=["H"], coords=[[0]*3])
@@ -56,3 +77,30 @@ def test_make_defect_charge_info(parchg, charge_dist_list):
                                 0.001)
     assert actual == expected
 
+
+@pytest.mark.parametrize("num_processes", [None, 2])
+def test_make_defect_charge_info_from_files(tmpdir, parchg, charge_dist_list,
+                                            num_processes):
+    tmpdir.chdir()
+    parchg.write_file("PARCHG.0002.ALLK")
+    parchg.write_file("PARCHG.0003.ALLK")
+    grids = Grids.from_chgcar(parchg)
+    actual = make_defect_charge_info_from_files(
+        ["PARCHG.0002.ALLK", "PARCHG.0003.ALLK"], band_idxs=[1, 2],
+        bin_interval=2.5, grids=grids, num_processes=num_processes)
+    expected = DefectChargeInfo([0.0, 2.5, 5.0],
+                                [1, 2],
+                                [charge_dist_list, charge_dist_list],
+                                0.001)
+    assert actual == expected
+
+
+def test_make_defect_charge_info_from_stores(tmpdir, parchg, charge_dist_list):
+    pytest.importorskip("h5py")
+    tmpdir.chdir()
+    dump_volumetric_data(parchg, "PARCHG.0002.ALLK.h5")
+    actual = make_defect_charge_info_from_files(
+        ["PARCHG.0002.ALLK.h5"], band_idxs=[1], bin_interval=2.5)
+    expected = DefectChargeInfo([0.0, 2.5, 5.0], [1], [charge_dist_list],
+                                0.001)
+    assert actual == expected
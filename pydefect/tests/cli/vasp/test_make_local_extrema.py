@@ -6,7 +6,8 @@ from pandas import DataFrame
 from pandas._testing import assert_frame_equal
 from pydefect.cli.vasp.make_local_extrema import extrema_coords, \
     find_inequivalent_coords, \
-    make_local_extrema_from_volumetric_data
+    make_local_extrema_from_volumetric_data, block_average, \
+    cross_check_extrema
 from pydefect.input_maker.local_extrema import CoordInfo
 from pydefect.util.structure_tools import Coordination
 from pymatgen.io.vasp import Chgcar, VolumetricData
@@ -21,6 +22,10 @@ def test_make_local_extrema_from_volumetric_data(vasp_files, vol_params):
     aeccar.write_file("CHGCAR")
     make_local_extrema_from_volumetric_data(aeccar, vol_params)
 
+    params = copy(vol_params)
+    params.coarse_factor = 2
+    make_local_extrema_from_volumetric_data(aeccar, params, cross_check=True)
+
 
 def test_find_inequivalent_coords(simple_cubic):
 
@@ -53,3 +58,37 @@ def test_extrema_coords(vasp_files, simple_cubic, vol_params):
     expected = DataFrame([[0.5, 0.5, 0.0, -2.0, -1.25]],
                          columns=["a", "b", "c", "value", "ave_value"])
     assert_frame_equal(actual, expected)
+
+
+def test_block_average():
+    data = np.arange(27, dtype=float).reshape(3, 3, 3)
+    actual = block_average(data, 2)
+    assert actual.shape == (2, 2, 2)
+    assert actual[0, 0, 0] == np.mean(data[:2, :2, :2])
+    assert actual[1, 1, 1] == data[2, 2, 2]
+
+
+def test_extrema_coords_multiresolution(simple_cubic, vol_params):
+    grid = np.linspace(0, 1, 8, endpoint=False)
+    a, b, c = np.meshgrid(grid, grid, grid, indexing="ij")
+    data = np.cos(2 * np.pi * a) + np.cos(2 * np.pi * b) + np.cos(2 * np.pi * c)
+    aeccar = VolumetricData(simple_cubic, data={"total": data})
+    params = copy(vol_params)
+    params.min_dist = 0.0
+    params.radius = None
+    params.coarse_factor = 2
+    actual = extrema_coords(volumetric_data=aeccar, find_min=True,
+                            params=params)
+    expected = DataFrame([[0.5, 0.5, 0.5, -3.0]],
+                         columns=["a", "b", "c", "value"])
+    assert_frame_equal(actual, expected)
+
+
+def test_cross_check_extrema(simple_cubic):
+    extrema = DataFrame([[0.5, 0.5, 0.5, -3.0]],
+                        columns=["a", "b", "c", "value"])
+    reference = DataFrame([[0.5, 0.5, 0.5, -3.0], [0.0, 0.0, 0.5, -1.0]],
+                          columns=["a", "b", "c", "value"])
+    actual = cross_check_extrema(simple_cubic.lattice, extrema, reference,
+                                 tol=0.1)
+    assert_frame_equal(actual, reference.iloc[[1]])
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import gzip
+import shutil
+
+import pytest
+from pydefect.cli.vasp.outcar_reader import OutcarReader, read_outcar
+from pymatgen.io.vasp import Outcar
+
+
+@pytest.fixture(scope="module")
+def outcar_file(vasp_files):
+    return vasp_files / "MgO_conv_Va_O_0" / "OUTCAR"
+
+
+def test_outcar_reader(outcar_file):
+    outcar = Outcar(outcar_file)
+    outcar.read_electrostatic_potential()
+    actual = OutcarReader(outcar_file)
+    assert actual.final_energy == outcar.final_energy
+    assert actual.total_mag == outcar.total_mag
+    assert actual.nelect == pytest.approx(outcar.nelect, abs=1e-5)
+    assert actual.electrostatic_potential == outcar.electrostatic_potential
+
+
+def test_outcar_reader_wo_magnetization(vasp_files):
+    actual = OutcarReader(vasp_files / "MgO_2x2x2_perfect" / "OUTCAR")
+    assert actual.total_mag is None
+    assert actual.nelect == 256.0
+
+
+def test_outcar_reader_lepsilon(vasp_files):
+    filename = vasp_files / "unitcell_Ne_solid" / "OUTCAR-dielectric"
+    outcar = Outcar(filename)
+    outcar.read_lepsilon()
+    outcar.read_lepsilon_ionic()
+    actual = OutcarReader(filename)
+    actual.read_lepsilon()
+    actual.read_lepsilon_ionic()
+    assert actual.dielectric_tensor == outcar.dielectric_tensor
+    assert actual.dielectric_ionic_tensor == outcar.dielectric_ionic_tensor
+
+
+def test_outcar_reader_fallback(tmpdir, mocker):
+    tmpdir.chdir()
+    with open("OUTCAR", "w") as f:
+        f.write("no blocks\n")
+    mock = mocker.patch("pydefect.cli.vasp.outcar_reader.Outcar")
+    mock.return_value.final_energy = -1.0
+    assert OutcarReader("OUTCAR").final_energy == -1.0
+    mock.assert_called_once_with("OUTCAR")
+
+
+def test_read_outcar(outcar_file, tmpdir):
+    tmpdir.chdir()
+    assert isinstance(read_outcar(outcar_file), OutcarReader)
+    with open(outcar_file, "rb") as f_in, gzip.open("OUTCAR.gz", "wb") as f:
+        shutil.copyfileobj(f_in, f)
+    assert isinstance(read_outcar("OUTCAR.gz"), Outcar)
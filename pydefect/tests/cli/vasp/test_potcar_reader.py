@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+from pathlib import Path
+
+import pytest
+from pydefect.cli.vasp import potcar_reader
+from pydefect.cli.vasp.potcar_reader import scan_potcar_valences, \
+    potcar_valences
+
+fake_potcar_str = """ PAW_PBE H 15Jun2001
+   1.00000000000000
+ parameters from PSCTR are:
+   VRHFIN =H: ultrasoft test
+   LEXCH  = PE
+   TITEL  = PAW_PBE H 15Jun2001
+   POMASS =    1.000; ZVAL   =    1.000    mass and valenz
+   ENMAX  =  250.000; ENMIN  =  200.000 eV
+
+   END of PSCTR-controll parameters
+   0.1 0.2 0.3 ZVAL = 100.0
+ End of Dataset
+      PAW_PBE He_pv 15Jun2001
+   2.00000000000000
+ parameters from PSCTR are:
+   VRHFIN =He: ultrasoft test
+   LEXCH  = PE
+   TITEL  = PAW_PBE He_pv 15Jun2001
+   POMASS =    4.000; ZVAL   =    2.000    mass and valenz
+   ENMAX  =  250.000; ENMIN  =  200.000 eV
+
+   END of PSCTR-controll parameters
+ End of Dataset
+ """
+
+
+def test_scan_potcar_valences():
+    actual = scan_potcar_valences(fake_potcar_str)
+    assert actual == [("H", 1.0), ("He_pv", 2.0)]
+
+    with pytest.raises(ValueError):
+        scan_potcar_valences("a")
+
+
+def test_potcar_valences(tmpdir, mocker):
+    tmpdir.chdir()
+    Path("POTCAR").write_text(fake_potcar_str)
+    Path("POTCAR2").write_text(fake_potcar_str)
+    mocker.patch.dict(potcar_reader._valence_cache, clear=True)
+    spy = mocker.spy(potcar_reader, "scan_potcar_valences")
+    assert potcar_valences("POTCAR") == [("H", 1.0), ("He_pv", 2.0)]
+    assert potcar_valences("POTCAR2") == [("H", 1.0), ("He_pv", 2.0)]
+    spy.assert_called_once()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import shutil
+
+import numpy as np
+import pytest
+from pydefect.cli.vasp.procar_reader import parse_procar, read_procar, \
+    BandWindowProcar
+from pymatgen.electronic_structure.core import Spin
+from pymatgen.io.vasp import Procar
+
+
+@pytest.fixture(scope="module")
+def procar_file(vasp_files):
+    return vasp_files / "MgO_2x2x2_perfect" / "PROCAR"
+
+
+@pytest.fixture(scope="module")
+def procar(procar_file):
+    return Procar(procar_file)
+
+
+def test_parse_procar(procar_file, procar):
+    actual = parse_procar(procar_file, band_window=(120, 130))
+    assert actual.lowest_band_index == 120
+    assert actual.highest_band_index == 130
+    assert actual.orbitals == procar.orbitals
+    np.testing.assert_array_equal(actual.data[Spin.up],
+                                  procar.data[Spin.up][:, 120:131])
+    np.testing.assert_array_almost_equal(actual.eigenvalues[Spin.up],
+                                         procar.eigenvalues[Spin.up])
+    np.testing.assert_array_almost_equal(actual.occupancies[Spin.up],
+                                         procar.occupancies[Spin.up])
+
+
+def test_parse_spin_polarized_procar(procar_file, procar, tmpdir):
+    tmpdir.chdir()
+    lines = open(procar_file).readlines()
+    # VASP writes the blocks of the down spin after those of the up spin.
+    with open("PROCAR", "w") as f:
+        f.writelines(lines + lines[1:])
+    actual = parse_procar("PROCAR", band_window=(127, 128))
+    for spin in [Spin.up, Spin.down]:
+        np.testing.assert_array_equal(actual.data[spin],
+                                      procar.data[Spin.up][:, 127:129])
+
+
+def test_read_procar_cache(procar_file, procar, tmpdir, mocker):
+    tmpdir.chdir()
+    shutil.copy(procar_file, "PROCAR")
+    first = read_procar("PROCAR", band_window=(120, 130))
+    assert BandWindowProcar.from_file("PROCAR.npz").lowest_band_index == 120
+
+    mock_parse = mocker.patch(
+        "pydefect.cli.vasp.procar_reader.parse_procar")
+    actual = read_procar("PROCAR", band_window=(125, 127))
+    mock_parse.assert_not_called()
+    assert actual.lowest_band_index == 125
+    np.testing.assert_array_equal(actual.data[Spin.up],
+                                  first.data[Spin.up][:, 5:8])
+
+    read_procar("PROCAR", band_window=(100, 127))
+    mock_parse.assert_called_once_with("PROCAR", (100, 127))
+
+
+def test_read_procar_broken_cache(procar_file, procar, tmpdir):
+    tmpdir.chdir()
+    shutil.copy(procar_file, "PROCAR")
+    with open("PROCAR.npz", "w") as f:
+        f.write("broken")
+    actual = read_procar("PROCAR", band_window=(120, 130))
+    np.testing.assert_array_equal(actual.data[Spin.up],
+                                  procar.data[Spin.up][:, 120:131])
+    assert BandWindowProcar.from_file("PROCAR.npz").lowest_band_index == 120
+
+
+def test_read_procar_unwritable_cache(procar_file, procar, tmpdir):
+    actual = read_procar(procar_file, band_window=(120, 130),
+                         cache_filename=tmpdir / "no_dir" / "PROCAR.npz")
+    np.testing.assert_array_equal(actual.data[Spin.up],
+                                  procar.data[Spin.up][:, 120:131])
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import shutil
+
+import numpy as np
+import pytest
+from pydefect.cli.vasp.vasprun_reader import parse_vasprun, read_vasprun, \
+    VasprunData
+from pymatgen.electronic_structure.core import Spin
+from pymatgen.io.vasp import Vasprun
+
+
+@pytest.fixture(scope="module")
+def vasprun_file(vasp_files):
+    return vasp_files / "MgO_2x2x2_perfect" / "vasprun.xml"
+
+
+@pytest.fixture(scope="module")
+def vasprun(vasprun_file):
+    return Vasprun(vasprun_file, parse_potcar_file=False)
+
+
+def test_parse_vasprun(vasprun_file, vasprun):
+    actual = parse_vasprun(vasprun_file)
+    assert actual.initial_structure == vasprun.initial_structure
+    assert actual.final_structure == vasprun.final_structure
+    np.testing.assert_array_equal(actual.actual_kpoints,
+                                  vasprun.actual_kpoints)
+    assert actual.actual_kpoints_weights == vasprun.actual_kpoints_weights
+    assert actual.efermi == vasprun.efermi
+    assert actual.parameters["NELM"] == vasprun.parameters["NELM"]
+    assert actual.converged_electronic is vasprun.converged_electronic
+    assert actual.converged_ionic is vasprun.converged_ionic
+    np.testing.assert_array_equal(actual.eigenvalues[Spin.up],
+                                  vasprun.eigenvalues[Spin.up])
+    np.testing.assert_array_equal(actual.tdos.densities[Spin.up],
+                                  vasprun.tdos.densities[Spin.up])
+
+
+def test_parse_vasprun_parameters(vasprun_file, vasprun):
+    actual = parse_vasprun(vasprun_file, fields=["parameters"]).parameters
+    # Incar capitalizes the keys and string values.
+    actual = {k.upper(): v.upper() if isinstance(v, str) else v
+              for k, v in actual.items()}
+    expected = {k: v.upper() if isinstance(v, str) else v
+                for k, v in vasprun.parameters.items()}
+    assert actual == expected
+    assert actual["OMEGAMAX"] == -1.0
+    assert actual["CSHIFT"] == 0.1
+    assert actual["MAGMOM"] == [1.0] * 64
+
+
+def test_parse_vasprun_selected_fields(vasprun_file):
+    actual = parse_vasprun(vasprun_file, fields=["kpoints"])
+    assert actual.actual_kpoints == [(0.25, 0.25, 0.25)]
+    assert actual.final_structure is None
+    assert actual.eigenvalues is None
+
+    with pytest.raises(ValueError):
+        parse_vasprun(vasprun_file, fields=["dos"])
+
+
+def test_read_vasprun_cache(vasprun_file, tmpdir, mocker):
+    tmpdir.chdir()
+    shutil.copy(vasprun_file, "vasprun.xml")
+    first = read_vasprun("vasprun.xml", fields=["structures", "eigenvalues"])
+    assert VasprunData._from_npz(np.load("vasprun.xml.npz")).fields == \
+           ["structures", "eigenvalues"]
+
+    mock_parse = mocker.patch(
+        "pydefect.cli.vasp.vasprun_reader.parse_vasprun")
+    actual = read_vasprun("vasprun.xml", fields=["eigenvalues"])
+    mock_parse.assert_not_called()
+    assert actual.final_structure == first.final_structure
+    np.testing.assert_array_equal(actual.eigenvalues[Spin.up],
+                                  first.eigenvalues[Spin.up])
+
+    read_vasprun("vasprun.xml", fields=["efermi"])
+    mock_parse.assert_called_once_with(
+        "vasprun.xml", ["structures", "efermi", "eigenvalues"])
+
+
+def test_read_vasprun_broken_cache(vasprun_file, tmpdir):
+    tmpdir.chdir()
+    shutil.copy(vasprun_file, "vasprun.xml")
+    with open("vasprun.xml.npz", "w") as f:
+        f.write("broken")
+    actual = read_vasprun("vasprun.xml", fields=["efermi"])
+    assert actual.efermi == 3.27287154
+    assert VasprunData._from_npz(np.load("vasprun.xml.npz")).fields == \
+           ["efermi"]
+
+
+def test_read_vasprun_unwritable_cache(vasprun_file, tmpdir):
+    actual = read_vasprun(vasprun_file, fields=["efermi"],
+                          cache_filename=tmpdir / "no_dir" / "vasprun.npz")
+    assert actual.efermi == 3.27287154
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+from math import sqrt
+
+import numpy as np
+import pytest
+from pydefect.input_maker.voronoi_interstitials import voronoi_vertices, \
+    make_local_extrema_from_voronoi
+
+
+def test_voronoi_vertices(simple_cubic):
+    np.testing.assert_array_almost_equal(voronoi_vertices(simple_cubic),
+                                         [[0.5, 0.5, 0.5]])
+
+
+def test_make_local_extrema_from_voronoi(simple_cubic_2x1x1):
+    actual = make_local_extrema_from_voronoi(simple_cubic_2x1x1,
+                                             min_dist=0.1, tol=0.1, info="a")
+    assert actual.is_min is False
+    assert actual.info == "a"
+    assert actual.params.min_dist == 0.1
+    assert len(actual.extrema_points) == 1
+    point = actual.extrema_points[0]
+    assert point.site_symmetry == "4/mmm"
+    np.testing.assert_array_almost_equal(
+        sorted(point.frac_coords), [(0.25, 0.5, 0.5), (0.75, 0.5, 0.5)])
+    assert point.quantities == pytest.approx([sqrt(0.75)] * 2)
+
+
+def test_make_local_extrema_from_voronoi_min_dist(simple_cubic):
+    actual = make_local_extrema_from_voronoi(simple_cubic, min_dist=1.0)
+    assert actual.extrema_points == []
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+from pydefect.util.periodic_neighbors import periodic_pairs_within, \
+    cluster_periodic_points, merge_clusters, nearest_distances, \
+    unwrap_to_reference
+from pymatgen.core import Lattice
+from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.spatial.distance import squareform
+
+
+def test_periodic_pairs_within():
+    lattice = Lattice.cubic(1.0)
+    frac_coords = [[0.05, 0.0, 0.0], [0.95, 0.0, 0.0], [0.5, 0.5, 0.5]]
+    actual = periodic_pairs_within(lattice, frac_coords, radius=0.15)
+    np.testing.assert_array_equal(actual, [[0, 1]])
+
+
+def test_cluster_periodic_points_equals_single_linkage():
+    lattice = Lattice.monoclinic(3, 4, 5, 100)
+    frac_coords = np.random.default_rng(0).random((60, 3))
+    tol = 0.8
+
+    dist_matrix = lattice.get_all_distances(frac_coords, frac_coords)
+    dist_matrix = (dist_matrix + dist_matrix.T) / 2
+    np.fill_diagonal(dist_matrix, 0)
+    expected = fcluster(linkage(squareform(dist_matrix)), tol,
+                        criterion="distance")
+    actual = cluster_periodic_points(lattice, frac_coords, tol)
+
+    # Same partition, regardless of how the labels are numbered.
+    pairs = {(a, e) for a, e in zip(actual, expected)}
+    assert len(pairs) == len(set(actual)) == len(set(expected))
+
+
+def test_unwrap_to_reference():
+    lattice = Lattice.cubic(1.0)
+    actual = unwrap_to_reference(lattice, np.array([0.05, 0.0, 0.0]),
+                                 [[0.95, 0.0, 0.0]])
+    assert_array_almost_equal(actual, [[-0.05, 0.0, 0.0]])
+
+
+def test_merge_clusters():
+    lattice = Lattice.cubic(1.0)
+    frac_coords = [[0.05, 0.0, 0.0], [0.95, 0.0, 0.0], [0.5, 0.5, 0.5]]
+    actual = merge_clusters(lattice, frac_coords, np.array([0, 0, 1]))
+    assert_array_almost_equal(actual, [[0.0, 0.0, 0.0], [0.5, 0.5, 0.5]])
+
+
+def test_nearest_distances():
+    lattice = Lattice.monoclinic(3, 4, 5, 100)
+    rng = np.random.default_rng(1)
+    points, atoms = rng.random((30, 3)), rng.random((7, 3))
+    expected = np.min(lattice.get_all_distances(points, atoms), axis=1)
+    assert_array_almost_equal(nearest_distances(lattice, points, atoms),
+                              expected)
+
+    actual = nearest_distances(lattice, points, atoms, upper_bound=1.0)
+    assert_array_almost_equal(actual[expected <= 1.0],
+                              expected[expected <= 1.0])
+    assert np.all(np.isinf(actual[expected > 1.0]))
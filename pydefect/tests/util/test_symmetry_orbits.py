@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import numpy as np
+from pydefect.util.symmetry_orbits import SymmetryOrbits
+
+
+def test_symmetry_orbits(simple_cubic):
+    orbits = SymmetryOrbits(simple_cubic)
+    coords = [[0.1, 0.0, 0.0], [0.5, 0.5, 0.5], [0.0, 0.9, 0.0],
+              [0.0, 0.0, 0.1]]
+    np.testing.assert_array_equal(orbits.orbit_labels(coords), [0, 1, 0, 0])
+    assert orbits.orbits(coords) == [[0, 2, 3], [1]]
+    assert orbits.orbits([]) == []
+
+
+def test_site_symmetry(simple_cubic):
+    orbits = SymmetryOrbits(simple_cubic)
+    assert orbits.site_symmetry(np.array([0.1, 0.0, 0.0])) == "4mm"
+    assert orbits.site_symmetry(np.array([0.5, 0.5, 0.5])) == "m-3m"
+    assert orbits.site_symmetry(np.array([0.1, 0.2, 0.3])) == "1"
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import shutil
+
+import numpy as np
+import pytest
+from pydefect.util.volumetric_store import dump_volumetric_data, \
+    VolumetricStore, load_volumetric_data, open_volumetric_data, \
+    convert_volumetric_files, is_volumetric_store, volumetric_class
+from pymatgen.core import Structure, Lattice
+from pymatgen.io.vasp import Chgcar, Locpot
+
+
+@pytest.fixture
+def spin_chgcar():
+    structure = Structure(Lattice.cubic(3.0), ["H"], [[0.0, 0.0, 0.0]])
+    rng = np.random.default_rng(0)
+    return Chgcar(structure, {"total": rng.random((4, 6, 8)),
+                              "diff": rng.random((4, 6, 8))})
+
+
+def test_is_volumetric_store():
+    assert is_volumetric_store("CHGCAR.h5")
+    assert is_volumetric_store("CHGCAR.hdf5")
+    assert not is_volumetric_store("CHGCAR")
+
+
+def test_volumetric_class():
+    assert volumetric_class("CHGCAR") is Chgcar
+    assert volumetric_class("PARCHG.0189.ALLK.h5") is Chgcar
+    assert volumetric_class("AECCAR2") is Chgcar
+    assert volumetric_class("dir/LOCPOT") is Locpot
+    assert volumetric_class("LOCPOT.h5") is Locpot
+    assert volumetric_class("bulk_locpot") is Locpot
+    assert volumetric_class("chgcar_unitcell") is Chgcar
+    assert volumetric_class("ELFCAR") is Chgcar
+
+
+def test_volumetric_store(spin_chgcar, tmpdir):
+    pytest.importorskip("h5py")
+    tmpdir.chdir()
+    dump_volumetric_data(spin_chgcar, "CHGCAR.h5", chunk_size=3)
+    store = VolumetricStore("CHGCAR.h5")
+    assert store.structure == spin_chgcar.structure
+    assert store.dim == (4, 6, 8)
+    assert store.keys == ["diff", "total"]
+    assert store.is_spin_polarized
+    np.testing.assert_array_equal(store.data["total"],
+                                  spin_chgcar.data["total"])
+    np.testing.assert_array_equal(store.read("diff", np.s_[:, :, 2:5]),
+                                  spin_chgcar.data["diff"][:, :, 2:5])
+    assert store.data.get("spin") is None
+
+
+def test_load_volumetric_data(spin_chgcar, tmpdir):
+    pytest.importorskip("h5py")
+    tmpdir.chdir()
+    dump_volumetric_data(spin_chgcar, "CHGCAR.h5")
+    actual = load_volumetric_data("CHGCAR.h5", keys=["total"])
+    assert isinstance(actual, Chgcar)
+    assert list(actual.data.keys()) == ["total"]
+    np.testing.assert_array_equal(actual.data["total"],
+                                  spin_chgcar.data["total"])
+
+
+def test_load_locpot(tmpdir):
+    pytest.importorskip("h5py")
+    tmpdir.chdir()
+    structure = Structure(Lattice.cubic(3.0), ["H"], [[0.0, 0.0, 0.0]])
+    locpot = Locpot(structure, {"total": np.arange(24.0).reshape(2, 3, 4)})
+    dump_volumetric_data(locpot, "LOCPOT.h5")
+    actual = load_volumetric_data("LOCPOT.h5")
+    assert isinstance(actual, Locpot)
+    np.testing.assert_array_equal(actual.data["total"], locpot.data["total"])
+
+
+def test_convert_volumetric_files(vasp_files, tmpdir):
+    pytest.importorskip("h5py")
+    tmpdir.chdir()
+    shutil.copy(vasp_files / "H2_CHGCAR", "CHGCAR")
+    shutil.copy(vasp_files / "H2_CHGCAR", "POSCAR")
+    actual = convert_volumetric_files(".", ["CHGCAR"])
+    assert [f.name for f in actual] == ["CHGCAR.h5"]
+
+    expected = Chgcar.from_file("CHGCAR")
+    store = open_volumetric_data("CHGCAR.h5")
+    assert store.dim == expected.dim
+    np.testing.assert_array_almost_equal(store.data["total"],
+                                         expected.data["total"])
+
+
+def test_load_volumetric_data_non_standard_name(vasp_files, tmpdir):
+    tmpdir.chdir()
+    shutil.copy(vasp_files / "H2_CHGCAR", "bulk_CHGCAR")
+    actual = load_volumetric_data("bulk_CHGCAR")
+    expected = Chgcar.from_file(vasp_files / "H2_CHGCAR")
+    assert type(actual) is Chgcar
+    np.testing.assert_array_almost_equal(actual.data["total"],
+                                         expected.data["total"])
+
+
+def test_convert_locpot(tmpdir):
+    pytest.importorskip("h5py")
+    tmpdir.chdir()
+    structure = Structure(Lattice.cubic(3.0), ["H"], [[0.0, 0.0, 0.0]])
+    data = {"total": np.arange(24.0).reshape(2, 3, 4)}
+    Locpot(structure, data).write_file("LOCPOT")
+    convert_volumetric_files(".", ["LOCPOT"])
+
+    assert VolumetricStore("LOCPOT.h5").class_name == "Locpot"
+    for actual in [load_volumetric_data("LOCPOT"),
+                   load_volumetric_data("LOCPOT.h5")]:
+        assert type(actual) is Locpot
+        # Not divided by the volume as CHGCAR is.
+        np.testing.assert_array_almost_equal(actual.data["total"],
+                                             data["total"])
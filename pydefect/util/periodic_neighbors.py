@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+from itertools import product
+from typing import List, Tuple
+
+import numpy as np
+from pymatgen.core import Lattice
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+
+def image_shifts(lattice: Lattice, radius: float) -> np.ndarray:
+    """Lattice translations needed to find all pairs within radius.
+
+    Fractional coordinates are assumed to be wrapped into [0, 1), so the
+    fractional difference along each axis lies in (-1, 1).
+    """
+    widths = lattice.volume / np.linalg.norm(
+        np.cross(lattice.matrix[[1, 2, 0]], lattice.matrix[[2, 0, 1]]), axis=1)
+    n_max = np.floor(radius / widths).astype(int) + 1
+    ranges = [range(-n, n + 1) for n in n_max]
+    return np.array(list(product(*ranges)), dtype=float)
+
+
+def _image_tree(lattice: Lattice, frac_coords: np.ndarray, radius: float
+                ) -> Tuple[cKDTree, int]:
+    frac_coords = np.mod(frac_coords, 1.0)
+    shifts = image_shifts(lattice, radius)
+    images = (frac_coords[None, :, :] + shifts[:, None, :]).reshape(-1, 3)
+    return cKDTree(lattice.get_cartesian_coords(images)), len(frac_coords)
+
+
+def periodic_pairs_between(lattice: Lattice,
+                           frac_coords: np.ndarray,
+                           other_frac_coords: np.ndarray,
+                           radius: float) -> np.ndarray:
+    """Index pairs (i, j) with periodic distance between frac_coords[i] and
+    other_frac_coords[j] <= radius.
+
+    A KD-tree is built on the periodic images of the other points, so the
+    cost scales with the number of neighbors instead of the number of pairs.
+    """
+    frac_coords = np.mod(np.array(frac_coords, dtype=float).reshape(-1, 3), 1)
+    other = np.array(other_frac_coords, dtype=float).reshape(-1, 3)
+    tree, n = _image_tree(lattice, other, radius)
+    base = cKDTree(lattice.get_cartesian_coords(frac_coords))
+    pairs = base.sparse_distance_matrix(tree, radius, output_type="ndarray")
+    return np.unique(np.stack([pairs["i"], pairs["j"] % n], axis=1), axis=0)
+
+
+def periodic_pairs_within(lattice: Lattice,
+                          frac_coords: np.ndarray,
+                          radius: float) -> np.ndarray:
+    """Index pairs (i < j) whose periodic distance is <= radius. """
+    pairs = periodic_pairs_between(lattice, frac_coords, frac_coords, radius)
+    return pairs[pairs[:, 0] < pairs[:, 1]]
+
+
+def connected_labels(num_points: int, pairs: np.ndarray) -> np.ndarray:
+    """Labels of connected components ordered by their first point. """
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])),
+                       shape=(num_points, num_points))
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+
+def cluster_periodic_points(lattice: Lattice,
+                            frac_coords: np.ndarray,
+                            tol: float) -> np.ndarray:
+    """Single-linkage cluster labels with a periodic distance tolerance.
+
+    Equivalent to scipy's fcluster(linkage(d), tol, criterion="distance") on
+    the full periodic distance matrix, i.e., the connected components of the
+    graph whose edges join points closer than tol.
+    """
+    pairs = periodic_pairs_within(lattice, frac_coords, tol)
+    return connected_labels(len(frac_coords), pairs)
+
+
+def unwrap_to_reference(lattice: Lattice,
+                        reference: np.ndarray,
+                        frac_coords: np.ndarray) -> np.ndarray:
+    """Periodic images of frac_coords closest to the reference point."""
+    frac_coords = np.array(frac_coords, dtype=float).reshape(-1, 3)
+    diff = frac_coords - reference
+    diff -= np.round(diff)
+    shifts = np.array(list(product([-1, 0, 1], repeat=3)), dtype=float)
+    candidates = diff[:, None, :] + shifts[None, :, :]
+    lengths = np.linalg.norm(lattice.get_cartesian_coords(candidates), axis=2)
+    best = candidates[np.arange(len(diff)), np.argmin(lengths, axis=1)]
+    return reference + best
+
+
+def merge_clusters(lattice: Lattice,
+                   frac_coords: np.ndarray,
+                   labels: np.ndarray) -> List[np.ndarray]:
+    """Average points of each cluster after unwrapping around its first one.
+    """
+    frac_coords = np.array(frac_coords, dtype=float).reshape(-1, 3)
+    result = []
+    for label in np.unique(labels):
+        members = frac_coords[labels == label]
+        unwrapped = unwrap_to_reference(lattice, members[0], members)
+        result.append(np.average(unwrapped, axis=0))
+    return result
+
+
+def nearest_distances(lattice: Lattice,
+                      frac_coords: np.ndarray,
+                      target_frac_coords: np.ndarray,
+                      upper_bound: float = np.inf) -> np.ndarray:
+    """Periodic distances from each point to the nearest target point.
+
+    Distances larger than upper_bound are returned as inf, which allows the
+    KD-tree query to prune the search when only a threshold matters.
+    """
+    frac_coords = np.mod(np.array(frac_coords, dtype=float).reshape(-1, 3), 1)
+    # Any point lies within half the sum of the lattice lengths of a lattice
+    # point, which bounds the distance to the nearest target.
+    radius = min(upper_bound, sum(lattice.abc) / 2)
+    tree, _ = _image_tree(lattice, np.array(target_frac_coords, dtype=float),
+                          radius)
+    # nextafter keeps points lying exactly at upper_bound.
+    distances, _ = tree.query(lattice.get_cartesian_coords(frac_coords), k=1,
+                              distance_upper_bound=np.nextafter(upper_bound,
+                                                                np.inf))
+    return distances
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+from typing import List
+
+import numpy as np
+import spglib
+from pydefect.util.periodic_neighbors import periodic_pairs_between, \
+    connected_labels
+from pymatgen.core import Structure
+from vise.util.structure_symmetrizer import StructureSymmetrizer
+
+
+class SymmetryOrbits:
+    """Group points into orbits of the host symmetry operations.
+
+    Unlike symmetrizing a structure augmented with dummy atoms, the host
+    symmetry is determined only once and cannot be altered by the points.
+    """
+
+    def __init__(self, structure: Structure, symprec: float = None):
+        kwargs = {"symprec": symprec} if symprec else {}
+        symmetrizer = StructureSymmetrizer(structure, **kwargs)
+        self.lattice = structure.lattice
+        self.symprec = symmetrizer.symprec
+        self.sg_number = symmetrizer.sg_number
+        sym_data = symmetrizer.spglib_sym_data
+        self.rotations = np.array(sym_data.rotations)
+        self.translations = np.array(sym_data.translations)
+
+    def images(self, frac_coords: np.ndarray) -> np.ndarray:
+        """Images of the points by all operations with shape (op, point, 3).
+        """
+        frac_coords = np.array(frac_coords, dtype=float).reshape(-1, 3)
+        result = np.einsum("oij,pj->opi", self.rotations, frac_coords)
+        return np.mod(result + self.translations[:, None, :], 1.0)
+
+    def orbit_labels(self, frac_coords: np.ndarray) -> np.ndarray:
+        """Orbit label of each point, numbered in order of first appearance.
+        """
+        num_points = len(frac_coords)
+        images = self.images(frac_coords).reshape(-1, 3)
+        pairs = periodic_pairs_between(self.lattice, frac_coords, images,
+                                       self.symprec)
+        pairs[:, 1] %= num_points
+        return connected_labels(num_points, pairs)
+
+    def orbits(self, frac_coords: np.ndarray) -> List[List[int]]:
+        """Indices of the points grouped by orbit. The first index of each
+        orbit is the representative one. """
+        labels = self.orbit_labels(frac_coords)
+        return [np.where(labels == i)[0].tolist()
+                for i in range(max(labels, default=-1) + 1)]
+
+    def site_symmetry(self, frac_coord: np.ndarray) -> str:
+        """Point group symbol of the operations that leave the point fixed.
+        """
+        images = self.images(frac_coord)[:, 0, :]
+        diff = images - frac_coord
+        diff -= np.round(diff)
+        distances = np.linalg.norm(self.lattice.get_cartesian_coords(diff),
+                                   axis=1)
+        stabilizer = self.rotations[distances < self.symprec]
+        return spglib.get_pointgroup(stabilizer.astype("intc"))[0].strip()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#  Copyright (c) 2020 Kumagai group.
+import json
+from collections.abc import Mapping
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import List, Dict, Iterator, Union
+
+import numpy as np
+from pymatgen.core import Structure
+from pymatgen.io.vasp import Chgcar, Locpot, VolumetricData
+from vise.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+store_suffixes = (".h5", ".hdf5")
+default_volumetric_filenames = ["CHGCAR", "LOCPOT", "AECCAR0", "AECCAR2",
+                                "PARCHG*"]
+_classes = {"Chgcar": Chgcar, "Locpot": Locpot,
+            "VolumetricData": VolumetricData}
+
+
+def _h5py():
+    try:
+        import h5py
+    except ImportError:
+        logger.warning("To use the volumetric data store, install h5py.")
+        raise
+    return h5py
+
+
+def is_volumetric_store(filename: Union[str, Path]) -> bool:
+    return Path(filename).suffix in store_suffixes
+
+
+def volumetric_class(filename: Union[str, Path]) -> type:
+    """Locpot if the file name includes LOCPOT, otherwise Chgcar as done for
+    any VASP volumetric file so far. """
+    return Locpot if "LOCPOT" in Path(filename).name.upper() else Chgcar
+
+
+def parse_volumetric_file(filename: Union[str, Path]) -> VolumetricData:
+    """Parse a VASP volumetric file with the class from its file name. """
+    return volumetric_class(filename).from_file(filename)
+
+
+def dump_volumetric_data(volumetric_data: VolumetricData,
+                         filename: Union[str, Path],
+                         chunk_size: int = 32,
+                         compression: str = "gzip") -> None:
+    """Write the volumetric data and the structure to an HDF5 file.
+
+    Each data component (e.g., total and diff) is stored as a dataset
+    compressed in chunks of chunk_size^3 grid points, so that a component or
+    a block of the grid can be read without decompressing the others. The
+    augmentation data are not stored.
+    """
+    h5py = _h5py()
+    with h5py.File(filename, "w") as f:
+        f.attrs["class"] = volumetric_data.__class__.__name__
+        f.attrs["structure"] = json.dumps(volumetric_data.structure.as_dict())
+        group = f.create_group("data")
+        for key, data in volumetric_data.data.items():
+            chunks = tuple(min(chunk_size, d) for d in data.shape)
+            group.create_dataset(key, data=data, chunks=chunks,
+                                 compression=compression, shuffle=True)
+
+
+class _LazyData(Mapping):
+    """Data components read from the store when first accessed. """
+
+    def __init__(self, store: "VolumetricStore"):
+        self._store = store
+        self._cache: Dict[str, np.ndarray] = {}
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        if key not in self._cache:
+            if key not in self._store.keys:
+                raise KeyError(key)
+            self._cache[key] = self._store.read(key)
+        return self._cache[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.keys)
+
+    def __len__(self) -> int:
+        return len(self._store.keys)
+
+
+class VolumetricStore:
+    """Volumetric data in an HDF5 file written by dump_volumetric_data.
+
+    Only the structure and the data shapes are read on initialization. The
+    structure, dim and data attributes behave as those of Chgcar, where each
+    data component is read on first access.
+    """
+
+    def __init__(self, filename: Union[str, Path]):
+        self.filename = str(filename)
+        with _h5py().File(self.filename, "r") as f:
+            self.class_name = f.attrs["class"]
+            self.structure = Structure.from_dict(
+                json.loads(f.attrs["structure"]))
+            self.keys = list(f["data"].keys())
+            self.dim = f["data"][self.keys[0]].shape
+        self.data = _LazyData(self)
+
+    @property
+    def is_spin_polarized(self) -> bool:
+        return len(self.keys) >= 2
+
+    def read(self, key: str = "total", selection=()) -> np.ndarray:
+        """Read a data component, or only the chunks overlapping with the
+        selection, e.g., np.s_[:, :, 10:20]. """
+        with _h5py().File(self.filename, "r") as f:
+            return f["data"][key][selection]
+
+    def to_volumetric_data(self, keys: List[str] = None) -> VolumetricData:
+        """Object of the recorded class holding only the data components in
+        keys. """
+        keys = keys or self.keys
+        cls = _classes.get(self.class_name, Chgcar)
+        return cls(self.structure, {k: self.read(k) for k in keys})
+
+
+def open_volumetric_data(filename: Union[str, Path]
+                         ) -> Union[VolumetricStore, VolumetricData]:
+    """VolumetricStore if filename is a store, otherwise the parsed file. """
+    if is_volumetric_store(filename):
+        return VolumetricStore(filename)
+    return parse_volumetric_file(filename)
+
+
+def load_volumetric_data(filename: Union[str, Path], keys: List[str] = None
+                         ) -> VolumetricData:
+    """Chgcar-like object from either a store or a VASP file. Only the data
+    components in keys are read from a store. """
+    if is_volumetric_store(filename):
+        return VolumetricStore(filename).to_volumetric_data(keys)
+    return parse_volumetric_file(filename)
+
+
+def load_total_volumetric_data(filename: Union[str, Path]) -> VolumetricData:
+    return load_volumetric_data(filename, keys=["total"])
+
+
+def convert_volumetric_files(directory: Union[str, Path],
+                             filenames: List[str] = None,
+                             chunk_size: int = 32,
+                             compression: str = "gzip") -> List[Path]:
+    """Convert VASP volumetric files in directory into stores named as
+    the original files plus .h5.
+
+    Args:
+        directory: Directory including the VASP files.
+        filenames: File names or shell-style patterns such as PARCHG*.
+        chunk_size: Number of grid points along each axis of a chunk.
+        compression: Compression filter of h5py.
+
+    Returns:
+        Written file names.
+    """
+    filenames = filenames or default_volumetric_filenames
+    result = []
+    for path in sorted(Path(directory).iterdir()):
+        if (not path.is_file() or is_volumetric_store(path)
+                or not any(fnmatch(path.name, p) for p in filenames)):
+            continue
+        output = path.parent / f"{path.name}.h5"
+        logger.info(f"Converting {path} to {output}.")
+        dump_volumetric_data(parse_volumetric_file(path), output, chunk_size,
+                             compression)
+        result.append(output)
+    return result